@@ -4,137 +4,63 @@ Add missing output_norm.bias tensor to Mibera GGUF models
 This fixes the llama.cpp loading issue
 """
 
-import struct
-import numpy as np
 from pathlib import Path
 
-def read_gguf_header(file_path):
-    """Read GGUF header to understand structure"""
-    with open(file_path, 'rb') as f:
-        # Read magic number
-        magic = f.read(4)
-        if magic != b'GGUF':
-            raise ValueError("Not a GGUF file")
-        
-        # Read version
-        version = struct.unpack('<I', f.read(4))[0]
-        print(f"GGUF version: {version}")
-        
-        # Read tensor count and metadata KV count
-        tensor_count = struct.unpack('<Q', f.read(8))[0]
-        metadata_kv_count = struct.unpack('<Q', f.read(8))[0]
-        
-        print(f"Tensors: {tensor_count}, Metadata KV: {metadata_kv_count}")
-        
-        return version, tensor_count, metadata_kv_count
-
-def add_bias_tensor_script():
-    """Generate script to add bias tensor on remote"""
-    script = '''#!/usr/bin/env python3
-import sys
-import os
-import numpy as np
-import struct
-import shutil
-from pathlib import Path
-
-# Install gguf if needed
-try:
-    import gguf
-except ImportError:
-    print("Installing gguf...")
-    os.system("pip install gguf")
-    import gguf
+from gguf_io import read_header, embedding_length
 
-def add_output_norm_bias(input_path, output_path):
-    """Add missing output_norm.bias tensor"""
-    print(f"Reading {input_path}...")
-    
-    reader = gguf.GGUFReader(input_path)
-    writer = gguf.GGUFWriter(output_path, reader.header.name, use_temp_file=False)
-    
-    # Copy all metadata
-    for key, field in reader.fields.items():
-        writer.add_field(key, field)
-    
-    # Get embedding dimension for bias size
-    embd_dim = 5120  # Phi-4 embedding dimension
-    if "phi2.embedding_length" in reader.fields:
-        embd_dim = reader.fields["phi2.embedding_length"]
-    
-    print(f"Embedding dimension: {embd_dim}")
-    
-    # Copy existing tensors
-    bias_added = False
-    for tensor in reader.tensors:
-        name = tensor.name.decode() if isinstance(tensor.name, bytes) else tensor.name
-        writer.add_tensor(name, tensor.data, tensor.shape)
-        
-        # After output_norm.weight, add output_norm.bias
-        if name == "output_norm.weight" and not bias_added:
-            print("Adding output_norm.bias...")
-            bias_data = np.zeros(embd_dim, dtype=np.float32)
-            writer.add_tensor("output_norm.bias", bias_data, [embd_dim])
-            bias_added = True
-    
-    # If we didn't find output_norm.weight, add bias at the end
-    if not bias_added:
-        print("Adding output_norm.bias at end...")
-        bias_data = np.zeros(embd_dim, dtype=np.float32)
-        writer.add_tensor("output_norm.bias", bias_data, [embd_dim])
-    
-    writer.write_header_to_file()
-    writer.write_kv_data_to_file()
-    writer.write_tensors_to_file()
-    writer.close()
-    
-    print(f"Fixed model saved to: {output_path}")
+def read_gguf_header(file_path):
+    """Read the full GGUF header (KV section + tensor-info table) without touching tensor data"""
+    header = read_header(file_path)
+    print(f"GGUF version: {header.version}")
+    print(f"Tensors: {len(header.tensors)}, Metadata KV: {len(header.kv)}")
+    print(f"Architecture: {header.architecture}, embedding length: {embedding_length(header)}")
+    print(f"Has output_norm.bias: {header.tensor('output_norm.bias') is not None}")
+    
+    return header
 
-def main():
-    if len(sys.argv) < 2:
-        models = ["mibera-Q2_K-final.gguf", "mibera-Q3_K_M-final.gguf", "mibera-IQ2_XXS-ultra.gguf"]
-    else:
-        models = sys.argv[1:]
-    
-    for model in models:
-        if not os.path.exists(model):
-            print(f"Skipping {model} - not found")
+def remote_files(entry="fix_bias_remote.py"):
+    """entry plus every repo module it imports, directly or transitively (so the upload list can't drift)"""
+    import ast
+    here = Path(__file__).parent
+    files = []
+    todo = [entry]
+    while todo:
+        name = todo.pop()
+        if name in files:
             continue
-            
-        output = model.replace(".gguf", "-fixed.gguf")
-        print(f"\\nFixing {model} -> {output}")
-        
-        try:
-            add_output_norm_bias(model, output)
-            print(f"[OK] Successfully fixed {model}")
-        except Exception as e:
-            print(f"[ERROR] Failed to fix {model}: {e}")
+        files.append(name)
+        for node in ast.walk(ast.parse((here / name).read_text())):
+            if isinstance(node, ast.Import):
+                modules = [alias.name for alias in node.names]
+            elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+                modules = [node.module]
+            else:
+                continue
+            todo.extend(f"{m}.py" for m in modules if (here / f"{m}.py").exists())
+    return files
 
-if __name__ == "__main__":
-    main()
-'''
-    
-    return script
+REMOTE_FILES = remote_files()
+
+def add_bias_tensor_script():
+    """Return the remote bias fix script (thin wrapper over gguf_stream)"""
+    return (Path(__file__).parent / "fix_bias_remote.py").read_text()
 
 def main():
     print("=== CREATING BIAS FIX SCRIPT ===")
     
-    script_content = add_bias_tensor_script()
-    
-    # Save script locally
-    with open("fix_bias_remote.py", "w") as f:
-        f.write(script_content)
+    # fix_bias_remote.py ships alongside this script; fail early if it's missing
+    add_bias_tensor_script()
     
-    print("Created fix_bias_remote.py")
+    print("Using fix_bias_remote.py")
     print("\nTo use:")
-    print("1. Upload to remote: scp fix_bias_remote.py root@remote:/workspace/mibera/output_fused/")
+    print(f"1. Upload to remote: scp {' '.join(REMOTE_FILES)} root@remote:/workspace/mibera/output_fused/")
     print("2. Run on remote: python3 fix_bias_remote.py")
     print("3. Download fixed models")
     
     # Also create upload command
     upload_cmd = f"""
 # Upload and run bias fix
-scp -i ~/.ssh/vastai_ed25519 -P 34574 fix_bias_remote.py root@136.59.129.136:/workspace/mibera/output_fused/
+scp -i ~/.ssh/vastai_ed25519 -P 34574 {' '.join(REMOTE_FILES)} root@136.59.129.136:/workspace/mibera/output_fused/
 ssh -i ~/.ssh/vastai_ed25519 -p 34574 root@136.59.129.136 "cd /workspace/mibera/output_fused && python3 fix_bias_remote.py"
 """
     
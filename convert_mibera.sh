@@ -5,6 +5,14 @@
 set -e
 cd /workspace/mibera
 
+# Every step appends to one Chrome trace (wall, CPU, I/O, peak RSS per stage)
+mkdir -p traces
+export MIBERA_TRACE="${MIBERA_TRACE:-traces/convert-$(date +%Y%m%d-%H%M%S).json}"
+trace() {
+    local stage="$1"; shift
+    if [ -f gguf_trace.py ]; then python3 gguf_trace.py run --stage "$stage" -- "$@"; else "$@"; fi
+}
+
 echo "=== MIBERA CLOUD CONVERSION ==="
 echo "Starting conversion process..."
 
@@ -32,10 +40,15 @@ df -h /workspace
 # Step 1: Convert to GGUF F16
 echo ""
 echo "[1/4] Converting to GGUF F16 format..."
-python3 convert_hf_to_gguf.py "$MODEL_DIR" \
-    --outfile "output/mibera-f16.gguf" \
-    --outtype f16 \
-    --verbose
+if [ -f convert_mibera_parallel.py ]; then
+    # Parallel shard conversion (phi2 naming, split FFN, output_norm.bias)
+    python3 convert_mibera_parallel.py "$MODEL_DIR" --outfile "output/mibera-f16.gguf"
+else
+    trace convert-f16 python3 convert_hf_to_gguf.py "$MODEL_DIR" \
+        --outfile "output/mibera-f16.gguf" \
+        --outtype f16 \
+        --verbose
+fi
 
 if [ ! -f "output/mibera-f16.gguf" ]; then
     echo "ERROR: F16 conversion failed!"
@@ -45,40 +58,49 @@ fi
 F16_SIZE=$(du -h output/mibera-f16.gguf | cut -f1)
 echo "✓ F16 GGUF created: $F16_SIZE"
 
-# Step 2: Create Q3_K_M quantization (recommended)
-echo ""
-echo "[2/4] Creating Q3_K_M quantization (recommended)..."
-./llama-quantize output/mibera-f16.gguf output/mibera-Q3_K_M.gguf Q3_K_M
-
-if [ -f "output/mibera-Q3_K_M.gguf" ]; then
-    Q3_SIZE=$(du -h output/mibera-Q3_K_M.gguf | cut -f1)
-    echo "✓ Q3_K_M created: $Q3_SIZE"
+# Steps 2-4: Q3_K_M, Q2_K and Q4_K_M
+if [ -f quantize_fanout.py ]; then
+    # All three quantizations share one read of the F16 source
+    echo ""
+    echo "[2-4/4] Creating Q3_K_M, Q2_K and Q4_K_M concurrently..."
+    python3 quantize_fanout.py output/mibera-f16.gguf Q3_K_M Q2_K Q4_K_M --quantize ./llama-quantize || \
+        echo "WARNING: some quantizations failed (see summary above)"
 else
-    echo "ERROR: Q3_K_M quantization failed!"
-fi
+    # Step 2: Create Q3_K_M quantization (recommended)
+    echo ""
+    echo "[2/4] Creating Q3_K_M quantization (recommended)..."
+    trace quantize-Q3_K_M ./llama-quantize output/mibera-f16.gguf output/mibera-Q3_K_M.gguf Q3_K_M
 
-# Step 3: Create Q2_K quantization (low RAM option)
-echo ""
-echo "[3/4] Creating Q2_K quantization (low RAM option)..."
-./llama-quantize output/mibera-f16.gguf output/mibera-Q2_K.gguf Q2_K
+    if [ -f "output/mibera-Q3_K_M.gguf" ]; then
+        Q3_SIZE=$(du -h output/mibera-Q3_K_M.gguf | cut -f1)
+        echo "✓ Q3_K_M created: $Q3_SIZE"
+    else
+        echo "ERROR: Q3_K_M quantization failed!"
+    fi
 
-if [ -f "output/mibera-Q2_K.gguf" ]; then
-    Q2_SIZE=$(du -h output/mibera-Q2_K.gguf | cut -f1)
-    echo "✓ Q2_K created: $Q2_SIZE"
-else
-    echo "WARNING: Q2_K quantization failed!"
-fi
+    # Step 3: Create Q2_K quantization (low RAM option)
+    echo ""
+    echo "[3/4] Creating Q2_K quantization (low RAM option)..."
+    trace quantize-Q2_K ./llama-quantize output/mibera-f16.gguf output/mibera-Q2_K.gguf Q2_K
 
-# Step 4: Create Q4_K_M quantization (high quality option)
-echo ""
-echo "[4/4] Creating Q4_K_M quantization (high quality option)..."
-./llama-quantize output/mibera-f16.gguf output/mibera-Q4_K_M.gguf Q4_K_M
+    if [ -f "output/mibera-Q2_K.gguf" ]; then
+        Q2_SIZE=$(du -h output/mibera-Q2_K.gguf | cut -f1)
+        echo "✓ Q2_K created: $Q2_SIZE"
+    else
+        echo "WARNING: Q2_K quantization failed!"
+    fi
 
-if [ -f "output/mibera-Q4_K_M.gguf" ]; then
-    Q4_SIZE=$(du -h output/mibera-Q4_K_M.gguf | cut -f1)
-    echo "✓ Q4_K_M created: $Q4_SIZE"
-else
-    echo "WARNING: Q4_K_M quantization failed!"
+    # Step 4: Create Q4_K_M quantization (high quality option)
+    echo ""
+    echo "[4/4] Creating Q4_K_M quantization (high quality option)..."
+    trace quantize-Q4_K_M ./llama-quantize output/mibera-f16.gguf output/mibera-Q4_K_M.gguf Q4_K_M
+
+    if [ -f "output/mibera-Q4_K_M.gguf" ]; then
+        Q4_SIZE=$(du -h output/mibera-Q4_K_M.gguf | cut -f1)
+        echo "✓ Q4_K_M created: $Q4_SIZE"
+    else
+        echo "WARNING: Q4_K_M quantization failed!"
+    fi
 fi
 
 # Clean up F16 to save space
@@ -110,5 +132,11 @@ if [ -f "output/mibera-Q3_K_M.gguf" ]; then
     timeout 30s ./llama-cli -m output/mibera-Q3_K_M.gguf -n 50 -p "Hello! Tell me about yourself." || echo "Test completed (or timed out)"
 fi
 
+if [ -f gguf_trace.py ] && [ -f "$MIBERA_TRACE" ]; then
+    echo ""
+    echo "Stage profile (open $MIBERA_TRACE in ui.perfetto.dev for the timeline):"
+    python3 gguf_trace.py summary "$MIBERA_TRACE"
+fi
+
 echo ""
 echo "=== READY FOR DOWNLOAD ==="
\ No newline at end of file
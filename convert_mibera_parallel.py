@@ -0,0 +1,376 @@
+#!/usr/bin/env python3
+"""
+Parallel sharded safetensors -> GGUF F16 conversion for Mibera.
+
+The full GGUF layout (names, shapes, types, offsets) is computed up front
+from the shard headers, the output file is preallocated, and worker
+processes convert one shard each and write its tensors straight to their
+known offsets. Mibera-specific mapping is applied on the way:
+
+  - HF Phi-3 style names -> phi2 GGUF names (blk.N.attn_qkv, ffn_norm, ...)
+  - fused mlp.gate_up_proj -> ffn_gate + ffn_up (first half = gate)
+  - zero output_norm.bias injected after output_norm.weight
+
+Matrices are written as F16, 1D norms as F32 (llama.cpp's convention).
+"""
+import argparse
+import hashlib
+import json
+import mmap
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+from gguf_io import (
+    GGUF_VERSION, GGML_TYPE_F16, GGML_TYPE_F32, STRING, UINT32, INT32, FLOAT32, ARRAY,
+    TensorInfo, serialize_header, align_offset, read_header, reserve_header_space,
+)
+from safetensors_header import scan_shards
+from gguf_checksum import make_sidecar, save_sidecar
+from gguf_trace import get_tracer, start_trace
+
+ARCH = "phi2"
+ALIGNMENT = 32
+CHUNK_BYTES = 64 * 1024 * 1024
+LLAMA_FTYPE_MOSTLY_F16 = 1
+
+# HF per-layer suffix -> GGUF per-layer suffix
+LAYER_MAP = {
+    "input_layernorm.weight": "attn_norm.weight",
+    "input_layernorm.bias": "attn_norm.bias",
+    "self_attn.qkv_proj.weight": "attn_qkv.weight",
+    "self_attn.qkv_proj.bias": "attn_qkv.bias",
+    "self_attn.q_proj.weight": "attn_q.weight",
+    "self_attn.k_proj.weight": "attn_k.weight",
+    "self_attn.v_proj.weight": "attn_v.weight",
+    "self_attn.o_proj.weight": "attn_output.weight",
+    "self_attn.dense.weight": "attn_output.weight",
+    "post_attention_layernorm.weight": "ffn_norm.weight",
+    "mlp.gate_up_proj.weight": "ffn_up.weight",
+    "mlp.gate_proj.weight": "ffn_gate.weight",
+    "mlp.up_proj.weight": "ffn_up.weight",
+    "mlp.down_proj.weight": "ffn_down.weight",
+}
+
+GLOBAL_MAP = {
+    "model.embed_tokens.weight": "token_embd.weight",
+    "model.norm.weight": "output_norm.weight",
+    "model.norm.bias": "output_norm.bias",
+    "lm_head.weight": "output.weight",
+}
+
+# llama.cpp token types
+TOKEN_NORMAL, TOKEN_CONTROL, TOKEN_USER_DEFINED, TOKEN_UNUSED = 1, 3, 4, 5
+
+
+class Piece:
+    """Part of a source tensor (rows [row_start, row_stop)) written as one GGUF tensor"""
+
+    def __init__(self, info, row_start, row_stop):
+        self.info = info
+        self.row_start = row_start
+        self.row_stop = row_stop
+
+
+def map_name(hf_name):
+    """HF tensor name -> GGUF name, or None for tensors we don't convert"""
+    if hf_name in GLOBAL_MAP:
+        return GLOBAL_MAP[hf_name]
+    parts = hf_name.split(".", 3)
+    if len(parts) == 4 and parts[0] == "model" and parts[1] == "layers":
+        suffix = LAYER_MAP.get(parts[3])
+        if suffix:
+            return f"blk.{parts[2]}.{suffix}"
+    return None
+
+
+def target_type(shape):
+    return GGML_TYPE_F16 if len(shape) >= 2 else GGML_TYPE_F32
+
+
+def plan_layout(tensors, split_ffn=True, gate_first=True, add_bias=True):
+    """Return ([TensorInfo] in file order, {shard: [(TensorEntry, [Piece])]}) with offsets assigned"""
+    infos = []
+    work = {}
+    skipped = []
+
+    def add(entry, name, shape, row_start, row_stop):
+        info = TensorInfo(name, shape, target_type(shape))
+        infos.append(info)
+        return Piece(info, row_start, row_stop)
+
+    for hf_name, entry in tensors.items():
+        name = map_name(hf_name)
+        if name is None:
+            skipped.append(hf_name)
+            continue
+        # GGUF shape is the HF shape reversed (ne0 = innermost)
+        shape = list(reversed(entry.shape))
+        rows = entry.shape[0] if entry.shape else 1
+        pieces = []
+        if split_ffn and hf_name.endswith("mlp.gate_up_proj.weight"):
+            half = rows // 2
+            gate_rows, up_rows = ((0, half), (half, rows)) if gate_first else ((half, rows), (0, half))
+            gate_name = name.replace("ffn_up.weight", "ffn_gate.weight")
+            pieces.append(add(entry, gate_name, [shape[0], half], *gate_rows))
+            pieces.append(add(entry, name, [shape[0], half], *up_rows))
+        else:
+            pieces.append(add(entry, name, shape, 0, rows))
+        work.setdefault(entry.shard, []).append((entry, pieces))
+
+    infos.sort(key=_sort_key)
+    if add_bias and not any(i.name == "output_norm.bias" for i in infos):
+        norm = next((i for i in infos if i.name == "output_norm.weight"), None)
+        if norm is not None:
+            infos.insert(infos.index(norm) + 1, TensorInfo("output_norm.bias", norm.shape, GGML_TYPE_F32))
+
+    offset = 0
+    for info in infos:
+        info.offset = offset
+        offset = align_offset(offset + info.n_bytes, ALIGNMENT)
+    return infos, work, skipped
+
+
+def _sort_key(info):
+    """token_embd, blk.0..N (in name order), then output tensors - the order llama.cpp reads them"""
+    if info.name.startswith("token_embd"):
+        return (0, 0, info.name)
+    if info.name.startswith("blk."):
+        return (1, int(info.name.split(".")[1]), info.name)
+    return (2, 0, info.name)
+
+
+def tokenizer_kv(model_dir, vocab_size, pre):
+    """gpt2-style tokenizer metadata from tokenizer.json, or {} when it is missing"""
+    path = os.path.join(model_dir, "tokenizer.json")
+    if not os.path.exists(path):
+        print("[convert] WARNING: tokenizer.json not found - GGUF will have no vocab")
+        return {}
+    with open(path, 'r', encoding='utf-8') as f:
+        tok = json.load(f)
+
+    vocab = tok["model"]["vocab"]
+    added = {t["id"]: t for t in tok.get("added_tokens", [])}
+    by_id = {i: t for t, i in vocab.items()}
+    for i, t in added.items():
+        by_id[i] = t["content"]
+
+    tokens, types = [], []
+    for i in range(vocab_size):
+        if i not in by_id:
+            tokens.append(f"[PAD{i}]")
+            types.append(TOKEN_UNUSED)
+        elif i in added:
+            tokens.append(by_id[i])
+            types.append(TOKEN_CONTROL if added[i].get("special") else TOKEN_USER_DEFINED)
+        else:
+            tokens.append(by_id[i])
+            types.append(TOKEN_NORMAL)
+
+    merges = [m if isinstance(m, str) else " ".join(m) for m in tok["model"].get("merges", [])]
+    return {
+        "tokenizer.ggml.model": (STRING, "gpt2"),
+        "tokenizer.ggml.pre": (STRING, pre),
+        "tokenizer.ggml.tokens": (ARRAY, (STRING, tokens)),
+        "tokenizer.ggml.token_type": (ARRAY, (INT32, types)),
+        "tokenizer.ggml.merges": (ARRAY, (STRING, merges)),
+    }
+
+
+def build_kv(cfg, model_dir, vocab_size, tokenizer_pre):
+    """phi2 metadata for the Mibera Phi-4 fine-tune"""
+    n_embd = cfg["hidden_size"]
+    n_head = cfg["num_attention_heads"]
+    head_dim = cfg.get("head_dim") or n_embd // n_head
+    kv = {
+        "general.architecture": (STRING, ARCH),
+        "general.name": (STRING, "mibera"),
+        "general.alignment": (UINT32, ALIGNMENT),
+        "general.file_type": (UINT32, LLAMA_FTYPE_MOSTLY_F16),
+        f"{ARCH}.context_length": (UINT32, cfg.get("max_position_embeddings", 16384)),
+        f"{ARCH}.embedding_length": (UINT32, n_embd),
+        f"{ARCH}.feed_forward_length": (UINT32, cfg["intermediate_size"]),
+        f"{ARCH}.block_count": (UINT32, cfg["num_hidden_layers"]),
+        f"{ARCH}.attention.head_count": (UINT32, n_head),
+        f"{ARCH}.attention.head_count_kv": (UINT32, cfg.get("num_key_value_heads", n_head)),
+        f"{ARCH}.attention.layer_norm_epsilon": (FLOAT32, cfg.get("rms_norm_eps", cfg.get("layer_norm_eps", 1e-5))),
+        f"{ARCH}.rope.dimension_count": (UINT32, int(head_dim * cfg.get("partial_rotary_factor", 1.0))),
+    }
+    if "rope_theta" in cfg:
+        kv[f"{ARCH}.rope.freq_base"] = (FLOAT32, float(cfg["rope_theta"]))
+    for key, cfg_key in (("bos_token_id", "bos_token_id"), ("eos_token_id", "eos_token_id"),
+                         ("padding_token_id", "pad_token_id")):
+        if isinstance(cfg.get(cfg_key), int):
+            kv[f"tokenizer.ggml.{key}"] = (UINT32, cfg[cfg_key])
+    kv.update(tokenizer_kv(model_dir, vocab_size, tokenizer_pre))
+    return kv
+
+
+def _to_target(raw, dtype, tensor_type):
+    """Convert a raw little-endian buffer to the target ggml type"""
+    if dtype == "BF16":
+        values = (np.frombuffer(raw, dtype=np.uint16).astype(np.uint32) << 16).view(np.float32)
+    elif dtype == "F16":
+        if tensor_type == GGML_TYPE_F16:
+            return raw
+        values = np.frombuffer(raw, dtype=np.float16)
+    elif dtype == "F32":
+        values = np.frombuffer(raw, dtype=np.float32)
+    else:
+        raise ValueError(f"Unsupported source dtype {dtype}")
+    return (values.astype(np.float16) if tensor_type == GGML_TYPE_F16 else values.astype(np.float32)).tobytes()
+
+
+def _pwrite(f, data, offset):
+    if hasattr(os, "pwrite"):
+        view = memoryview(data)
+        while view:
+            written = os.pwrite(f.fileno(), view, offset)
+            view = view[written:]
+            offset += written
+    else:
+        f.seek(offset)
+        f.write(data)
+
+
+def convert_shard(shard, items, output_path, data_offset):
+    """Worker: convert every tensor of one shard and write it at its planned offset"""
+    from safetensors_header import DTYPE_SIZES
+
+    start = time.time()
+    tracer = get_tracer()
+    written = 0
+    digests = {}
+    with tracer.stage(f"shard {os.path.basename(shard)}"), \
+            open(shard, 'rb') as fin, open(output_path, 'r+b') as fout:
+        src = mmap.mmap(fin.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            for entry, pieces in items:
+                row_elems = 1
+                for dim in entry.shape[1:]:
+                    row_elems *= dim
+                row_bytes = row_elems * DTYPE_SIZES[entry.dtype]
+                rows_per_chunk = max(1, CHUNK_BYTES // max(1, row_bytes))
+                for piece in pieces:
+                    out_row = row_elems * (2 if piece.info.tensor_type == GGML_TYPE_F16 else 4)
+                    dst = data_offset + piece.info.offset
+                    # Rows go out in order, so each tensor is hashed as it is written
+                    h = hashlib.sha256()
+                    piece_start = time.time()
+                    for row in range(piece.row_start, piece.row_stop, rows_per_chunk):
+                        stop = min(row + rows_per_chunk, piece.row_stop)
+                        raw = src[entry.data_start + row * row_bytes:entry.data_start + stop * row_bytes]
+                        data = _to_target(raw, entry.dtype, piece.info.tensor_type)
+                        _pwrite(fout, data, dst + (row - piece.row_start) * out_row)
+                        h.update(data)
+                        written += len(data)
+                    digests[piece.info.name] = h.hexdigest()
+                    tracer.tensor(piece.info.name, piece_start, time.time() - piece_start, piece.info.n_bytes)
+        finally:
+            src.close()
+    return shard, written, time.time() - start, digests
+
+
+def preallocate(path, size):
+    """Create the output at its final size so workers can write anywhere in it"""
+    with open(path, 'wb') as f:
+        f.truncate(size)
+        if hasattr(os, "posix_fallocate"):
+            try:
+                os.posix_fallocate(f.fileno(), 0, size)
+            except OSError:
+                pass  # sparse file is fine when the filesystem can't reserve space
+
+
+def convert(model_dir, output_path, workers=None, split_ffn=True, gate_first=True, add_bias=True,
+            tokenizer_pre="default"):
+    """Convert a sharded HF checkpoint to an F16 GGUF; returns the number of tensors written"""
+    start = time.time()
+    tracer = get_tracer()
+    with open(os.path.join(model_dir, "config.json"), 'r') as f:
+        cfg = json.load(f)
+
+    with tracer.stage("plan"):
+        tensors = scan_shards(model_dir)
+        infos, work, skipped = plan_layout(tensors, split_ffn, gate_first, add_bias)
+    for name in skipped:
+        print(f"[convert] Skipping unmapped tensor {name}")
+
+    vocab_size = next((i.shape[1] for i in infos if i.name == "token_embd.weight"), cfg.get("vocab_size", 0))
+    # Spare header bytes let gguf_inplace add tensors later without moving data
+    kv = reserve_header_space(build_kv(cfg, model_dir, vocab_size, tokenizer_pre))
+    header = serialize_header(GGUF_VERSION, kv, infos)
+    data_offset = align_offset(len(header), ALIGNMENT)
+    last = infos[-1]
+    total = data_offset + align_offset(last.offset + last.n_bytes, ALIGNMENT)
+
+    print(f"[convert] {len(tensors)} source tensors in {len(work)} shards -> {len(infos)} GGUF tensors")
+    print(f"[convert] Preallocating {output_path} ({total / (1024**3):.2f} GB)")
+    with tracer.stage("preallocate", bytes=total):
+        preallocate(output_path, total)
+        with open(output_path, 'r+b') as f:
+            f.write(header)
+    # The zero bias is already there: preallocated space reads as zeros
+
+    workers = workers or os.cpu_count() or 1
+    workers = max(1, min(workers, len(work)))
+    print(f"[convert] Converting with {workers} worker processes...")
+    written = 0
+    digests = {}
+    with tracer.stage("convert", workers=workers) as stage, ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(convert_shard, shard, items, output_path, data_offset)
+                   for shard, items in work.items()]
+        for done, future in enumerate(as_completed(futures), 1):
+            shard, n_bytes, seconds, shard_digests = future.result()
+            written += n_bytes
+            digests.update(shard_digests)
+            print(f"[convert] [{done}/{len(futures)}] {os.path.basename(shard)}: "
+                  f"{n_bytes / (1024**2):.1f} MB in {seconds:.1f}s")
+        stage["converted_bytes"] = written
+
+    elapsed = time.time() - start
+    print(f"[convert] Wrote {written / (1024**3):.2f} GB in {elapsed:.1f}s "
+          f"({written / (1024**2) / max(elapsed, 1e-9):.1f} MB/s)")
+
+    # Workers write out of order, so the table has tensor digests but no flat file digest
+    for info in infos:
+        if info.name not in digests:
+            digests[info.name] = hashlib.sha256(b'\0' * info.n_bytes).hexdigest()
+    tensor_sums = [{"name": i.name, "offset": data_offset + i.offset, "n_bytes": i.n_bytes,
+                    "sha256": digests[i.name]} for i in infos]
+    header_sha = hashlib.sha256(header + b'\0' * (data_offset - len(header))).hexdigest()
+    save_sidecar(output_path, make_sidecar(output_path, header_sha, data_offset, tensor_sums))
+
+    with tracer.stage("verify"):
+        check = read_header(output_path)
+    if len(check.tensors) != len(infos):
+        raise ValueError(f"Verification failed: {len(check.tensors)} tensors, expected {len(infos)}")
+    print(f"[verify] {len(check.tensors)} tensors, output_norm.bias: {check.tensor('output_norm.bias') is not None}")
+    return len(infos)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Parallel Mibera safetensors -> GGUF F16 conversion")
+    parser.add_argument("model_dir", help="HF model directory with model-*.safetensors and config.json")
+    parser.add_argument("--outfile", default="output/mibera-f16.gguf", help="Output GGUF path")
+    parser.add_argument("--workers", type=int, help="Worker processes (default: CPU count)")
+    parser.add_argument("--no-split-ffn", action="store_true", help="Keep gate_up_proj fused as ffn_up")
+    parser.add_argument("--swap-ffn", action="store_true", help="Treat the second half of gate_up_proj as gate")
+    parser.add_argument("--no-bias", action="store_true", help="Don't inject output_norm.bias")
+    parser.add_argument("--tokenizer-pre", default="default", help="tokenizer.ggml.pre value")
+    args = parser.parse_args()
+
+    out_dir = os.path.dirname(args.outfile)
+    if out_dir:
+        os.makedirs(out_dir, exist_ok=True)
+    start_trace("convert_mibera_parallel")
+    convert(args.model_dir, args.outfile, workers=args.workers, split_ffn=not args.no_split_ffn,
+            gate_first=not args.swap_ffn, add_bias=not args.no_bias, tokenizer_pre=args.tokenizer_pre)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,17 +1,18 @@
 # download_mibera.py - Download Q3_K_M + evaluation from cloud
 
 import os
-import subprocess
 import sys
 from pathlib import Path
 
+from mibera_fetch import open_source, fetch_checksums, download, sync_dir, Stats
+
 def download_artifacts():
     """Download Mibera Q3_K_M and evaluation artifacts"""
     
     print("=== MIBERA Q3_K_M DOWNLOAD ===")
     
     # Get connection details
-    cloud_ip = input("Cloud instance IP: ").strip()
+    cloud_ip = input("Cloud instance IP (or http://host:port/ of mibera_fetch.py serve): ").strip()
     cloud_port = input("SSH port (default 22): ").strip() or "22"
     
     if not cloud_ip:
@@ -26,40 +27,38 @@ def download_artifacts():
     
     # Files to download
     downloads = [
-        # Core model
-        ("root@{ip}:/workspace/mibera/output/mibera-Q3_K_M.gguf", local_models / "mibera-Q3_K_M.gguf"),
-        ("root@{ip}:/workspace/mibera/output/mibera-checksums.txt", local_models / "mibera-checksums.txt"),
-        ("root@{ip}:/workspace/mibera/output/mibera_report.txt", local_eval / "mibera_report.txt"),
-        
-        # Evaluation results
-        ("root@{ip}:/workspace/mibera/eval/", local_eval / "samples/")
+        ("output/mibera-Q3_K_M.gguf", local_models / "mibera-Q3_K_M.gguf"),
+        ("output/mibera-checksums.txt", local_models / "mibera-checksums.txt"),
+        ("output/mibera_report.txt", local_eval / "mibera_report.txt"),
     ]
     
-    success_count = 0
-    for remote_pattern, local_path in downloads:
-        remote_path = remote_pattern.format(ip=cloud_ip)
-        print(f"\nDownloading {remote_path.split('/')[-1]}...")
-        
-        if str(remote_path).endswith('/'):
-            # Directory download
-            local_path.mkdir(exist_ok=True)
-            cmd = ["scp", "-P", cloud_port, "-r", remote_path, str(local_path.parent)]
-        else:
-            # File download
-            cmd = ["scp", "-P", cloud_port, remote_path, str(local_path)]
-        
+    # Parallel ranges, resume from the .part journal, SHA-256 checked against the manifest
+    if cloud_ip.startswith("http"):
+        source = open_source(cloud_ip)
+    else:
+        source = open_source(f"ssh://root@{cloud_ip}:{cloud_port}/workspace/mibera")
+    stats = Stats()
+    try:
+        sums = fetch_checksums(source)
+        success_count = 0
+        for remote_path, local_path in downloads:
+            print(f"\nDownloading {remote_path.split('/')[-1]}...")
+            try:
+                if download(source, remote_path, str(local_path), sums.get(os.path.basename(remote_path)),
+                            stats=stats):
+                    success_count += 1
+            except Exception as e:
+                print(f"✗ Failed: {e} (run again to resume)")
+
+        # Evaluation results: only new or changed files
         try:
-            subprocess.run(cmd, check=True, capture_output=True)
-            if local_path.exists() or (local_path.parent / "eval").exists():
-                print(f"✓ Downloaded successfully")
-                success_count += 1
-            else:
-                print(f"⚠ Download unclear")
-        except subprocess.CalledProcessError as e:
-            print(f"✗ Failed: {e}")
-        except FileNotFoundError:
-            print("ERROR: SCP not available. Install Git for Windows or use WinSCP")
-            return False
+            sync_dir(source, "eval", str(local_eval / "samples"), stats)
+        except Exception as e:
+            print(f"✗ Failed to sync evaluation files: {e} (run again to resume)")
+    except FileNotFoundError:
+        print("ERROR: SSH not available. Install Git for Windows or OpenSSH")
+        return False
+    print(f"\n{stats.bytes / (1024**2):.1f} MB transferred ({stats.rate():.1f} MB/s aggregate)")
     
     # Verify main model
     model_file = local_models / "mibera-Q3_K_M.gguf"
@@ -67,11 +66,6 @@ def download_artifacts():
         size_gb = model_file.stat().st_size / (1024**3)
         print(f"\n✓ Mibera Q3_K_M ready: {size_gb:.1f}GB")
         
-        # Verify checksum if available
-        checksum_file = local_models / "mibera-checksums.txt"
-        if checksum_file.exists():
-            print("Checksum verification available")
-        
         print(f"\nReady to run:")
         print(f"cd C:\\mibera")
         print(f".\\run_mibera_final.ps1 -Mode Mibera")
@@ -2,20 +2,16 @@
 """
 Add missing output_norm.bias tensor to GGUF model
 """
-import numpy as np
-from gguf import GGUFReader, GGUFWriter
+from gguf_io import read_header, embedding_length
+from gguf_stream import rewrite, AddOutputNormBias, DEFAULT_MAX_MEMORY
 import argparse
-import os
 
-def add_missing_bias(input_path, output_path):
+def add_missing_bias(input_path, output_path, max_memory=DEFAULT_MAX_MEMORY):
     print(f"Reading {input_path}...")
-    reader = GGUFReader(input_path)
+    header = read_header(input_path)
     
     # Check if output_norm.bias already exists
-    tensor_names = []
-    for tensor in reader.tensors:
-        name = tensor.name if isinstance(tensor.name, str) else tensor.name.decode('utf-8')
-        tensor_names.append(name)
+    tensor_names = header.tensor_names()
     
     if "output_norm.bias" in tensor_names:
         print("output_norm.bias already exists!")
@@ -24,32 +20,12 @@ def add_missing_bias(input_path, output_path):
     print(f"Found {len(tensor_names)} tensors")
     print("Missing: output_norm.bias")
     
-    # Create writer
-    writer = GGUFWriter(output_path, reader.fields["general.architecture"])
-    
-    # Copy all metadata
-    print("Copying metadata...")
-    for field in reader.fields:
-        writer.add_field(field, reader.fields[field])
-    
-    # Copy all existing tensors
-    print("Copying tensors...")
-    for tensor in reader.tensors:
-        data = tensor.data
-        name = tensor.name if isinstance(tensor.name, str) else tensor.name.decode('utf-8')
-        writer.add_tensor(name, data)
-    
     # Add missing bias tensor (zeros, size = embedding_length)
-    embedding_length = reader.fields.get("phi2.embedding_length", 5120)
-    print(f"Adding output_norm.bias (size: {embedding_length})")
-    bias_data = np.zeros(embedding_length, dtype=np.float32)
-    writer.add_tensor("output_norm.bias", bias_data)
+    embd_length = embedding_length(header)
+    print(f"Adding output_norm.bias (size: {embd_length})")
     
     print("Writing file...")
-    writer.write_header_to_file()
-    writer.write_kv_data_to_file()
-    writer.write_tensors_to_file()
-    writer.close()
+    rewrite(input_path, output_path, [AddOutputNormBias(embd_length)], max_memory=max_memory)
     
     print(f"Fixed model saved to: {output_path}")
     return True
@@ -57,7 +33,16 @@ def add_missing_bias(input_path, output_path):
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument("input", help="Input GGUF file")
-    parser.add_argument("output", help="Output GGUF file")
+    parser.add_argument("output", nargs="?", help="Output GGUF file (omit with --in-place)")
+    parser.add_argument("--in-place", action="store_true", help="Patch the header and append the bias without rewriting tensors")
+    parser.add_argument("--dry-run", action="store_true", help="With --in-place, report how many bytes would move")
+    parser.add_argument("--max-memory", type=int, default=DEFAULT_MAX_MEMORY // (1024**2), help="Memory ceiling for streaming copies (MB)")
     args = parser.parse_args()
     
-    add_missing_bias(args.input, args.output)
\ No newline at end of file
+    if args.in_place:
+        from gguf_inplace import add_output_norm_bias_in_place
+        add_output_norm_bias_in_place(args.input, dry_run=args.dry_run)
+    elif args.output:
+        add_missing_bias(args.input, args.output, max_memory=args.max_memory * 1024**2)
+    else:
+        parser.error("output is required unless --in-place is given")
\ No newline at end of file
@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+Batch output_norm.bias fixer for a whole quant set.
+
+Files matching the given globs are fixed by a process pool. Separate reader
+and writer limits keep disks busy without thrashing: a worker holds a reader
+slot while it reads the header and plans, and a reader plus a writer slot
+while it streams the source into the output, so at most --readers files are
+being read and --writers written at once (default 2 each). Use --readers 1
+--writers 1 on a single spinning disk, more on NVMe. Files that already
+contain output_norm.bias are skipped from the header alone, unreadable files
+are reported as failures without stopping the batch, each streaming file
+reports MB written and MB/s every PROGRESS_SECONDS, and a per-file summary
+is printed as workers finish.
+"""
+import argparse
+import glob
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from gguf_io import read_header
+
+DEFAULT_READERS = 2
+DEFAULT_WRITERS = 2
+PROGRESS_SECONDS = 10
+
+_read_slots = None
+_write_slots = None
+
+
+def _init_worker(read_slots, write_slots):
+    global _read_slots, _write_slots
+    _read_slots = read_slots
+    _write_slots = write_slots
+
+
+def needs_bias(path):
+    """True when the file is a GGUF without output_norm.bias"""
+    return read_header(path).tensor("output_norm.bias") is None
+
+
+def fix_one(path, in_place, suffix):
+    """Fix a single file; runs in a worker process and returns a result dict"""
+    from gguf_stream import AddOutputNormBias, plan_rewrite, write_plan
+    from gguf_inplace import plan_append, apply_plan, output_norm_bias_tensor, rewrite_in_place
+    from gguf_checksum import refresh_sidecar
+
+    start = time.time()
+    size = os.path.getsize(path)
+    with _read_slots:
+        header = read_header(path)
+        if header.tensor("output_norm.bias") is not None:
+            return {"path": path, "status": "skipped", "seconds": 0.0, "bytes": 0}
+        if in_place:
+            bias = output_norm_bias_tensor(header)
+            plan = plan_append(header, [bias])
+        else:
+            kv, tensors = plan_rewrite(header, [AddOutputNormBias()])
+
+    # Slots are always taken read then write, so workers can't deadlock on them
+    if in_place and plan is None:
+        # Relocation would need an oversized padding KV; stream a replacement instead
+        with _read_slots, _write_slots:
+            rewrite_in_place(path, header, [bias], progress_seconds=PROGRESS_SECONDS)
+        return {"path": path, "status": "fixed", "output": path, "seconds": time.time() - start, "bytes": size}
+    if in_place:
+        with _read_slots, _write_slots:
+            apply_plan(path, plan)
+            # Moved tensors keep their digests; only the header and the bias are re-hashed
+            refresh_sidecar(path)
+        moved = plan.bytes_moved + plan.bytes_appended
+        return {"path": path, "status": "fixed", "output": path, "seconds": time.time() - start, "bytes": moved}
+
+    output = output_path(path, suffix)
+    with _read_slots, _write_slots:
+        write_plan(path, output, header, kv, tensors, progress_every=0, progress_seconds=PROGRESS_SECONDS)
+    return {"path": path, "status": "fixed", "output": output, "seconds": time.time() - start, "bytes": size}
+
+
+def output_path(path, suffix="-fixed"):
+    """Where a rewritten (not in-place) copy of path goes"""
+    return path.replace(".gguf", f"{suffix}.gguf")
+
+
+def expand(patterns):
+    """Expand globs into a sorted, de-duplicated list of .gguf files"""
+    files = []
+    for pattern in patterns:
+        matches = glob.glob(pattern) or ([pattern] if os.path.exists(pattern) else [])
+        if not matches:
+            print(f"Skipping {pattern} - not found")
+        files.extend(m for m in matches if m.endswith(".gguf"))
+    return sorted(set(files))
+
+
+def run_batch(files, workers=3, readers=DEFAULT_READERS, writers=DEFAULT_WRITERS, in_place=False, suffix="-fixed"):
+    """Fix files concurrently; returns the list of result dicts"""
+    todo = []
+    settled = []  # skipped and unreadable files, decided from the header alone
+    for path in files:
+        try:
+            if needs_bias(path):
+                todo.append(path)
+            else:
+                settled.append({"path": path, "status": "skipped", "seconds": 0.0, "bytes": 0})
+                print(f"[batch] {path}: output_norm.bias already present - skipping")
+        except (OSError, ValueError) as e:
+            result = {"path": path, "status": "failed", "error": f"unreadable GGUF header: {e}",
+                      "seconds": 0.0, "bytes": 0}
+            settled.append(result)
+            print(f"[batch] [ERROR] {path}: {result['error']}")
+    if not todo:
+        return settled
+
+    ctx = multiprocessing.get_context("spawn")
+    manager = ctx.Manager()
+    read_slots = manager.Semaphore(readers)
+    write_slots = manager.Semaphore(writers)
+
+    results = list(settled)
+    start = time.time()
+    with ProcessPoolExecutor(max_workers=min(workers, len(todo)), mp_context=ctx,
+                             initializer=_init_worker, initargs=(read_slots, write_slots)) as pool:
+        futures = {pool.submit(fix_one, path, in_place, suffix): path for path in todo}
+        for done, future in enumerate(as_completed(futures), 1):
+            path = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                result = {"path": path, "status": "failed", "error": str(e), "seconds": 0.0, "bytes": 0}
+            results.append(result)
+            report_file(result, done, len(todo))
+    manager.shutdown()
+
+    total = time.time() - start
+    total_mb = sum(r["bytes"] for r in results) / (1024**2)
+    print(f"\n[batch] {len(results)} files in {total:.1f}s, {total_mb:.1f} MB "
+          f"({total_mb / max(total, 1e-9):.1f} MB/s aggregate)")
+    return results
+
+
+def report_file(result, done, total):
+    prefix = f"[{done}/{total}]"
+    if result["status"] == "failed":
+        print(f"{prefix} [ERROR] {result['path']}: {result['error']}")
+        return
+    if result["status"] == "skipped":
+        print(f"{prefix} {result['path']}: already fixed")
+        return
+    mb = result["bytes"] / (1024**2)
+    rate = mb / result["seconds"] if result["seconds"] > 0 else 0.0
+    print(f"{prefix} [OK] {result['path']} -> {result['output']} "
+          f"({mb:.1f} MB in {result['seconds']:.1f}s, {rate:.1f} MB/s)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Add output_norm.bias to many GGUF files in parallel")
+    parser.add_argument("patterns", nargs="*", default=["mibera-*.gguf"], help="Files or globs")
+    parser.add_argument("--workers", type=int, default=3, help="Worker processes")
+    parser.add_argument("--readers", type=int, default=DEFAULT_READERS,
+                        help="Files read concurrently (raise for NVMe, 1 for spindles)")
+    parser.add_argument("--writers", type=int, default=DEFAULT_WRITERS,
+                        help="Files written concurrently (1 for a single spindle)")
+    parser.add_argument("--in-place", action="store_true", help="Patch files in place instead of writing -fixed copies")
+    parser.add_argument("--suffix", default="-fixed", help="Output suffix for rewritten copies")
+    args = parser.parse_args()
+
+    files = [f for f in expand(args.patterns) if not f.endswith(f"{args.suffix}.gguf")]
+    if not files:
+        print("No GGUF files to fix")
+        return 0
+
+    print(f"=== MIBERA BATCH BIAS FIX: {len(files)} files ===")
+    results = run_batch(files, workers=args.workers, readers=args.readers, writers=args.writers,
+                        in_place=args.in_place, suffix=args.suffix)
+    return 1 if any(r["status"] == "failed" for r in results) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
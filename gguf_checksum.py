@@ -0,0 +1,289 @@
+#!/usr/bin/env python3
+"""
+Per-tensor checksum tables for GGUF artifacts.
+
+Writers hash while they write (ChecksumWriter wraps the output file) and save
+a <model>.gguf.sums.json sidecar with a SHA-256 of the header, of every
+tensor's bytes and, for sequential writers, of the whole file. Verification
+then hashes tensors independently across threads (hashlib releases the GIL),
+can be limited to a subset of tensors, and in-place edits only re-hash what
+they added instead of the whole file.
+
+  python gguf_checksum.py verify mibera-Q3_K_M.gguf [--tensors 'blk.3.*']
+  python gguf_checksum.py build mibera-Q3_K_M.gguf
+  python gguf_checksum.py manifest output/*.gguf > mibera-checksums.txt
+"""
+import argparse
+import fnmatch
+import hashlib
+import json
+import mmap
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from gguf_io import read_header
+
+SIDECAR_VERSION = 1
+SIDECAR_SUFFIX = ".sums.json"
+HASH_CHUNK = 64 * 1024 * 1024
+
+
+def sidecar_path(path):
+    return path + SIDECAR_SUFFIX
+
+
+def root_digest(header_sha, tensors):
+    """Digest over the header hash and every (name, tensor hash) in file order"""
+    h = hashlib.sha256(header_sha.encode())
+    for t in tensors:
+        h.update(t["name"].encode() + b'\0' + t["sha256"].encode())
+    return h.hexdigest()
+
+
+def make_sidecar(path, header_sha, data_offset, tensors, file_sha=None):
+    st = os.stat(path)
+    return {
+        "version": SIDECAR_VERSION,
+        "size": st.st_size,
+        "mtime_ns": st.st_mtime_ns,
+        "sha256": file_sha,
+        "header_sha256": header_sha,
+        "data_offset": data_offset,
+        "root": root_digest(header_sha, tensors),
+        "tensors": tensors,
+    }
+
+
+def save_sidecar(path, data):
+    tmp = sidecar_path(path) + ".tmp"
+    with open(tmp, 'w') as f:
+        json.dump(data, f, indent=1)
+    os.replace(tmp, sidecar_path(path))
+    return sidecar_path(path)
+
+
+def load_sidecar(path):
+    try:
+        with open(sidecar_path(path), 'r') as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return data if data.get("version") == SIDECAR_VERSION else None
+
+
+class ChecksumWriter:
+    """File wrapper that hashes everything written, plus each bracketed tensor on its own"""
+
+    def __init__(self, f):
+        self.f = f
+        self.pos = 0
+        self.file_hash = hashlib.sha256()
+        self.header_hash = hashlib.sha256()
+        self.data_offset = None
+        self.tensors = []
+        self._tensor = None
+
+    def write(self, data):
+        self.f.write(data)
+        self.file_hash.update(data)
+        if self.data_offset is None:
+            self.header_hash.update(data)
+        if self._tensor is not None:
+            self._tensor[2].update(data)
+        self.pos += len(data)
+
+    def begin_tensor(self, name):
+        if self.data_offset is None:
+            self.data_offset = self.pos
+        self._tensor = (name, self.pos, hashlib.sha256())
+
+    def end_tensor(self):
+        name, start, h = self._tensor
+        self.tensors.append({"name": name, "offset": start, "n_bytes": self.pos - start, "sha256": h.hexdigest()})
+        self._tensor = None
+
+    def sidecar(self, path):
+        """Sidecar dict for the finished file (call after it is closed)"""
+        if self.data_offset is None:
+            self.data_offset = self.pos
+        return make_sidecar(path, self.header_hash.hexdigest(), self.data_offset, self.tensors,
+                            self.file_hash.hexdigest())
+
+
+def _hash_region(src, start, n_bytes):
+    h = hashlib.sha256()
+    view = memoryview(src)
+    try:
+        pos = start
+        end = start + n_bytes
+        while pos < end:
+            step = min(HASH_CHUNK, end - pos)
+            h.update(view[pos:pos + step])
+            pos += step
+    finally:
+        view.release()
+    return h.hexdigest()
+
+
+def hash_tensors(path, entries, workers=None):
+    """{name: sha256} for entries [{name, offset, n_bytes}] hashed in parallel"""
+    workers = workers or os.cpu_count() or 1
+    with open(path, 'rb') as f:
+        src = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            # Largest first keeps every core busy until the end
+            ordered = sorted(entries, key=lambda e: -e["n_bytes"])
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                digests = pool.map(lambda e: _hash_region(src, e["offset"], e["n_bytes"]), ordered)
+                result = {e["name"]: d for e, d in zip(ordered, digests)}
+        finally:
+            src.close()
+    return result
+
+
+def _header_sha(path, data_offset):
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read(data_offset)).hexdigest()
+
+
+def _entries(header):
+    return [{"name": t.name, "offset": header.data_offset + t.offset, "n_bytes": t.n_bytes}
+            for t in header.tensors]
+
+
+def _file_hash(path):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(HASH_CHUNK), b''):
+            h.update(block)
+    return h.hexdigest()
+
+
+def build_sidecar(path, workers=None, whole_file=False):
+    """Hash an existing file tensor by tensor (in parallel) and save its sidecar
+
+    whole_file also computes the flat digest on a separate thread alongside
+    the tensor hashes, e.g. right after llama-quantize while the file is hot.
+    """
+    header = read_header(path)
+    entries = _entries(header)
+    with ThreadPoolExecutor(max_workers=1) as side:
+        flat = side.submit(_file_hash, path) if whole_file else None
+        digests = hash_tensors(path, entries, workers)
+        file_sha = flat.result() if flat else None
+    for e in entries:
+        e["sha256"] = digests[e["name"]]
+    data = make_sidecar(path, _header_sha(path, header.data_offset), header.data_offset, entries, file_sha)
+    save_sidecar(path, data)
+    return data
+
+
+def refresh_sidecar(path, workers=None):
+    """After an in-place edit: re-hash the header and only tensors the old table doesn't know"""
+    old = load_sidecar(path)
+    if old is None:
+        return None
+    known = {t["name"]: t["sha256"] for t in old["tensors"]}
+    header = read_header(path)
+    entries = _entries(header)
+    digests = hash_tensors(path, [e for e in entries if e["name"] not in known], workers)
+    for e in entries:
+        e["sha256"] = known.get(e["name"]) or digests[e["name"]]
+    # Tensor contents are unchanged when they move, but the flat file digest is not
+    data = make_sidecar(path, _header_sha(path, header.data_offset), header.data_offset, entries, None)
+    save_sidecar(path, data)
+    return data
+
+
+def verify(path, workers=None, patterns=None):
+    """Check a file against its sidecar; returns a list of problems (empty when clean)"""
+    data = load_sidecar(path)
+    if data is None:
+        return [f"no sidecar ({sidecar_path(path)})"]
+    problems = []
+    if os.path.getsize(path) != data["size"]:
+        problems.append(f"size {os.path.getsize(path)} != {data['size']}")
+        return problems
+    if _header_sha(path, data["data_offset"]) != data["header_sha256"]:
+        problems.append("header changed")
+
+    entries = data["tensors"]
+    if patterns:
+        entries = [e for e in entries if any(fnmatch.fnmatchcase(e["name"], p) for p in patterns)]
+    digests = hash_tensors(path, entries, workers)
+    for e in entries:
+        if digests[e["name"]] != e["sha256"]:
+            problems.append(f"{e['name']}: sha256 mismatch")
+    return problems
+
+
+def sidecar_digests(path):
+    """{name: sha256} from a sidecar that still matches the file, else None"""
+    data = load_sidecar(path)
+    st = os.stat(path)
+    if not data or data["size"] != st.st_size or data["mtime_ns"] != st.st_mtime_ns:
+        return None
+    return {t["name"]: t["sha256"] for t in data["tensors"]}
+
+
+def tensor_digests(path, workers=None):
+    """{name: sha256} of every tensor, from a valid sidecar or hashed in parallel"""
+    digests = sidecar_digests(path)
+    if digests is None:
+        digests = hash_tensors(path, _entries(read_header(path)), workers)
+    return digests
+
+
+def file_sha256(path):
+    """Whole-file digest, from a sidecar that still matches the file when possible"""
+    data = load_sidecar(path)
+    st = os.stat(path)
+    if data and data.get("sha256") and data["size"] == st.st_size and data["mtime_ns"] == st.st_mtime_ns:
+        return data["sha256"]
+    return _file_hash(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-tensor GGUF checksums")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p = sub.add_parser("verify", help="Check files against their .sums.json sidecars")
+    p.add_argument("files", nargs="+")
+    p.add_argument("--tensors", action="append", help="Only check tensors matching this glob (repeatable)")
+    p.add_argument("--workers", type=int, help="Hashing threads (default: CPU count)")
+    p = sub.add_parser("build", help="Create sidecars for existing files")
+    p.add_argument("files", nargs="+")
+    p.add_argument("--workers", type=int, help="Hashing threads (default: CPU count)")
+    p.add_argument("--whole-file", action="store_true", help="Also record the flat file digest")
+    p = sub.add_parser("manifest", help="Print sha256sum-style lines (sidecar digest when still valid)")
+    p.add_argument("files", nargs="+")
+    args = parser.parse_args()
+
+    if args.command == "manifest":
+        for path in args.files:
+            print(f"{file_sha256(path)}  {os.path.basename(path)}")
+        return 0
+
+    failed = False
+    for path in args.files:
+        start = time.time()
+        if args.command == "build":
+            data = build_sidecar(path, args.workers, args.whole_file)
+            print(f"[sums] {path}: {len(data['tensors'])} tensors hashed in {time.time() - start:.1f}s")
+            continue
+        problems = verify(path, args.workers, args.tensors)
+        elapsed = time.time() - start
+        if problems:
+            failed = True
+            print(f"[sums] {path}: FAILED ({elapsed:.1f}s)")
+            for problem in problems:
+                print(f"  - {problem}")
+        else:
+            mb = os.path.getsize(path) / (1024**2)
+            print(f"[sums] {path}: OK ({elapsed:.1f}s, {mb / max(elapsed, 1e-9):.0f} MB/s)")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
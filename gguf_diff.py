@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+"""
+Tensor-level diff between two GGUF files.
+
+Compares the KV metadata and the tensor-info tables (added, removed,
+reshaped or retyped tensors), then hashes the data of every tensor present in
+both files in fixed-size chunks over mmap, with both files and all chunks
+spread across threads (hashlib releases the GIL), so large tensors such as
+token_embd use every core too. When both files carry a still-valid
+.sums.json sidecar (gguf_checksum.py) its per-tensor digests are used and
+unchanged tensors are never read. For tensors whose bytes differ and whose
+dtype matches, numeric deltas are computed with numpy: max/mean/RMS error
+for float tensors, the share of changed blocks for quantized ones.
+
+  python gguf_diff.py mibera-Q3_K_M.gguf mibera-Q3_K_M-fixed.gguf
+  python gguf_diff.py a.gguf b.gguf --tensors 'blk.0.*' --json diff.json
+  python gguf_diff.py a.gguf b.gguf --no-data        # metadata and tables only
+"""
+import argparse
+import fnmatch
+import hashlib
+import json
+import mmap
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from gguf_checksum import sidecar_digests
+from gguf_io import GGML_TYPES, format_value, read_header
+from gguf_trace import get_tracer
+
+DIFF_CHUNK = 16 * 1024 * 1024
+DELTA_CHUNK = 4 * 1024 * 1024  # elements per numpy pass, bounds memory per thread
+
+_FLOAT_DTYPES = {"F32": np.float32, "F16": np.float16, "F64": np.float64}
+
+
+def diff_kv(a, b):
+    """{added, removed, changed} KV keys; changed entries are (key, old, new) printable values"""
+    added = [k for k in b.kv if k not in a.kv]
+    removed = [k for k in a.kv if k not in b.kv]
+    changed = []
+    for key, (vtype, value) in a.kv.items():
+        if key in b.kv and b.kv[key] != (vtype, value):
+            changed.append((key, format_value(vtype, value), format_value(*b.kv[key])))
+    return {"added": added, "removed": removed, "changed": changed}
+
+
+def diff_tables(a, b, patterns=None):
+    """(added, removed, reshaped, common) tensor names; reshaped covers shape or dtype changes"""
+    def keep(name):
+        return not patterns or any(fnmatch.fnmatchcase(name, p) for p in patterns)
+
+    old = {t.name: t for t in a.tensors if keep(t.name)}
+    new = {t.name: t for t in b.tensors if keep(t.name)}
+    added = [n for n in new if n not in old]
+    removed = [n for n in old if n not in new]
+    reshaped, common = [], []
+    for name, info in old.items():
+        if name not in new:
+            continue
+        other = new[name]
+        if info.shape != other.shape or info.tensor_type != other.tensor_type:
+            reshaped.append(name)
+        else:
+            common.append(name)
+    return added, removed, reshaped, common
+
+
+def _hash_chunk(src, start, n_bytes):
+    view = memoryview(src)
+    try:
+        return hashlib.sha256(view[start:start + n_bytes]).digest()
+    finally:
+        view.release()
+
+
+def chunk_digests(jobs, workers=None, chunk=DIFF_CHUNK):
+    """Hash [(key, src, offset, n_bytes)] in chunk-sized pieces across threads; {key: [digest, ...]}"""
+    pieces = []
+    for key, src, offset, n_bytes in jobs:
+        for i, start in enumerate(range(0, max(n_bytes, 1), chunk)):
+            pieces.append((key, i, src, offset + start, min(chunk, n_bytes - start)))
+    # Largest first keeps every core busy until the end
+    pieces.sort(key=lambda p: -p[4])
+    with ThreadPoolExecutor(max_workers=workers or os.cpu_count() or 1) as pool:
+        digests = pool.map(lambda p: _hash_chunk(p[2], p[3], p[4]), pieces)
+        result = {}
+        for (key, i, _, _, _), digest in zip(pieces, digests):
+            result.setdefault(key, {})[i] = digest
+    return {key: [parts[i] for i in sorted(parts)] for key, parts in result.items()}
+
+
+def _as_float32(raw, type_name):
+    if type_name == "BF16":
+        return (np.frombuffer(raw, dtype=np.uint16).astype(np.uint32) << 16).view(np.float32)
+    return np.frombuffer(raw, dtype=_FLOAT_DTYPES[type_name]).astype(np.float32)
+
+
+def numeric_delta(src_a, src_b, off_a, off_b, info):
+    """Vectorized error statistics between two same-typed tensors"""
+    type_name, block, type_size = GGML_TYPES[info.tensor_type]
+    n_bytes = info.n_bytes
+    if type_name not in _FLOAT_DTYPES and type_name != "BF16":
+        # Quantized: compare whole blocks, the unit llama.cpp dequantizes
+        n_blocks = n_bytes // type_size
+        rows = max(1, DELTA_CHUNK // type_size)
+        changed = 0
+        for first in range(0, n_blocks, rows):
+            count = min(rows, n_blocks - first)
+            start = first * type_size
+            a = np.frombuffer(src_a, dtype=np.uint8, count=count * type_size, offset=off_a + start)
+            b = np.frombuffer(src_b, dtype=np.uint8, count=count * type_size, offset=off_b + start)
+            changed += int(np.any(a.reshape(count, type_size) != b.reshape(count, type_size), axis=1).sum())
+        return {"kind": "blocks", "blocks": n_blocks, "changed_blocks": changed,
+                "changed_fraction": changed / n_blocks if n_blocks else 0.0}
+
+    elem = type_size
+    n_elements = n_bytes // elem
+    changed = 0
+    max_abs = 0.0
+    sum_abs = sum_sq = ref_sq = 0.0
+    for first in range(0, n_elements, DELTA_CHUNK):
+        count = min(DELTA_CHUNK, n_elements - first)
+        start = first * elem
+        a = _as_float32(src_a[off_a + start:off_a + start + count * elem], type_name)
+        b = _as_float32(src_b[off_b + start:off_b + start + count * elem], type_name)
+        d = np.abs(b - a)
+        changed += int(np.count_nonzero(d))
+        max_abs = max(max_abs, float(np.nanmax(d)) if count else 0.0)
+        sum_abs += float(d.sum(dtype=np.float64))
+        sum_sq += float(np.square(d, dtype=np.float64).sum())
+        ref_sq += float(np.square(a, dtype=np.float64).sum())
+    n = max(n_elements, 1)
+    rms = (sum_sq / n) ** 0.5
+    ref_rms = (ref_sq / n) ** 0.5
+    return {"kind": "float", "elements": n_elements, "changed": changed, "max_abs": max_abs,
+            "mean_abs": sum_abs / n, "rms": rms, "rel_rms": rms / ref_rms if ref_rms else None}
+
+
+def diff_files(path_a, path_b, patterns=None, data=True, workers=None, chunk=DIFF_CHUNK):
+    """Full diff as a dict (see main() for the report)"""
+    tracer = get_tracer()
+    a, b = read_header(path_a), read_header(path_b)
+    added, removed, reshaped, common = diff_tables(a, b, patterns)
+    result = {
+        "a": path_a, "b": path_b,
+        "kv": diff_kv(a, b),
+        "added": [{"name": n, "shape": b.tensor(n).shape, "type": b.tensor(n).type_name} for n in added],
+        "removed": [{"name": n, "shape": a.tensor(n).shape, "type": a.tensor(n).type_name} for n in removed],
+        "reshaped": [{"name": n, "old": [a.tensor(n).shape, a.tensor(n).type_name],
+                      "new": [b.tensor(n).shape, b.tensor(n).type_name]} for n in reshaped],
+        "changed": [], "identical": 0, "bytes_compared": 0, "seconds": 0.0,
+    }
+    if not data or not common:
+        return result
+
+    start = time.time()
+    infos_a = {t.name: t for t in a.tensors}
+    infos_b = {t.name: t for t in b.tensors}
+    with open(path_a, 'rb') as fa, open(path_b, 'rb') as fb:
+        src_a = mmap.mmap(fa.fileno(), 0, access=mmap.ACCESS_READ)
+        src_b = mmap.mmap(fb.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            sums_a, sums_b = sidecar_digests(path_a), sidecar_digests(path_b)
+            to_hash = common
+            candidates = []
+            if sums_a and sums_b:
+                known = [n for n in common if n in sums_a and n in sums_b]
+                candidates = [n for n in known if sums_a[n] != sums_b[n]]
+                known_set = set(known)
+                to_hash = [n for n in common if n not in known_set]
+                print(f"[diff] Sidecar digests cover {len(known)} tensors; hashing {len(to_hash)}")
+
+            with tracer.stage("diff-hash", tensors=len(to_hash)) as stage:
+                jobs = []
+                for n in to_hash:
+                    jobs.append(((0, n), src_a, a.data_offset + infos_a[n].offset, infos_a[n].n_bytes))
+                    jobs.append(((1, n), src_b, b.data_offset + infos_b[n].offset, infos_b[n].n_bytes))
+                digests = chunk_digests(jobs, workers, chunk)
+                stage["bytes"] = sum(j[3] for j in jobs)
+            chunks_changed = {}
+            for n in to_hash:
+                da, db = digests[(0, n)], digests[(1, n)]
+                diff_chunks = sum(1 for x, y in zip(da, db) if x != y)
+                if diff_chunks:
+                    candidates.append(n)
+                    chunks_changed[n] = (diff_chunks, len(da))
+
+            with tracer.stage("diff-delta", tensors=len(candidates)):
+                def delta(name):
+                    info = infos_a[name]
+                    return numeric_delta(src_a, src_b, a.data_offset + info.offset,
+                                         b.data_offset + infos_b[name].offset, info)
+                with ThreadPoolExecutor(max_workers=workers or os.cpu_count() or 1) as pool:
+                    deltas = list(pool.map(delta, candidates))
+        finally:
+            src_a.close()
+            src_b.close()
+
+    order = {t.name: i for i, t in enumerate(a.tensors)}
+    for name, d in sorted(zip(candidates, deltas), key=lambda x: order[x[0]]):
+        entry = {"name": name, "type": infos_a[name].type_name, "n_bytes": infos_a[name].n_bytes, "delta": d}
+        if name in chunks_changed:
+            entry["chunks_changed"] = list(chunks_changed[name])
+        result["changed"].append(entry)
+    result["identical"] = len(common) - len(candidates)
+    result["bytes_compared"] = sum(infos_a[n].n_bytes + infos_b[n].n_bytes for n in to_hash)
+    result["seconds"] = time.time() - start
+    return result
+
+
+def is_identical(result):
+    kv = result["kv"]
+    return not (kv["added"] or kv["removed"] or kv["changed"] or result["added"] or result["removed"]
+                or result["reshaped"] or result["changed"])
+
+
+def _format_delta(d):
+    if d["kind"] == "blocks":
+        return f"{d['changed_blocks']}/{d['blocks']} blocks changed ({d['changed_fraction']:.1%})"
+    rel = f", rel RMS {d['rel_rms']:.2e}" if d["rel_rms"] is not None else ""
+    return (f"{d['changed']}/{d['elements']} elements changed, max |d| {d['max_abs']:.3g}, "
+            f"mean |d| {d['mean_abs']:.3g}, RMS {d['rms']:.3g}{rel}")
+
+
+def report(result, limit=40):
+    kv = result["kv"]
+    print(f"[diff] a: {result['a']}")
+    print(f"[diff] b: {result['b']}")
+    for key in kv["added"]:
+        print(f"  + kv {key}")
+    for key in kv["removed"]:
+        print(f"  - kv {key}")
+    for key, old, new in kv["changed"]:
+        print(f"  ~ kv {key}: {old} -> {new}")
+    for t in result["added"]:
+        print(f"  + {t['name']} {t['shape']} {t['type']}")
+    for t in result["removed"]:
+        print(f"  - {t['name']} {t['shape']} {t['type']}")
+    for t in result["reshaped"]:
+        print(f"  ~ {t['name']}: {t['old'][0]} {t['old'][1]} -> {t['new'][0]} {t['new'][1]}")
+    for t in result["changed"][:limit]:
+        print(f"  * {t['name']} ({t['type']}): {_format_delta(t['delta'])}")
+    if len(result["changed"]) > limit:
+        print(f"  ... {len(result['changed']) - limit} more changed tensors")
+
+    print(f"[diff] kv: +{len(kv['added'])} -{len(kv['removed'])} ~{len(kv['changed'])}; "
+          f"tensors: +{len(result['added'])} -{len(result['removed'])} ~{len(result['reshaped'])} reshaped, "
+          f"{len(result['changed'])} changed, {result['identical']} identical")
+    if result["bytes_compared"]:
+        mb = result["bytes_compared"] / (1024**2)
+        print(f"[diff] Hashed {mb:.0f} MB in {result['seconds']:.1f}s "
+              f"({mb / max(result['seconds'], 1e-9):.0f} MB/s)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tensor-level diff between two GGUF files")
+    parser.add_argument("a", help="Old GGUF")
+    parser.add_argument("b", help="New GGUF")
+    parser.add_argument("--tensors", action="append", help="Only compare tensors matching this glob (repeatable)")
+    parser.add_argument("--no-data", action="store_true", help="Compare metadata and tensor tables only")
+    parser.add_argument("--workers", type=int, help="Hashing threads (default: CPU count)")
+    parser.add_argument("--chunk-mb", type=int, default=DIFF_CHUNK // (1024**2), help="Hash chunk size")
+    parser.add_argument("--limit", type=int, default=40, help="Changed tensors to list")
+    parser.add_argument("--json", help="Also write the full diff as JSON")
+    args = parser.parse_args()
+
+    result = diff_files(args.a, args.b, args.tensors, not args.no_data, args.workers, args.chunk_mb * 1024**2)
+    report(result, args.limit)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(result, f, indent=1)
+        print(f"[diff] Wrote {args.json}")
+    # Like diff(1): 0 identical, 1 different
+    return 0 if is_identical(result) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
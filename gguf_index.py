@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+Persistent tensor manifest for GGUF files.
+
+The index (name, layer, kind, dtype, shape, absolute offset, byte size per
+tensor, plus metadata) is built once from the header and cached as a
+<model>.gguf.idx.json sidecar, or under ~/.cache/mibera-gguf-index when the
+model directory is read-only. It is keyed by file size, mtime and a hash of
+the header bytes, so repeated inspections are a JSON load instead of a parse.
+"""
+import argparse
+import fnmatch
+import hashlib
+import json
+import os
+import re
+import sys
+
+from gguf_io import ARRAY, read_header
+
+INDEX_VERSION = 1
+INDEX_SUFFIX = ".idx.json"
+CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "mibera-gguf-index")
+
+_LAYER_RE = re.compile(r"^blk\.(\d+)\.(.+)$")
+
+
+def split_name(name):
+    """'blk.3.ffn_up.weight' -> (3, 'ffn_up.weight'); non-block tensors have layer None"""
+    m = _LAYER_RE.match(name)
+    if m:
+        return int(m.group(1)), m.group(2)
+    return None, name
+
+
+def _header_hash(path, header_size):
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read(header_size)).hexdigest()
+
+
+def _candidate_paths(path):
+    abs_path = os.path.abspath(path)
+    cache_name = hashlib.sha1(abs_path.encode('utf-8')).hexdigest() + ".json"
+    return [abs_path + INDEX_SUFFIX, os.path.join(CACHE_DIR, cache_name)]
+
+
+class TensorIndex:
+    """Query interface over an index dict"""
+
+    def __init__(self, data):
+        self.data = data
+        self.tensors = data["tensors"]
+        self._by_name = {t["name"]: t for t in self.tensors}
+
+    @property
+    def kv(self):
+        return self.data["kv"]
+
+    @property
+    def header_size(self):
+        return self.data["header_size"]
+
+    def get(self, name):
+        return self._by_name.get(name)
+
+    def names(self):
+        return [t["name"] for t in self.tensors]
+
+    def layers(self):
+        return sorted({t["layer"] for t in self.tensors if t["layer"] is not None})
+
+    def by_layer(self, layer):
+        return [t for t in self.tensors if t["layer"] == layer]
+
+    def by_kind(self, pattern):
+        """Tensors whose kind matches a glob, e.g. 'ffn_*' or 'attn_qkv.weight'"""
+        return [t for t in self.tensors if fnmatch.fnmatchcase(t["kind"], pattern)]
+
+
+def build_index(path):
+    """Parse the header and build a fresh index dict"""
+    header = read_header(path)
+    st = os.stat(path)
+    tensors = []
+    for info in header.tensors:
+        layer, kind = split_name(info.name)
+        tensors.append({
+            "name": info.name,
+            "layer": layer,
+            "kind": kind,
+            "dtype": info.type_name,
+            "shape": info.shape,
+            "offset": header.data_offset + info.offset,
+            "n_bytes": info.n_bytes,
+        })
+    return {
+        "version": INDEX_VERSION,
+        "size": st.st_size,
+        "mtime_ns": st.st_mtime_ns,
+        "header_size": header.header_size,
+        "header_hash": _header_hash(path, header.header_size),
+        # Arrays (token lists, merges) are summarized by length to keep the index small
+        "kv": {k: {"array_len": len(v[1])} if vtype == ARRAY else v for k, (vtype, v) in header.kv.items()},
+        "tensors": tensors,
+    }
+
+
+def _save(path, data):
+    for candidate in _candidate_paths(path):
+        try:
+            os.makedirs(os.path.dirname(candidate), exist_ok=True)
+            tmp = candidate + ".tmp"
+            with open(tmp, 'w') as f:
+                json.dump(data, f)
+            os.replace(tmp, candidate)
+            return candidate
+        except OSError:
+            continue
+    return None
+
+
+def _load_cached(path, st):
+    for candidate in _candidate_paths(path):
+        try:
+            with open(candidate, 'r') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            continue
+        if data.get("version") != INDEX_VERSION or data.get("size") != st.st_size:
+            continue
+        if data.get("mtime_ns") == st.st_mtime_ns:
+            return data
+        # Touched but maybe unchanged: the header hash decides
+        if _header_hash(path, data["header_size"]) == data["header_hash"]:
+            data["mtime_ns"] = st.st_mtime_ns
+            _save(path, data)
+            return data
+    return None
+
+
+def load_index(path, rebuild=False):
+    """Return a TensorIndex for path, using the cached sidecar when it is still valid"""
+    st = os.stat(path)
+    data = None if rebuild else _load_cached(path, st)
+    if data is None:
+        data = build_index(path)
+        _save(path, data)
+    return TensorIndex(data)
+
+
+def print_tensors(tensors):
+    for t in tensors:
+        print(f"  {t['name']}: {t['dtype']} {t['shape']} @ {t['offset']} ({t['n_bytes']} bytes)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Query a cached GGUF tensor index")
+    parser.add_argument("file", help="GGUF file")
+    parser.add_argument("--layer", type=int, help="Show tensors of one layer")
+    parser.add_argument("--kind", help="Show tensors whose kind matches a glob (e.g. 'ffn_*')")
+    parser.add_argument("--rebuild", action="store_true", help="Ignore the cached index")
+    args = parser.parse_args()
+
+    index = load_index(args.file, rebuild=args.rebuild)
+    tensors = index.tensors
+    if args.layer is not None:
+        tensors = [t for t in tensors if t["layer"] == args.layer]
+    if args.kind:
+        tensors = [t for t in tensors if fnmatch.fnmatchcase(t["kind"], args.kind)]
+
+    if args.layer is None and not args.kind:
+        layers = index.layers()
+        print(f"Tensors: {len(index.tensors)}, layers: {len(layers)}, architecture: {index.kv.get('general.architecture')}")
+    else:
+        print_tensors(tensors)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
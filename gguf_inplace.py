@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+"""
+In-place GGUF patching: append tensors (e.g. output_norm.bias) by rewriting
+only the header and tensor-info table instead of copying the whole file.
+
+The data section must start right after the (aligned) header. When the new
+header no longer fits in front of the first tensor, the leading tensors are
+relocated to the end of the file and their infos moved to the end of the
+table; a padding KV entry then absorbs the gap so the header ends exactly
+where the first kept tensor begins. Only the relocated tensors move, which
+for a phi2 model is usually just token_embd.weight.
+
+Files written by gguf_stream.write_plan and convert_mibera_parallel.py
+already carry HEADER_RESERVE spare bytes in that padding entry, so new
+tensor infos just take space from it and no data moves at all.
+
+llama.cpp wants tensors packed from the start of the data section, so the
+gap can't be left as unreferenced space, and it loads every KV string into
+RAM. The padding is therefore capped at MAX_PADDING; when relocating would
+need more (e.g. the ~220 MB left behind by token_embd.weight, on a file
+without a reserve) the file is streamed once into a temporary copy that
+replaces it, and that copy gets a fresh reserve.
+"""
+import argparse
+import os
+import sys
+import time
+
+from gguf_io import (
+    STRING, GGML_TYPE_F32, HEADER_PADDING_KEY, TensorInfo,
+    read_header, serialize_header, data_order, align_offset, embedding_length,
+)
+from gguf_checksum import refresh_sidecar, sidecar_path
+from gguf_stream import bytes_tensor, source_tensor, write_plan
+
+PADDING_KEY = HEADER_PADDING_KEY
+MAX_PADDING = 64 * 1024
+COPY_CHUNK = 64 * 1024 * 1024
+
+
+class AppendPlan:
+    """Layout produced by plan_append(); nothing is written until apply_plan()"""
+
+    def __init__(self, header_bytes, data_offset, kept, moved, added, file_size):
+        self.header_bytes = header_bytes
+        self.data_offset = data_offset
+        self.kept = kept        # [(TensorInfo, old absolute offset)]
+        self.moved = moved      # [(TensorInfo, old absolute offset)]
+        self.added = added      # [(TensorInfo, bytes)]
+        self.file_size = file_size
+
+    @property
+    def bytes_moved(self):
+        return sum(info.n_bytes for info, _ in self.moved)
+
+    @property
+    def bytes_appended(self):
+        return sum(len(data) for _, data in self.added)
+
+
+def _layout(header, ordered, n_moved, new_tensors, padding):
+    """Build the new header for relocating the first n_moved tensors"""
+    kv = {k: v for k, v in header.kv.items() if k != PADDING_KEY}
+    if padding is not None:
+        kv[PADDING_KEY] = (STRING, padding)
+
+    kept = ordered[n_moved:]
+    moved = ordered[:n_moved]
+    base = header.data_offset + kept[0].offset
+    alignment = header.alignment
+
+    infos = []
+    for info in kept:
+        infos.append(TensorInfo(info.name, info.shape, info.tensor_type, info.offset - kept[0].offset))
+    cursor = align_offset(infos[-1].offset + infos[-1].n_bytes, alignment)
+    for info in moved:
+        infos.append(TensorInfo(info.name, info.shape, info.tensor_type, cursor))
+        cursor = align_offset(cursor + info.n_bytes, alignment)
+    for info, _ in new_tensors:
+        infos.append(TensorInfo(info.name, info.shape, info.tensor_type, cursor))
+        cursor = align_offset(cursor + info.n_bytes, alignment)
+
+    return kv, infos, base, cursor
+
+
+def plan_append(header, new_tensors, max_padding=MAX_PADDING):
+    """Work out the cheapest in-place layout that adds new_tensors [(TensorInfo, bytes)]
+
+    Returns None when the header only fits with more than max_padding bytes
+    of padding KV; rewrite_in_place() handles that case.
+    """
+    for info, data in new_tensors:
+        if header.tensor(info.name) is not None:
+            raise ValueError(f"Tensor already present: {info.name}")
+        if len(data) != info.n_bytes:
+            raise ValueError(f"{info.name}: got {len(data)} bytes, expected {info.n_bytes}")
+
+    ordered = data_order(header)
+    if not ordered:
+        raise ValueError("No tensors to anchor the data section; use a full rewrite")
+
+    for n_moved in range(len(ordered)):
+        kept = ordered[n_moved:]
+        base = header.data_offset + kept[0].offset
+
+        # Without a padding entry the header just has to land in the last alignment window
+        kv, infos, _, data_size = _layout(header, ordered, n_moved, new_tensors, None)
+        size = len(serialize_header(header.version, kv, infos))
+        if align_offset(size, header.alignment) == base:
+            header_bytes = serialize_header(header.version, kv, infos)
+            header_bytes += b'\0' * (base - len(header_bytes))
+        else:
+            kv, infos, _, data_size = _layout(header, ordered, n_moved, new_tensors, "")
+            size = len(serialize_header(header.version, kv, infos))
+            if size > base:
+                continue
+            if base - size > max_padding:
+                # Relocating more tensors would only widen the gap
+                return None
+            kv, infos, _, data_size = _layout(header, ordered, n_moved, new_tensors, " " * (base - size))
+            header_bytes = serialize_header(header.version, kv, infos)
+
+        by_name = {info.name: info for info in infos}
+        return AppendPlan(
+            header_bytes=header_bytes,
+            data_offset=base,
+            kept=[(by_name[t.name], header.data_offset + t.offset) for t in kept],
+            moved=[(by_name[t.name], header.data_offset + t.offset) for t in ordered[:n_moved]],
+            added=[(by_name[info.name], data) for info, data in new_tensors],
+            file_size=base + data_size,
+        )
+
+    return None
+
+
+def _copy_range(f, src, dst, length):
+    """Copy length bytes from src to dst within one file (dst > src, non-overlapping)"""
+    done = 0
+    while done < length:
+        chunk = min(COPY_CHUNK, length - done)
+        f.seek(src + done)
+        data = f.read(chunk)
+        f.seek(dst + done)
+        f.write(data)
+        done += chunk
+
+
+def apply_plan(path, plan):
+    """Write relocated and new tensor data first, then the header, so a crash leaves the old header valid"""
+    with open(path, 'r+b') as f:
+        for info, old_offset in plan.moved:
+            dst = plan.data_offset + info.offset
+            _copy_range(f, old_offset, dst, info.n_bytes)
+        for info, data in plan.added:
+            f.seek(plan.data_offset + info.offset)
+            f.write(data)
+        last = max([i for i, _ in plan.kept + plan.moved] + [i for i, _ in plan.added], key=lambda i: i.offset)
+        end = plan.data_offset + last.offset + last.n_bytes
+        f.seek(end)
+        f.write(b'\0' * (plan.file_size - end))
+        f.truncate(plan.file_size)
+        f.flush()
+        os.fsync(f.fileno())
+
+        f.seek(0)
+        f.write(plan.header_bytes)
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def describe_plan(path, header, plan):
+    """Print what an in-place patch will do"""
+    old_size = os.path.getsize(path)
+    print(f"[inplace] {path}")
+    print(f"  header: {header.data_offset} -> {plan.data_offset} bytes")
+    print(f"  tensors added: {', '.join(info.name for info, _ in plan.added)}")
+    if plan.moved:
+        print(f"  tensors relocated: {', '.join(info.name for info, _ in plan.moved)}")
+    print(f"  bytes moved: {plan.bytes_moved} ({plan.bytes_moved / (1024**2):.1f} MB)")
+    print(f"  bytes appended: {plan.bytes_appended}")
+    print(f"  file size: {old_size} -> {plan.file_size}")
+
+
+def rewrite_in_place(path, header, new_tensors, progress_seconds=None):
+    """Stream path plus new_tensors into a temporary copy that replaces it (needs the file's size free)"""
+    kv = {k: v for k, v in header.kv.items() if k != PADDING_KEY}
+    tensors = [source_tensor(info, header.data_offset) for info in header.tensors]
+    tensors += [bytes_tensor(info.name, info.shape, info.tensor_type, data) for info, data in new_tensors]
+    tmp = path + ".rewrite"
+    try:
+        stats = write_plan(path, tmp, header, kv, tensors, progress_every=0, progress_seconds=progress_seconds)
+    except BaseException:
+        for leftover in (tmp, sidecar_path(tmp)):
+            if os.path.exists(leftover):
+                os.remove(leftover)
+        raise
+    os.replace(tmp, path)
+    if os.path.exists(sidecar_path(tmp)):
+        os.replace(sidecar_path(tmp), sidecar_path(path))
+    return stats
+
+
+def append_tensors_in_place(path, new_tensors, dry_run=False):
+    """Append tensors [(TensorInfo, bytes)] to a GGUF file in place; returns the plan (None if rewritten)"""
+    header = read_header(path)
+    plan = plan_append(header, new_tensors)
+    if plan is None:
+        print(f"[inplace] {path}: header only fits with > {MAX_PADDING // 1024} KB of padding; "
+              f"using a streaming rewrite")
+        if dry_run:
+            copied = os.path.getsize(path) - header.data_offset + sum(len(data) for _, data in new_tensors)
+            print(f"[inplace] Dry run - the rewrite would stream {copied} bytes ({copied / (1024**2):.1f} MB) "
+                  f"into {path}.rewrite, needing that much free disk; file not modified")
+            return None
+        start = time.time()
+        rewrite_in_place(path, header, new_tensors)
+        print(f"[inplace] Rewritten in {time.time() - start:.2f}s")
+        return None
+    describe_plan(path, header, plan)
+    if dry_run:
+        print("[inplace] Dry run - file not modified")
+        return plan
+
+    start = time.time()
+    apply_plan(path, plan)
+    print(f"[inplace] Patched in {time.time() - start:.2f}s")
+    # Moved tensors keep their digests; only the header and new tensors are hashed
+    if refresh_sidecar(path) is not None:
+        print("[inplace] Updated checksum sidecar")
+    return plan
+
+
+def output_norm_bias_tensor(header):
+    """Zero F32 output_norm.bias sized to the model's embedding length"""
+    n_embd = embedding_length(header)
+    info = TensorInfo("output_norm.bias", [n_embd], GGML_TYPE_F32)
+    return info, b'\0' * info.n_bytes
+
+
+def add_output_norm_bias_in_place(path, dry_run=False):
+    """Add output_norm.bias in place; returns False if it was already present"""
+    header = read_header(path)
+    if header.tensor("output_norm.bias") is not None:
+        print(f"[inplace] {path}: output_norm.bias already exists")
+        return False
+    append_tensors_in_place(path, [output_norm_bias_tensor(header)], dry_run=dry_run)
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Add output_norm.bias to GGUF files in place")
+    parser.add_argument("files", nargs="+", help="GGUF files to patch")
+    parser.add_argument("--dry-run", action="store_true", help="Report the plan without writing")
+    args = parser.parse_args()
+
+    failed = 0
+    for path in args.files:
+        if not os.path.exists(path):
+            print(f"Skipping {path} - not found")
+            continue
+        try:
+            add_output_norm_bias_in_place(path, dry_run=args.dry_run)
+        except (ValueError, OSError) as e:
+            print(f"[ERROR] {path}: {e}")
+            failed += 1
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,448 @@
+#!/usr/bin/env python3
+"""
+Minimal GGUF header I/O - parse and serialize the KV section and tensor-info
+table with struct only, so patch tools never have to touch tensor data.
+
+Only the header prefix of the file is read (no mmap, no numpy), and large
+arrays such as the tokenizer vocab stay encoded until someone asks for them,
+so metadata-only tools start in tens of milliseconds:
+
+    python gguf_io.py mibera-Q3_K_M.gguf phi2.embedding_length
+"""
+import struct
+
+GGUF_MAGIC = b'GGUF'
+GGUF_VERSION = 3
+GGUF_DEFAULT_ALIGNMENT = 32
+# Spare header bytes written as a string KV so later tensor appends fit in place (gguf_inplace)
+HEADER_PADDING_KEY = "mibera.header_padding"
+HEADER_RESERVE = 4096
+
+# GGUF metadata value types
+UINT8, INT8, UINT16, INT16, UINT32, INT32, FLOAT32, BOOL, STRING, ARRAY, UINT64, INT64, FLOAT64 = range(13)
+
+_SCALAR_FORMATS = {
+    UINT8: '<B', INT8: '<b', UINT16: '<H', INT16: '<h',
+    UINT32: '<I', INT32: '<i', FLOAT32: '<f', BOOL: '<?',
+    UINT64: '<Q', INT64: '<q', FLOAT64: '<d',
+}
+
+# ggml tensor type id -> (name, elements per block, bytes per block)
+GGML_TYPES = {
+    0: ("F32", 1, 4),
+    1: ("F16", 1, 2),
+    2: ("Q4_0", 32, 18),
+    3: ("Q4_1", 32, 20),
+    6: ("Q5_0", 32, 22),
+    7: ("Q5_1", 32, 24),
+    8: ("Q8_0", 32, 34),
+    9: ("Q8_1", 32, 40),
+    10: ("Q2_K", 256, 84),
+    11: ("Q3_K", 256, 110),
+    12: ("Q4_K", 256, 144),
+    13: ("Q5_K", 256, 176),
+    14: ("Q6_K", 256, 210),
+    15: ("Q8_K", 256, 292),
+    16: ("IQ2_XXS", 256, 66),
+    17: ("IQ2_XS", 256, 74),
+    18: ("IQ3_XXS", 256, 98),
+    19: ("IQ1_S", 256, 50),
+    20: ("IQ4_NL", 32, 18),
+    21: ("IQ3_S", 256, 110),
+    22: ("IQ2_S", 256, 82),
+    23: ("IQ4_XS", 256, 136),
+    24: ("I8", 1, 1),
+    25: ("I16", 1, 2),
+    26: ("I32", 1, 4),
+    27: ("I64", 1, 8),
+    28: ("F64", 1, 8),
+    29: ("IQ1_M", 256, 56),
+    30: ("BF16", 1, 2),
+    34: ("TQ1_0", 256, 54),
+    35: ("TQ2_0", 256, 66),
+}
+
+GGML_TYPE_F32 = 0
+GGML_TYPE_F16 = 1
+
+
+def align_offset(offset, alignment=GGUF_DEFAULT_ALIGNMENT):
+    """Round offset up to the next multiple of alignment"""
+    return offset + (alignment - offset % alignment) % alignment
+
+
+def kv_alignment(kv):
+    """Data alignment declared by a KV dict (general.alignment, default 32)"""
+    vtype_value = kv.get("general.alignment")
+    return vtype_value[1] if vtype_value else GGUF_DEFAULT_ALIGNMENT
+
+
+def reserve_header_space(kv, reserve=HEADER_RESERVE):
+    """Copy of kv with its header padding entry replaced by reserve spare bytes"""
+    kv = {k: v for k, v in kv.items() if k != HEADER_PADDING_KEY}
+    if reserve:
+        kv[HEADER_PADDING_KEY] = (STRING, " " * reserve)
+    return kv
+
+
+def tensor_nbytes(shape, tensor_type):
+    """Byte size of a tensor with GGUF shape (ne0 first) and ggml type"""
+    if tensor_type not in GGML_TYPES:
+        raise ValueError(f"Unknown ggml tensor type: {tensor_type}")
+    _, block_size, type_size = GGML_TYPES[tensor_type]
+    n_elements = 1
+    for dim in shape:
+        n_elements *= dim
+    if shape and shape[0] % block_size != 0:
+        raise ValueError(f"Row length {shape[0]} is not a multiple of block size {block_size}")
+    return n_elements // block_size * type_size
+
+
+class TensorInfo:
+    """One entry of the GGUF tensor-info table (offset is relative to the data section)"""
+
+    def __init__(self, name, shape, tensor_type, offset=0):
+        self.name = name
+        self.shape = list(shape)
+        self.tensor_type = tensor_type
+        self.offset = offset
+
+    @property
+    def type_name(self):
+        return GGML_TYPES.get(self.tensor_type, (str(self.tensor_type),))[0]
+
+    @property
+    def n_bytes(self):
+        return tensor_nbytes(self.shape, self.tensor_type)
+
+    def __repr__(self):
+        return f"TensorInfo({self.name!r}, {self.shape}, {self.type_name}, offset={self.offset})"
+
+
+class GGUFHeader:
+    """Parsed GGUF header: version, ordered KV dict and tensor-info table"""
+
+    def __init__(self, version, kv, tensors, header_size):
+        self.version = version
+        self.kv = kv            # key -> (value_type, value); arrays are (elem_type, LazyArray)
+        self.tensors = tensors  # list of TensorInfo in table order
+        self.header_size = header_size
+
+    @property
+    def alignment(self):
+        return kv_alignment(self.kv)
+
+    @property
+    def data_offset(self):
+        return align_offset(self.header_size, self.alignment)
+
+    @property
+    def architecture(self):
+        return self.get("general.architecture")
+
+    def get(self, key, default=None):
+        """Return a plain KV value (arrays come back as item lists)"""
+        if key not in self.kv:
+            return default
+        vtype, value = self.kv[key]
+        return value[1] if vtype == ARRAY else value
+
+    def tensor(self, name):
+        for info in self.tensors:
+            if info.name == name:
+                return info
+        return None
+
+    def tensor_names(self):
+        return [info.name for info in self.tensors]
+
+
+_SCALAR_SIZES = {vtype: struct.calcsize(fmt) for vtype, fmt in _SCALAR_FORMATS.items()}
+_READ_CHUNK = 1024 * 1024
+_U64 = struct.Struct('<Q')
+
+
+class LazyArray:
+    """GGUF array value kept as its raw encoded bytes; items are decoded on first access.
+
+    Tokenizer arrays hold ~100k strings, so metadata-only tools never pay for
+    decoding them, and rewriting a header copies them back byte for byte.
+    """
+
+    def __init__(self, elem_type, count, raw):
+        self.elem_type = elem_type
+        self.count = count
+        self.raw = raw
+        self._items = None
+
+    @classmethod
+    def from_items(cls, elem_type, items):
+        items = list(items)
+        raw = b''.join(_pack_value(elem_type, item) for item in items)
+        array = cls(elem_type, len(items), raw)
+        array._items = items
+        return array
+
+    def items(self):
+        if self._items is None:
+            r = _Reader(self.raw)
+            self._items = [r.value(self.elem_type) for _ in range(self.count)]
+        return self._items
+
+    def __len__(self):
+        return self.count
+
+    def __iter__(self):
+        return iter(self.items())
+
+    def __getitem__(self, i):
+        return self.items()[i]
+
+    def __eq__(self, other):
+        if isinstance(other, LazyArray):
+            return self.elem_type == other.elem_type and self.raw == other.raw
+        return self.items() == list(other)
+
+    def __repr__(self):
+        return f"LazyArray({GGUF_TYPE_NAMES.get(self.elem_type, self.elem_type)}, {self.count} items)"
+
+
+GGUF_TYPE_NAMES = {
+    UINT8: "u8", INT8: "i8", UINT16: "u16", INT16: "i16", UINT32: "u32", INT32: "i32",
+    FLOAT32: "f32", BOOL: "bool", STRING: "str", ARRAY: "arr", UINT64: "u64", INT64: "i64", FLOAT64: "f64",
+}
+
+
+class _Reader:
+    """Little-endian reader over a byte buffer, refilled from a file in large chunks.
+
+    Only the header prefix of the file is ever read; no mmap, no numpy.
+    """
+
+    def __init__(self, source):
+        if isinstance(source, (bytes, bytearray)):
+            self.f = None
+            self.buf = bytes(source)
+        else:
+            self.f = source
+            self.buf = b''
+        self.pos = 0
+        self.base = 0  # file offset of buf[0]
+
+    def _ensure(self, n):
+        if self.pos + n <= len(self.buf):
+            return
+        if self.f is not None:
+            more = self.f.read(max(_READ_CHUNK, self.pos + n - len(self.buf)))
+            self.buf = self.buf[self.pos:] + more
+            self.base += self.pos
+            self.pos = 0
+        if self.pos + n > len(self.buf):
+            raise ValueError("Unexpected end of file while reading GGUF header")
+
+    @property
+    def offset(self):
+        return self.base + self.pos
+
+    def read(self, n):
+        self._ensure(n)
+        data = self.buf[self.pos:self.pos + n]
+        self.pos += n
+        return data
+
+    def unpack(self, fmt):
+        size = struct.calcsize(fmt)
+        self._ensure(size)
+        value = struct.unpack_from(fmt, self.buf, self.pos)[0]
+        self.pos += size
+        return value
+
+    def string(self):
+        return self.read(self.unpack('<Q')).decode('utf-8', errors='replace')
+
+    def _string_array_raw(self, count):
+        """Raw bytes of count length-prefixed strings; only the prefixes are walked"""
+        unpack = _U64.unpack_from
+        start = self.pos
+        pos = start
+        buf = self.buf
+        for _ in range(count):
+            if pos + 8 > len(buf):
+                pos, start = self._refill_keep(start, pos, 8)
+                buf = self.buf
+            end = pos + 8 + unpack(buf, pos)[0]
+            if end > len(buf):
+                size = end - pos
+                pos, start = self._refill_keep(start, pos, size)
+                buf = self.buf
+                end = pos + size
+            pos = end
+        self.pos = pos
+        return buf[start:pos]
+
+    def _refill_keep(self, start, pos, need):
+        """Refill the buffer keeping everything from start; returns the rebased (pos, start)"""
+        more = self.f.read(max(_READ_CHUNK, pos + need - len(self.buf))) if self.f is not None else b''
+        self.buf = self.buf[start:] + more
+        self.base += start
+        pos -= start
+        if pos + need > len(self.buf):
+            raise ValueError("Unexpected end of file while reading GGUF header")
+        return pos, 0
+
+    def array(self):
+        elem_type = self.unpack('<I')
+        count = self.unpack('<Q')
+        if elem_type in _SCALAR_SIZES:
+            return LazyArray(elem_type, count, self.read(count * _SCALAR_SIZES[elem_type]))
+        if elem_type == STRING:
+            return LazyArray(elem_type, count, self._string_array_raw(count))
+        # Nested arrays are rare; decode them eagerly
+        return LazyArray.from_items(elem_type, [self.value(elem_type) for _ in range(count)])
+
+    def value(self, vtype):
+        if vtype == STRING:
+            return self.string()
+        if vtype == ARRAY:
+            elem_type = self.unpack('<I')
+            count = self.unpack('<Q')
+            return (elem_type, [self.value(elem_type) for _ in range(count)])
+        if vtype not in _SCALAR_FORMATS:
+            raise ValueError(f"Unknown GGUF value type: {vtype}")
+        return self.unpack(_SCALAR_FORMATS[vtype])
+
+
+def parse_header(f):
+    """Parse magic, KV section and tensor-info table from an open binary file"""
+    r = _Reader(f)
+    if r.read(4) != GGUF_MAGIC:
+        raise ValueError("Not a GGUF file")
+    version = r.unpack('<I')
+    if version < 2:
+        raise ValueError(f"Unsupported GGUF version: {version}")
+    tensor_count = r.unpack('<Q')
+    kv_count = r.unpack('<Q')
+
+    kv = {}
+    for _ in range(kv_count):
+        key = r.string()
+        vtype = r.unpack('<I')
+        if vtype == ARRAY:
+            array = r.array()
+            kv[key] = (vtype, (array.elem_type, array))
+        else:
+            kv[key] = (vtype, r.value(vtype))
+
+    tensors = []
+    for _ in range(tensor_count):
+        name = r.string()
+        n_dims = r.unpack('<I')
+        shape = [r.unpack('<Q') for _ in range(n_dims)]
+        tensor_type = r.unpack('<I')
+        offset = r.unpack('<Q')
+        tensors.append(TensorInfo(name, shape, tensor_type, offset))
+
+    return GGUFHeader(version, kv, tensors, r.offset)
+
+
+def read_header(path):
+    """Read the GGUF header of a file without touching its data section"""
+    with open(path, 'rb') as f:
+        return parse_header(f)
+
+
+def _pack_string(s):
+    data = s.encode('utf-8')
+    return struct.pack('<Q', len(data)) + data
+
+
+def _pack_value(vtype, value):
+    if vtype == STRING:
+        return _pack_string(value)
+    if vtype == ARRAY:
+        elem_type, items = value
+        if isinstance(items, LazyArray):
+            return struct.pack('<IQ', elem_type, items.count) + items.raw
+        parts = [struct.pack('<IQ', elem_type, len(items))]
+        parts.extend(_pack_value(elem_type, item) for item in items)
+        return b''.join(parts)
+    return struct.pack(_SCALAR_FORMATS[vtype], value)
+
+
+def serialize_header(version, kv, tensors):
+    """Serialize header, KV section and tensor-info table (no trailing alignment padding)"""
+    parts = [GGUF_MAGIC, struct.pack('<IQQ', version, len(tensors), len(kv))]
+    for key, (vtype, value) in kv.items():
+        parts.append(_pack_string(key))
+        parts.append(struct.pack('<I', vtype))
+        parts.append(_pack_value(vtype, value))
+    for info in tensors:
+        parts.append(_pack_string(info.name))
+        parts.append(struct.pack('<I', len(info.shape)))
+        parts.append(struct.pack(f'<{len(info.shape)}Q', *info.shape))
+        parts.append(struct.pack('<IQ', info.tensor_type, info.offset))
+    return b''.join(parts)
+
+
+def data_order(header):
+    """Tensor infos sorted by data offset, checked to be packed the way llama.cpp expects"""
+    ordered = sorted(header.tensors, key=lambda t: t.offset)
+    expected = 0
+    for info in ordered:
+        if info.offset != expected:
+            raise ValueError(f"Tensor {info.name} at offset {info.offset}, expected {expected}")
+        expected = align_offset(info.offset + info.n_bytes, header.alignment)
+    return ordered
+
+
+def embedding_length(header, default=5120):
+    """n_embd from <arch>.embedding_length, falling back to output_norm.weight"""
+    arch = header.architecture or "phi2"
+    value = header.get(f"{arch}.embedding_length")
+    if value is not None:
+        return int(value)
+    norm = header.tensor("output_norm.weight")
+    if norm is not None:
+        return norm.shape[0]
+    return default
+
+
+def format_value(vtype, value):
+    """Short printable form of a KV value"""
+    if vtype == ARRAY:
+        elem_type, items = value
+        return f"[{GGUF_TYPE_NAMES.get(elem_type, elem_type)} x {len(items)}]"
+    if vtype == STRING and len(value) > 80:
+        # e.g. the header padding reserve
+        return f"{value[:40]!r}... ({len(value)} chars)"
+    return repr(value)
+
+
+def main():
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description="Print GGUF metadata from the header only")
+    parser.add_argument("file", help="GGUF file")
+    parser.add_argument("keys", nargs="*", help="Only print these keys")
+    parser.add_argument("--tensors", action="store_true", help="Also list the tensor-info table")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    header = read_header(args.file)
+    elapsed = (time.perf_counter() - start) * 1000
+
+    for key, (vtype, value) in header.kv.items():
+        if not args.keys or key in args.keys:
+            print(f"{key} = {format_value(vtype, value)}")
+    if args.tensors:
+        for info in header.tensors:
+            print(f"  {info.name}: {info.type_name} {info.shape}")
+    print(f"[gguf_io] v{header.version}, {len(header.kv)} KV, {len(header.tensors)} tensors, "
+          f"header {header.header_size} bytes, parsed in {elapsed:.1f} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    import sys
+    sys.exit(main())
@@ -0,0 +1,328 @@
+#!/usr/bin/env python3
+"""
+Tensor-level delta patches between GGUF files.
+
+A patch describes a target GGUF as its base plus KV changes and a tensor
+table whose entries are either copied from the base (verbatim, renamed, or a
+contiguous / per-row slice of a base tensor, which covers split FFN and QKV
+tensors) or carried in the patch itself (added or replaced tensors,
+zlib-compressed when that helps). Adding output_norm.bias or splitting the
+FFN therefore ships as kilobytes instead of re-transferring 5-9 GB:
+
+  python gguf_patch.py make-patch mibera-Q3_K_M.gguf mibera-Q3_K_M-fixed.gguf -o bias-fix.ggufpatch
+  scp bias-fix.ggufpatch local:
+  python gguf_patch.py apply-patch mibera-Q3_K_M.gguf bias-fix.ggufpatch -o mibera-Q3_K_M-fixed.gguf
+  python gguf_patch.py info bias-fix.ggufpatch
+
+apply-patch checks the base header, rebuilds the target by streaming from
+the mmap'd base (gguf_stream.write_plan), and keeps the result only when its
+SHA-256 matches the target's; the .sums.json sidecar comes for free.
+
+File layout: b'GGUFPTCH', u32 version, u64 manifest length, JSON manifest,
+then the blob section that manifest offsets point into.
+"""
+import argparse
+import hashlib
+import io
+import json
+import mmap
+import os
+import struct
+import sys
+import time
+import zlib
+
+from gguf_checksum import file_sha256, sidecar_path, tensor_digests
+from gguf_index import split_name
+from gguf_io import GGUFHeader, data_order, parse_header, read_header, serialize_header, align_offset
+from gguf_stream import OutputTensor, byte_range, row_slice, source_tensor, write_plan
+from gguf_trace import get_tracer
+
+PATCH_MAGIC = b'GGUFPTCH'
+PATCH_VERSION = 1
+HASH_CHUNK = 16 * 1024 * 1024
+MIN_COMPRESSION = 0.9  # keep a blob raw unless zlib saves at least 10%
+
+
+def _header_sha(path, data_offset):
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read(data_offset)).hexdigest()
+
+
+def _digest(tensor, src):
+    h = hashlib.sha256()
+    for pos in range(0, tensor.n_bytes, HASH_CHUNK):
+        h.update(tensor.read(src, pos, min(HASH_CHUNK, tensor.n_bytes - pos)))
+    return h.hexdigest()
+
+
+def _check_reproducible(path, header):
+    """Raise unless write_plan would rebuild this file's header and layout byte for byte"""
+    ordered = data_order(header)
+    if [t.name for t in ordered] != header.tensor_names():
+        raise ValueError("tensor table order differs from data order")
+    header_bytes = serialize_header(header.version, header.kv, header.tensors)
+    with open(path, 'rb') as f:
+        head = f.read(header.data_offset)
+    if head[:len(header_bytes)] != header_bytes or head[len(header_bytes):].strip(b'\0'):
+        raise ValueError("header does not re-serialize identically")
+    last = ordered[-1] if ordered else None
+    end = header.data_offset + (align_offset(last.offset + last.n_bytes, header.alignment) if last else 0)
+    if os.path.getsize(path) != end:
+        raise ValueError(f"file size {os.path.getsize(path)} != packed layout {end}")
+
+
+class _Candidates:
+    """Base tensors a new target tensor may be a slice of, with where earlier slices ended"""
+
+    def __init__(self, base):
+        self.base = base
+        self.ranges = {}  # base name -> next contiguous byte start
+        self.rows = {}    # base name -> next row byte start
+
+    def slices(self, info):
+        layer, _ = split_name(info.name)
+        for parent in self.base.tensors:
+            if parent.tensor_type != info.tensor_type or split_name(parent.name)[0] != layer:
+                continue
+            if parent.n_bytes <= info.n_bytes or len(parent.shape) != len(info.shape):
+                continue
+            src = source_tensor(parent, self.base.data_offset)
+            # Split by whole rows (ne1): a contiguous byte range
+            if info.shape[0] == parent.shape[0]:
+                for start in sorted({self.ranges.get(parent.name, 0), parent.n_bytes - info.n_bytes}):
+                    if start + info.n_bytes > parent.n_bytes:
+                        continue
+                    yield parent.name, {"range": start}, byte_range(src, info.shape, start)
+            # Split of every row (ne0): the same byte columns of each row
+            if info.shape[1:] == parent.shape[1:] and info.shape[0] < parent.shape[0]:
+                row = info.n_bytes // max(1, _rows(info))
+                parent_row = parent.n_bytes // max(1, _rows(parent))
+                for start in sorted({self.rows.get(parent.name, 0), parent_row - row}):
+                    if start + row > parent_row:
+                        continue
+                    yield parent.name, {"rows": [start, start + row]}, row_slice(src, info.shape, start, start + row)
+
+    def used(self, name, how, n_bytes, row_bytes):
+        if "range" in how:
+            self.ranges[name] = how["range"] + n_bytes
+        else:
+            self.rows[name] = how["rows"][0] + row_bytes
+
+
+def _rows(info):
+    n = 1
+    for dim in info.shape[1:]:
+        n *= dim
+    return n
+
+
+def make_patch(base_path, target_path, out_path, workers=None):
+    """Write a patch turning base_path into target_path; returns the manifest"""
+    tracer = get_tracer()
+    base, target = read_header(base_path), read_header(target_path)
+    _check_reproducible(target_path, target)
+
+    with tracer.stage("patch-hash"):
+        base_digests = tensor_digests(base_path, workers)
+        target_digests = tensor_digests(target_path, workers)
+    by_digest = {}
+    for info in base.tensors:
+        by_digest.setdefault(base_digests[info.name], info.name)
+
+    manifest = {
+        "version": PATCH_VERSION,
+        "base": {"name": os.path.basename(base_path), "size": os.path.getsize(base_path),
+                 "header_sha256": _header_sha(base_path, base.data_offset)},
+        "target": {"name": os.path.basename(target_path), "size": os.path.getsize(target_path),
+                   "sha256": file_sha256(target_path), "gguf_version": target.version},
+        "kv_order": list(target.kv),
+        "kv_removed": [k for k in base.kv if k not in target.kv],
+        "kv_changed": [k for k in target.kv if base.kv.get(k) != target.kv[k]],
+        "tensors": [],
+    }
+    blobs = io.BytesIO()
+
+    def add_blob(data):
+        packed = zlib.compress(data, 6)
+        use_zlib = len(packed) < MIN_COMPRESSION * len(data)
+        if not use_zlib:
+            packed = data
+        offset = blobs.tell()
+        blobs.write(packed)
+        return {"blob": [offset, len(packed)], "zlib": use_zlib}
+
+    if manifest["kv_changed"]:
+        changed = {k: target.kv[k] for k in manifest["kv_changed"]}
+        manifest["kv"] = add_blob(serialize_header(target.version, changed, []))
+
+    candidates = _Candidates(base)
+    with tracer.stage("patch-match"), open(base_path, 'rb') as fb, open(target_path, 'rb') as ft:
+        src = mmap.mmap(fb.fileno(), 0, access=mmap.ACCESS_READ)
+        dst = mmap.mmap(ft.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            for info in target.tensors:
+                entry = {"name": info.name, "shape": info.shape, "type": info.tensor_type}
+                digest = target_digests[info.name]
+                if base_digests.get(info.name) == digest:
+                    entry["base"] = info.name
+                elif digest in by_digest:
+                    entry["base"] = by_digest[digest]
+                else:
+                    for parent, how, tensor in candidates.slices(info):
+                        if _digest(tensor, src) == digest:
+                            entry.update(how, base=parent)
+                            candidates.used(parent, how, info.n_bytes, info.n_bytes // max(1, _rows(info)))
+                            break
+                if "base" not in entry:
+                    start = target.data_offset + info.offset
+                    entry.update(add_blob(dst[start:start + info.n_bytes]))
+                manifest["tensors"].append(entry)
+        finally:
+            src.close()
+            dst.close()
+
+    body = json.dumps(manifest, separators=(",", ":")).encode()
+    with open(out_path, 'wb') as f:
+        f.write(PATCH_MAGIC + struct.pack('<IQ', PATCH_VERSION, len(body)))
+        f.write(body)
+        f.write(blobs.getvalue())
+    return manifest
+
+
+def read_patch(path):
+    """(manifest, blob section offset) of a patch file"""
+    with open(path, 'rb') as f:
+        if f.read(len(PATCH_MAGIC)) != PATCH_MAGIC:
+            raise ValueError(f"{path}: not a GGUF patch")
+        version, length = struct.unpack('<IQ', f.read(12))
+        if version != PATCH_VERSION:
+            raise ValueError(f"{path}: unsupported patch version {version}")
+        manifest = json.loads(f.read(length))
+    return manifest, len(PATCH_MAGIC) + 12 + length
+
+
+def _blob_tensor(entry, patch, blobs_at):
+    offset, length = entry["blob"]
+    start = blobs_at + offset
+    if entry["zlib"]:
+        data = memoryview(zlib.decompress(patch[start:start + length]))
+        read = lambda src, pos, n: data[pos:pos + n]
+    else:
+        read = lambda src, pos, n: patch[start + pos:start + pos + n]
+    return OutputTensor(entry["name"], entry["shape"], entry["type"], read)
+
+
+def _blob(entry, patch, blobs_at):
+    offset, length = entry["blob"]
+    data = patch[blobs_at + offset:blobs_at + offset + length]
+    return zlib.decompress(data) if entry["zlib"] else data
+
+
+def apply_patch(base_path, patch_path, out_path):
+    """Rebuild the patch target from base_path; raises ValueError unless the result hash matches"""
+    manifest, blobs_at = read_patch(patch_path)
+    base = read_header(base_path)
+    expected = manifest["base"]
+    if os.path.getsize(base_path) != expected["size"] or \
+            _header_sha(base_path, base.data_offset) != expected["header_sha256"]:
+        raise ValueError(f"{base_path} is not the base this patch was made from ({expected['name']})")
+    if os.path.abspath(base_path) == os.path.abspath(out_path):
+        raise ValueError("output must differ from the base file")
+
+    with open(patch_path, 'rb') as fp:
+        patch = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            changed = parse_header(io.BytesIO(_blob(manifest["kv"], patch, blobs_at))).kv if "kv" in manifest else {}
+            kv = {k: changed[k] if k in changed else base.kv[k] for k in manifest["kv_order"]}
+
+            tensors = []
+            for entry in manifest["tensors"]:
+                if "blob" in entry:
+                    tensors.append(_blob_tensor(entry, patch, blobs_at))
+                    continue
+                parent = source_tensor(base.tensor(entry["base"]), base.data_offset)
+                if "range" in entry:
+                    tensor = byte_range(parent, entry["shape"], entry["range"])
+                elif "rows" in entry:
+                    tensor = row_slice(parent, entry["shape"], *entry["rows"])
+                else:
+                    tensor = parent
+                tensors.append(OutputTensor(entry["name"], entry["shape"], entry["type"], tensor.read))
+
+            # write_plan takes the GGUF version from the header it is given (alignment comes from kv);
+            # the target's KV, padding included, is reproduced exactly
+            layout = GGUFHeader(manifest["target"]["gguf_version"], kv, base.tensors, base.header_size)
+            tmp = out_path + ".partial"
+            stats = write_plan(base_path, tmp, layout, kv, tensors, header_reserve=None)
+        finally:
+            patch.close()
+
+    if stats["sha256"] != manifest["target"]["sha256"]:
+        os.remove(tmp)
+        os.remove(sidecar_path(tmp))
+        raise ValueError(f"result sha256 {stats['sha256']} != expected {manifest['target']['sha256']}")
+    os.replace(tmp, out_path)
+    os.replace(sidecar_path(tmp), sidecar_path(out_path))
+    return stats
+
+
+def describe(manifest, patch_size):
+    entries = manifest["tensors"]
+    stored = [e for e in entries if "blob" in e]
+    sliced = [e for e in entries if "range" in e or "rows" in e]
+    print(f"[patch] {manifest['base']['name']} -> {manifest['target']['name']} "
+          f"({patch_size / 1024:.1f} KB patch for a {manifest['target']['size'] / (1024**3):.2f} GB target)")
+    for key in manifest["kv_removed"]:
+        print(f"  - kv {key}")
+    for key in manifest["kv_changed"]:
+        print(f"  ~ kv {key}")
+    for e in stored:
+        print(f"  + {e['name']} {e['shape']} ({e['blob'][1] / 1024:.1f} KB{', zlib' if e['zlib'] else ''})")
+    for e in sliced:
+        print(f"  > {e['name']} {e['shape']} sliced from {e['base']}")
+    renamed = [e for e in entries if e.get("base") not in (None, e["name"]) and e not in sliced]
+    for e in renamed:
+        print(f"  > {e['name']} copied from {e['base']}")
+    print(f"[patch] {len(entries)} tensors: {len(entries) - len(stored) - len(sliced)} copied, "
+          f"{len(sliced)} sliced, {len(stored)} stored")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tensor-level delta patches between GGUF files")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p = sub.add_parser("make-patch", help="Describe target as base + changes")
+    p.add_argument("base")
+    p.add_argument("target")
+    p.add_argument("-o", "--output", help="Patch file (default: <target>.ggufpatch)")
+    p.add_argument("--workers", type=int, help="Hashing threads (default: CPU count)")
+    p = sub.add_parser("apply-patch", help="Rebuild the target from base + patch and verify its hash")
+    p.add_argument("base")
+    p.add_argument("patch")
+    p.add_argument("-o", "--output", help="Output GGUF (default: the target name next to the base)")
+    p = sub.add_parser("info", help="Show what a patch changes")
+    p.add_argument("patch")
+    args = parser.parse_args()
+
+    start = time.time()
+    try:
+        if args.command == "make-patch":
+            out = args.output or os.path.splitext(args.target)[0] + ".ggufpatch"
+            make_patch(args.base, args.target, out, args.workers)
+            describe(read_patch(out)[0], os.path.getsize(out))
+            print(f"[patch] Wrote {out} in {time.time() - start:.1f}s")
+        elif args.command == "apply-patch":
+            manifest, _ = read_patch(args.patch)
+            out = args.output or os.path.join(os.path.dirname(args.base), manifest["target"]["name"])
+            apply_patch(args.base, args.patch, out)
+            print(f"[patch] {out}: sha256 verified ({time.time() - start:.1f}s)")
+        else:
+            describe(read_patch(args.patch)[0], os.path.getsize(args.patch))
+    except (OSError, ValueError) as e:
+        print(f"[patch] {e}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Single-pass GGUF fix pipeline driven by a declarative JSON spec.
+
+All per-tensor and per-KV transforms (bias injection, FFN split, QKV split,
+metadata fixups) are planned together and applied in one read and one write
+of the model, instead of a full copy per fix script. Example spec:
+
+    {
+      "expect_input_tensors": 243,
+      "expect_output_tensors": 244,
+      "kv": {"set": {"phi2.attention.head_count_kv": 8}, "remove": []},
+      "transforms": [{"op": "add_output_norm_bias"}, {"op": "split_ffn", "axis": 1}]
+    }
+"""
+import argparse
+import json
+import sys
+
+from gguf_io import (
+    STRING, UINT32, INT32, FLOAT32, BOOL, ARRAY, read_header,
+)
+from gguf_stream import (
+    plan_rewrite, write_plan, AddOutputNormBias, SplitFusedFFN, SplitFusedQKV, SetKV, RemoveKV,
+    DEFAULT_MAX_MEMORY,
+)
+
+# op name -> factory(options dict)
+TRANSFORMS = {
+    "add_output_norm_bias": lambda opts: AddOutputNormBias(opts.get("n_embd")),
+    "split_ffn": lambda opts: SplitFusedFFN(opts.get("n_ff"), opts.get("axis"), opts.get("gate_first", True)),
+    "split_qkv": lambda opts: SplitFusedQKV(),
+}
+
+
+def _typed_value(header, key, value):
+    """Pick a GGUF value type for a JSON value, keeping the existing key's type when known"""
+    if key in header.kv and header.kv[key][0] != ARRAY:
+        return (header.kv[key][0], value)
+    if isinstance(value, bool):
+        return (BOOL, value)
+    if isinstance(value, int):
+        return (UINT32 if value >= 0 else INT32, value)
+    if isinstance(value, float):
+        return (FLOAT32, value)
+    if isinstance(value, str):
+        return (STRING, value)
+    raise ValueError(f"Unsupported KV value for {key}: {value!r}")
+
+
+def build_transforms(spec, header):
+    """Instantiate the transforms named in a spec"""
+    transforms = []
+    kv_spec = spec.get("kv", {})
+    if kv_spec.get("remove"):
+        transforms.append(RemoveKV(kv_spec["remove"]))
+    if kv_spec.get("set"):
+        transforms.append(SetKV({k: _typed_value(header, k, v) for k, v in kv_spec["set"].items()}))
+
+    for entry in spec.get("transforms", []):
+        op = entry.get("op")
+        if op not in TRANSFORMS:
+            raise ValueError(f"Unknown transform '{op}' (known: {', '.join(sorted(TRANSFORMS))})")
+        transforms.append(TRANSFORMS[op](entry))
+    return transforms
+
+
+def check_count(label, actual, expected):
+    """Compare a tensor count against a spec expectation; returns True when it matches"""
+    if expected is None:
+        return True
+    status = "OK" if actual == expected else "MISMATCH"
+    print(f"[pipeline] {label} tensors: {actual} (expected {expected}) {status}")
+    return actual == expected
+
+
+def run_pipeline(spec, input_path, output_path, dry_run=False, max_memory=DEFAULT_MAX_MEMORY):
+    """Plan every transform in spec, verify tensor counts and write once; returns True on success"""
+    header = read_header(input_path)
+    print(f"[pipeline] {input_path}: {len(header.tensors)} tensors, {len(header.kv)} KV")
+
+    if not check_count("Input", len(header.tensors), spec.get("expect_input_tensors")):
+        return False
+
+    transforms = build_transforms(spec, header)
+    kv, tensors = plan_rewrite(header, transforms)
+    if not check_count("Planned output", len(tensors), spec.get("expect_output_tensors")):
+        return False
+
+    if dry_run:
+        print(f"[pipeline] Dry run - {len(tensors)} tensors planned, nothing written")
+        return True
+
+    write_plan(input_path, output_path, header, kv, tensors, max_memory)
+
+    written = read_header(output_path)
+    return check_count("Written", len(written.tensors), spec.get("expect_output_tensors", len(tensors)))
+
+
+def load_spec(path):
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Apply a GGUF fix spec in a single read/write pass")
+    parser.add_argument("spec", help="Pipeline spec (JSON)")
+    parser.add_argument("input", help="Input GGUF file")
+    parser.add_argument("output", help="Output GGUF file")
+    parser.add_argument("--dry-run", action="store_true", help="Plan and verify counts without writing")
+    parser.add_argument("--max-memory", type=int, default=DEFAULT_MAX_MEMORY // (1024**2), help="Memory ceiling (MB)")
+    args = parser.parse_args()
+
+    ok = run_pipeline(load_spec(args.spec), args.input, args.output,
+                      dry_run=args.dry_run, max_memory=args.max_memory * 1024**2)
+    print("[SUCCESS] Pipeline complete!" if ok else "[FATAL] Pipeline verification failed")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,415 @@
+#!/usr/bin/env python3
+"""
+Streaming, bounded-memory GGUF rewriter shared by the surgery scripts.
+
+The output layout is planned up front from the source header, so the header
+and KV section are written first and tensor data is then copied one tensor
+at a time from the mmap'd source. Tensors are never materialized whole:
+each output tensor is described by a reader over byte ranges of the source,
+and copied pages are dropped once more than the memory ceiling has been
+streamed, keeping peak RSS well below the model size.
+"""
+import mmap
+import os
+import time
+
+from gguf_io import (
+    GGML_TYPES, GGML_TYPE_F32, TensorInfo, GGUFHeader, read_header, serialize_header, align_offset, tensor_nbytes,
+    embedding_length, kv_alignment, reserve_header_space, HEADER_RESERVE,
+)
+from gguf_checksum import ChecksumWriter, save_sidecar
+from gguf_trace import get_tracer, peak_rss_bytes
+
+DEFAULT_MAX_MEMORY = 256 * 1024 * 1024
+MAX_CHUNK = 16 * 1024 * 1024
+
+
+class OutputTensor:
+    """A tensor of the output file whose bytes come from read(src, start, length)"""
+
+    def __init__(self, name, shape, tensor_type, read):
+        self.name = name
+        self.shape = list(shape)
+        self.tensor_type = tensor_type
+        self.read = read
+
+    @property
+    def n_bytes(self):
+        return tensor_nbytes(self.shape, self.tensor_type)
+
+    def renamed(self, name):
+        return OutputTensor(name, self.shape, self.tensor_type, self.read)
+
+
+def source_tensor(info, data_offset):
+    """Output tensor that copies a source tensor verbatim"""
+    base = data_offset + info.offset
+
+    def read(src, start, length):
+        return src[base + start:base + start + length]
+
+    return OutputTensor(info.name, info.shape, info.tensor_type, read)
+
+
+def bytes_tensor(name, shape, tensor_type, data):
+    """Output tensor backed by an in-memory buffer (small injected tensors)"""
+    view = memoryview(data)
+    if len(view) != tensor_nbytes(shape, tensor_type):
+        raise ValueError(f"{name}: buffer is {len(view)} bytes, expected {tensor_nbytes(shape, tensor_type)}")
+    return OutputTensor(name, shape, tensor_type, lambda src, start, length: view[start:start + length])
+
+
+def zeros_tensor(name, shape, tensor_type=GGML_TYPE_F32):
+    """Output tensor of zeros, generated on the fly"""
+    return OutputTensor(name, shape, tensor_type, lambda src, start, length: bytes(length))
+
+
+def row_slice(parent, new_shape, byte_start, byte_stop):
+    """Output tensor made of bytes [byte_start, byte_stop) of every row of parent"""
+    parent_row = _row_bytes(parent)
+    row = byte_stop - byte_start
+
+    def read(src, start, length):
+        # One parent read covering every row touched, then memoryview slicing per row
+        first = start // row
+        last = (start + length - 1) // row
+        span = memoryview(bytes(parent.read(src, first * parent_row, (last - first + 1) * parent_row)))
+        parts = []
+        end = start + length
+        while start < end:
+            i, col = divmod(start, row)
+            take = min(row - col, end - start)
+            base = (i - first) * parent_row + byte_start + col
+            parts.append(span[base:base + take])
+            start += take
+        return b''.join(parts)
+
+    return OutputTensor(parent.name, new_shape, parent.tensor_type, read)
+
+
+def byte_range(parent, new_shape, byte_start):
+    """Output tensor made of a contiguous byte range of parent starting at byte_start"""
+    return OutputTensor(parent.name, new_shape, parent.tensor_type,
+                        lambda src, start, length: parent.read(src, byte_start + start, length))
+
+
+def _row_bytes(tensor):
+    return tensor_nbytes(tensor.shape[:1], tensor.tensor_type)
+
+
+def split_tensor(tensor, axis, sizes):
+    """Split a tensor into parts of sizes elements along axis, moving whole quant blocks.
+
+    axis 0 splits every row (ne0) at block boundaries; axis 1 splits by whole rows
+    (ne1), which is a contiguous byte range. No dequantization happens, so the
+    parts are bit-exact copies of the source bytes.
+    """
+    if sum(sizes) != tensor.shape[axis]:
+        raise ValueError(f"{tensor.name}: sizes {sizes} don't add up to dim {axis} = {tensor.shape[axis]}")
+    if axis >= 2 or (axis == 1 and len(tensor.shape) != 2):
+        raise ValueError(f"{tensor.name}: only ne0/ne1 splits of 1D/2D tensors are supported")
+
+    _, block_size, type_size = GGML_TYPES[tensor.tensor_type]
+    parts = []
+    start = 0
+    for size in sizes:
+        shape = list(tensor.shape)
+        shape[axis] = size
+        if axis == 0:
+            if start % block_size or size % block_size:
+                raise ValueError(f"{tensor.name}: split at {start}+{size} is not aligned to "
+                                 f"{block_size}-element {GGML_TYPES[tensor.tensor_type][0]} blocks")
+            byte_start = start // block_size * type_size
+            parts.append(row_slice(tensor, shape, byte_start, byte_start + size // block_size * type_size))
+        else:
+            parts.append(byte_range(tensor, shape, start * _row_bytes(tensor)))
+        start += size
+    return parts
+
+
+class Transform:
+    """Base class for rewrite transforms; override only the hooks you need"""
+
+    def update_kv(self, header, kv):
+        return kv
+
+    def tensor(self, header, tensor):
+        """Return the list of output tensors replacing tensor ([] drops it)"""
+        return [tensor]
+
+    def finish(self, header, tensors):
+        """Called once after all tensors are planned; may append to tensors"""
+
+
+class AddOutputNormBias(Transform):
+    """Inject a zero output_norm.bias right after output_norm.weight"""
+
+    def __init__(self, n_embd=None):
+        self.n_embd = n_embd
+        self.added = False
+
+    def _bias(self, header, norm):
+        n_embd = self.n_embd or (norm.shape[0] if norm is not None else None)
+        if n_embd is None:
+            n_embd = embedding_length(header)
+        self.added = True
+        print(f"[stream] Injecting output_norm.bias shape=[{n_embd}] dtype=F32")
+        return zeros_tensor("output_norm.bias", [n_embd])
+
+    def tensor(self, header, tensor):
+        if tensor.name == "output_norm.bias":
+            self.added = True
+        if tensor.name == "output_norm.weight" and header.tensor("output_norm.bias") is None and not self.added:
+            return [tensor, self._bias(header, tensor)]
+        return [tensor]
+
+    def finish(self, header, tensors):
+        if not self.added:
+            tensors.append(self._bias(header, None))
+
+
+class SplitFusedFFN(Transform):
+    """Split fused ffn_up.weight/.bias (gate+up, 2*n_ff wide) into ffn_gate + ffn_up.
+
+    The fused axis is detected from the shape: ne1 == 2*n_ff (HF gate_up_proj
+    layout) splits by whole rows, ne0 == 2*n_ff splits each row at a quant
+    block boundary. axis forces one or the other; gate_first=False swaps halves.
+    A fused bias is split along its only axis in the same gate/up order.
+    """
+
+    def __init__(self, n_ff=None, axis=None, gate_first=True):
+        self.n_ff = n_ff
+        self.axis = axis
+        self.gate_first = gate_first
+        self.split = 0
+
+    def _n_ff(self, header):
+        return self.n_ff or header.get(f"{header.architecture or 'phi2'}.feed_forward_length") or 17920
+
+    def _fused_axis(self, header, tensor):
+        n_ff = self._n_ff(header)
+        if len(tensor.shape) == 1:
+            return 0 if tensor.shape[0] == 2 * n_ff else None
+        axes = [self.axis] if self.axis is not None else [1, 0]
+        for axis in axes:
+            if tensor.shape[axis] == 2 * n_ff:
+                return axis
+        return None
+
+    def tensor(self, header, tensor):
+        for suffix, n_dims in (("ffn_up.weight", 2), ("ffn_up.bias", 1)):
+            if tensor.name.endswith(suffix) and len(tensor.shape) == n_dims:
+                break
+        else:
+            return [tensor]
+        axis = self._fused_axis(header, tensor)
+        if axis is None:
+            if suffix == "ffn_up.bias" and tensor.shape[0] != self._n_ff(header):
+                raise ValueError(f"{tensor.name}: width {tensor.shape[0]} is neither n_ff nor 2*n_ff")
+            return [tensor]
+
+        half = tensor.shape[axis] // 2
+        first, second = split_tensor(tensor, axis, [half, half])
+        gate, up = (first, second) if self.gate_first else (second, first)
+        gate = gate.renamed(tensor.name.replace(suffix, suffix.replace("ffn_up", "ffn_gate")))
+        print(f"[stream] Splitting {tensor.name} {tensor.shape} -> gate {gate.shape} + up {up.shape} (axis {axis})")
+        self.split += 1
+        return [gate, up]
+
+
+class SplitFusedQKV(Transform):
+    """Split fused attn_qkv (weight and bias) into attn_q/attn_k/attn_v for GQA shapes.
+
+    Widths come from the header: q = n_embd, k = v = head_dim * n_head_kv, so the
+    Mibera 7680-wide tensor becomes 5120 + 1280 + 1280.
+    """
+
+    def __init__(self):
+        self.split = 0
+
+    def _widths(self, header):
+        arch = header.architecture or "phi2"
+        n_embd = embedding_length(header)
+        n_head = header.get(f"{arch}.attention.head_count") or 32
+        n_head_kv = header.get(f"{arch}.attention.head_count_kv") or n_head
+        n_kv = n_embd // n_head * n_head_kv
+        return [n_embd, n_kv, n_kv]
+
+    def tensor(self, header, tensor):
+        for suffix in ("attn_qkv.weight", "attn_qkv.bias"):
+            if tensor.name.endswith(suffix):
+                break
+        else:
+            return [tensor]
+
+        widths = self._widths(header)
+        axis = len(tensor.shape) - 1
+        if tensor.shape[axis] != sum(widths):
+            raise ValueError(f"{tensor.name}: fused width {tensor.shape[axis]} != {' + '.join(map(str, widths))}")
+        kind = suffix.split(".")[1]
+        parts = split_tensor(tensor, axis, widths)
+        parts = [part.renamed(tensor.name.replace(suffix, f"attn_{x}.{kind}")) for part, x in zip(parts, "qkv")]
+        print(f"[stream] Splitting {tensor.name} {tensor.shape} -> q/k/v {widths}")
+        self.split += 1
+        return parts
+
+
+class SetKV(Transform):
+    """Set or overwrite metadata values ({key: (value_type, value)})"""
+
+    def __init__(self, values):
+        self.values = values
+
+    def update_kv(self, header, kv):
+        kv = dict(kv)
+        for key, vtype_value in self.values.items():
+            print(f"[stream] KV {key} = {vtype_value[1]!r}")
+            kv[key] = vtype_value
+        return kv
+
+
+class RemoveKV(Transform):
+    """Drop metadata keys"""
+
+    def __init__(self, keys):
+        self.keys = list(keys)
+
+    def update_kv(self, header, kv):
+        return {k: v for k, v in kv.items() if k not in self.keys}
+
+
+def plan_rewrite(header, transforms):
+    """Run transforms over the header; returns (kv, [OutputTensor])"""
+    kv = dict(header.kv)
+    for t in transforms:
+        kv = t.update_kv(header, kv)
+    # Source data stays where the input's own alignment put it
+    data_offset = header.data_offset
+    # Tensor transforms see the fixed-up metadata (e.g. a corrected head_count_kv)
+    header = GGUFHeader(header.version, kv, header.tensors, header.header_size)
+
+    tensors = []
+    for info in header.tensors:
+        current = [source_tensor(info, data_offset)]
+        for t in transforms:
+            current = [out for tensor in current for out in t.tensor(header, tensor)]
+        tensors.extend(current)
+    for t in transforms:
+        t.finish(header, tensors)
+
+    names = [t.name for t in tensors]
+    if len(set(names)) != len(names):
+        dupes = sorted({n for n in names if names.count(n) > 1})
+        raise ValueError(f"Duplicate output tensors: {', '.join(dupes)}")
+    return kv, tensors
+
+
+def _release(src):
+    """Drop already-copied source pages so they stop counting toward RSS"""
+    if hasattr(src, "madvise") and hasattr(mmap, "MADV_DONTNEED"):
+        src.madvise(mmap.MADV_DONTNEED)
+
+
+def rewrite(input_path, output_path, transforms, max_memory=DEFAULT_MAX_MEMORY, progress_every=50):
+    """Stream input_path to output_path through transforms; returns a stats dict"""
+    with get_tracer().stage("plan"):
+        header = read_header(input_path)
+        kv, tensors = plan_rewrite(header, transforms)
+    return write_plan(input_path, output_path, header, kv, tensors, max_memory, progress_every)
+
+
+def write_plan(input_path, output_path, header, kv, tensors, max_memory=DEFAULT_MAX_MEMORY, progress_every=50,
+               checksums=True, header_reserve=HEADER_RESERVE, progress_seconds=None):
+    """Write a planned (kv, tensors) layout, copying tensor bytes from input_path
+
+    The output is hashed as it is written; checksums=True also saves the
+    per-tensor .sums.json sidecar. header_reserve spare header bytes are
+    written as a padding KV so gguf_inplace can later append tensors without
+    moving data; None writes kv exactly as given. progress_seconds prints
+    the output's MB written and MB/s at that interval (for concurrent writers,
+    where per-tensor counts from several files would interleave).
+    """
+    start_time = time.time()
+    tracer = get_tracer()
+    if header_reserve is not None:
+        kv = reserve_header_space(kv, header_reserve)
+    # The output's own general.alignment governs its layout (a kv.set may have changed it)
+    alignment = kv_alignment(kv)
+    # Split reads can touch twice the chunk in source pages, so leave headroom under the ceiling
+    chunk = max(mmap.PAGESIZE, min(MAX_CHUNK, max_memory // 8))
+
+    infos = []
+    offset = 0
+    for tensor in tensors:
+        infos.append(TensorInfo(tensor.name, tensor.shape, tensor.tensor_type, offset))
+        offset = align_offset(offset + tensor.n_bytes, alignment)
+    header_bytes = serialize_header(header.version, kv, infos)
+
+    bytes_read = 0
+    with tracer.stage("write", tensors=len(tensors)), \
+            open(input_path, 'rb') as fin, open(output_path, 'wb') as raw_out:
+        # Hash while writing: whole file plus one digest per tensor
+        fout = ChecksumWriter(raw_out)
+        src = mmap.mmap(fin.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            fout.write(header_bytes)
+            fout.write(b'\0' * (align_offset(len(header_bytes), alignment) - len(header_bytes)))
+
+            streamed = 0
+            total_bytes = sum(tensor.n_bytes for tensor in tensors)
+            last_report = time.time()
+            for i, (tensor, info) in enumerate(zip(tensors, infos), 1):
+                n_bytes = tensor.n_bytes
+                pos = 0
+                tensor_start = time.time()
+                fout.begin_tensor(tensor.name)
+                while pos < n_bytes:
+                    length = min(chunk, n_bytes - pos)
+                    fout.write(tensor.read(src, pos, length))
+                    pos += length
+                    streamed += length
+                    if streamed >= max_memory // 2:
+                        _release(src)
+                        streamed = 0
+                bytes_read += n_bytes
+                fout.end_tensor()
+                fout.write(b'\0' * (align_offset(n_bytes, alignment) - n_bytes))
+                tracer.tensor(tensor.name, tensor_start, time.time() - tensor_start, n_bytes)
+                if progress_every and i % progress_every == 0:
+                    print(f"[stream] Processed {i}/{len(tensors)} tensors...")
+                if progress_seconds and time.time() - last_report >= progress_seconds:
+                    last_report = time.time()
+                    mb = bytes_read / (1024**2)
+                    print(f"[stream] {os.path.basename(output_path)}: {mb:.0f}/{total_bytes / (1024**2):.0f} MB "
+                          f"({mb / max(last_report - start_time, 1e-9):.1f} MB/s)")
+        finally:
+            src.close()
+
+    with tracer.stage("checksums"):
+        sums = fout.sidecar(output_path)
+        if checksums:
+            save_sidecar(output_path, sums)
+    elapsed = time.time() - start_time
+    stats = {
+        "tensors_in": len(header.tensors),
+        "tensors_out": len(tensors),
+        "bytes_read": bytes_read,
+        "bytes_written": os.path.getsize(output_path),
+        "seconds": elapsed,
+        "peak_rss": peak_rss_bytes(),
+        "sha256": sums["sha256"],
+    }
+    report(stats)
+    return stats
+
+
+def report(stats):
+    """Print a one-block summary of a rewrite"""
+    mb = stats["bytes_written"] / (1024**2)
+    rate = mb / stats["seconds"] if stats["seconds"] > 0 else 0.0
+    print(f"[stream] Tensors: {stats['tensors_in']} -> {stats['tensors_out']}")
+    print(f"[stream] Wrote {mb:.1f} MB in {stats['seconds']:.1f}s ({rate:.1f} MB/s)")
+    if stats["peak_rss"] is not None:
+        print(f"[stream] Peak RSS: {stats['peak_rss'] / (1024**2):.1f} MB")
+    if stats.get("sha256"):
+        print(f"[stream] SHA-256: {stats['sha256']}")
@@ -0,0 +1,318 @@
+#!/usr/bin/env python3
+"""
+Stage-level tracing for the conversion toolchain.
+
+Each instrumented tool records, per stage and per tensor, wall time, CPU time
+(including child processes), bytes read and written (logical and from disk)
+and peak RSS, plus a sampled RSS / I/O counter track. Events are appended to
+a Chrome trace file (JSON array format, open in chrome://tracing or
+ui.perfetto.dev); every process of a run, including worker processes and
+commands wrapped with `run`, appends to the same file, and a summary says
+whether each stage was CPU-, disk- or memory-bound.
+
+The trace goes to traces/<tool>-<time>.json unless MIBERA_TRACE names a file
+(shared by a whole shell pipeline) or is set to 0 to disable tracing.
+
+  MIBERA_TRACE=traces/rebuild.json python split_ffn_tensors.py in.gguf out.gguf
+  python gguf_trace.py run --stage quantize-Q2_K -- ./llama-quantize f16.gguf q2.gguf Q2_K
+  python gguf_trace.py summary traces/rebuild.json
+"""
+import argparse
+import atexit
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+TRACE_ENV = "MIBERA_TRACE"
+TRACE_DIR = "traces"
+SAMPLE_INTERVAL = 0.5
+
+
+def peak_rss_bytes():
+    """Peak resident set size of this process, or None if it can't be measured"""
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+    except ImportError:
+        pass
+    try:
+        import psutil
+        info = psutil.Process().memory_info()
+        return getattr(info, "peak_wset", info.rss)
+    except ImportError:
+        return None
+
+
+def current_rss_bytes():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss
+    except ImportError:
+        return None
+
+
+def io_counters():
+    """{read, written, disk_read, disk_written} bytes for this process so far (empty when unavailable)"""
+    try:
+        with open("/proc/self/io") as f:
+            fields = dict(line.split(": ") for line in f.read().splitlines())
+        return {"read": int(fields["rchar"]), "written": int(fields["wchar"]),
+                "disk_read": int(fields["read_bytes"]), "disk_written": int(fields["write_bytes"])}
+    except (OSError, KeyError, ValueError):
+        pass
+    try:
+        import psutil
+        io = psutil.Process().io_counters()
+        return {"read": getattr(io, "read_chars", io.read_bytes), "written": getattr(io, "write_chars", io.write_bytes),
+                "disk_read": io.read_bytes, "disk_written": io.write_bytes}
+    except (ImportError, AttributeError):
+        return {}
+
+
+def cpu_seconds():
+    """User + system CPU of this process and its waited-for children"""
+    try:
+        import resource
+        own = resource.getrusage(resource.RUSAGE_SELF)
+        children = resource.getrusage(resource.RUSAGE_CHILDREN)
+        return own.ru_utime + own.ru_stime + children.ru_utime + children.ru_stime
+    except ImportError:
+        return time.process_time()
+
+
+def total_memory():
+    try:
+        return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES")
+    except (ValueError, AttributeError, OSError):
+        pass
+    try:
+        import psutil
+        return psutil.virtual_memory().total
+    except ImportError:
+        return None
+
+
+def classify(stage, memory=None):
+    """'cpu-bound', 'disk-bound' or 'memory-bound' from a stage record"""
+    memory = memory or total_memory()
+    if memory and stage.get("peak_rss") and stage["peak_rss"] > 0.8 * memory:
+        return "memory-bound"
+    wall = stage["seconds"]
+    if wall <= 0:
+        return "-"
+    cores = stage.get("cpu_seconds", 0) / wall
+    io = sum(stage.get(k) or 0 for k in ("read", "written"))
+    if cores >= 0.7:
+        return f"cpu-bound ({cores:.1f} cores)"
+    if io:
+        return f"disk-bound ({io / (1024**2) / wall:.0f} MB/s, {cores:.1f} cores)"
+    return f"waiting ({cores:.1f} cores)"
+
+
+class Tracer:
+    """Appends Chrome trace events for this process to a shared file"""
+
+    def __init__(self, path, tool=None, sample=False):
+        self.path = path
+        self.tool = tool or os.path.basename(sys.argv[0])
+        self.pid = os.getpid()
+        self.stages = []
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+        if os.fstat(self._fd).st_size == 0:
+            os.write(self._fd, b"[\n")
+        self._emit({"name": "process_name", "ph": "M", "pid": self.pid, "args": {"name": f"{self.tool} ({self.pid})"}})
+        self._stop = threading.Event()
+        self._sampler = None
+        if sample:
+            self._sampler = threading.Thread(target=self._sample, daemon=True)
+            self._sampler.start()
+
+    def _emit(self, event):
+        # One append per event keeps lines whole when several processes share the file
+        os.write(self._fd, (json.dumps(event) + ",\n").encode())
+
+    def event(self, name, start, seconds, cat="stage", tid=0, **args):
+        self._emit({"name": name, "cat": cat, "ph": "X", "pid": self.pid, "tid": tid,
+                    "ts": int(start * 1e6), "dur": int(seconds * 1e6), "args": args})
+
+    def tensor(self, name, start, seconds, n_bytes, tid=0):
+        self.event(name, start, seconds, cat="tensor", tid=tid, bytes=n_bytes)
+
+    @contextmanager
+    def stage(self, name, **args):
+        """Time a block; extra fields can be added to the yielded dict"""
+        record = dict(args)
+        start, cpu, io = time.time(), cpu_seconds(), io_counters()
+        try:
+            yield record
+        finally:
+            seconds = time.time() - start
+            after = io_counters()
+            record.update({k: after[k] - io[k] for k in after if k in io})
+            record.update(name=name, seconds=seconds, cpu_seconds=cpu_seconds() - cpu, peak_rss=peak_rss_bytes())
+            self.stages.append(record)
+            self.event(name, start, seconds, **{k: v for k, v in record.items() if k not in ("name", "seconds")})
+
+    def _sample(self):
+        last = io_counters()
+        last_t = time.time()
+        while not self._stop.wait(SAMPLE_INTERVAL):
+            now, io = time.time(), io_counters()
+            rates = {f"{k}_MBps": (io[k] - last.get(k, 0)) / (1024**2) / (now - last_t) for k in io}
+            self._emit({"name": "io", "ph": "C", "pid": self.pid, "ts": int(now * 1e6), "args": rates})
+            rss = current_rss_bytes()
+            if rss is not None:
+                self._emit({"name": "rss_MB", "ph": "C", "pid": self.pid, "ts": int(now * 1e6),
+                            "args": {"rss": rss / (1024**2)}})
+            last, last_t = io, now
+
+    def close(self, summary=True):
+        if self._fd is None:
+            return
+        self._stop.set()
+        if self._sampler:
+            self._sampler.join()
+        os.close(self._fd)
+        self._fd = None
+        if summary and self.stages:
+            print_summary(self.stages)
+            print(f"[trace] {self.path}")
+
+
+class NullTracer:
+    """Tracing disabled: same interface, no cost"""
+    stages = ()
+
+    def event(self, *args, **kwargs):
+        pass
+
+    def tensor(self, *args, **kwargs):
+        pass
+
+    @contextmanager
+    def stage(self, name, **args):
+        yield dict(args)
+
+    def close(self, summary=True):
+        pass
+
+
+_active = None
+
+
+def get_tracer():
+    """The tracer of this process; worker processes join the trace named by MIBERA_TRACE"""
+    global _active
+    if _active is None or getattr(_active, "pid", os.getpid()) != os.getpid():
+        # Unset, or inherited through fork: this process writes its own events
+        path = os.environ.get(TRACE_ENV)
+        _active = Tracer(path) if path and path != "0" else NullTracer()
+    return _active
+
+
+def start_trace(tool):
+    """Enable tracing for a tool's run and print the summary at exit"""
+    global _active
+    path = os.environ.get(TRACE_ENV)
+    if path == "0":
+        _active = NullTracer()
+        return _active
+    if not path:
+        path = os.path.join(TRACE_DIR, f"{tool}-{time.strftime('%Y%m%d-%H%M%S')}.json")
+        os.environ[TRACE_ENV] = path  # children and wrapped commands append to the same file
+    _active = Tracer(path, tool, sample=True)
+    atexit.register(_active.close)
+    return _active
+
+
+def print_summary(stages):
+    memory = total_memory()
+    print(f"[trace] {'stage':<28} {'wall':>8} {'cpu':>8} {'read':>10} {'written':>10} {'peak RSS':>10}  bound")
+    for s in stages:
+        mb = lambda k: f"{(s.get(k) or 0) / (1024**2):8.1f}MB"
+        rss = f"{s['peak_rss'] / (1024**2):8.1f}MB" if s.get("peak_rss") else f"{'-':>10}"
+        print(f"[trace] {s['name'][:28]:<28} {s['seconds']:7.1f}s {s.get('cpu_seconds', 0):7.1f}s "
+              f"{mb('read')} {mb('written')} {rss}  {classify(s, memory)}")
+
+
+def load_trace(path):
+    """Events of a (possibly unterminated) JSON-array trace file"""
+    with open(path, 'r') as f:
+        text = f.read().rstrip().rstrip(",")
+    if not text.endswith("]"):
+        text += "]"
+    return json.loads(text)
+
+
+def wait_child(proc):
+    """Wait for a Popen child; returns a stage record of its own CPU, peak RSS and block I/O"""
+    record = {}
+    if hasattr(os, "wait4"):
+        _, status, usage = os.wait4(proc.pid, 0)
+        proc.returncode = os.waitstatus_to_exitcode(status)
+        blocks_in, blocks_out = usage.ru_inblock * 512, usage.ru_oublock * 512
+        record.update(cpu_seconds=usage.ru_utime + usage.ru_stime,
+                      peak_rss=usage.ru_maxrss * (1 if sys.platform == "darwin" else 1024),
+                      read=blocks_in, written=blocks_out, disk_read=blocks_in, disk_written=blocks_out)
+    else:
+        proc.wait()
+    record["returncode"] = proc.returncode
+    return record
+
+
+def run_command(stage, cmd):
+    """Run cmd as a traced stage; returns its exit code"""
+    start = time.time()
+    record = wait_child(subprocess.Popen(cmd))
+    record.update(name=stage, seconds=time.time() - start, command=" ".join(cmd))
+    get_tracer().event(stage, start, record["seconds"],
+                       **{k: v for k, v in record.items() if k not in ("name", "seconds")})
+    print_summary([record])
+    return record["returncode"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Trace pipeline stages (Chrome trace format)")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_run = sub.add_parser("run", help="Run a command as a traced stage")
+    p_run.add_argument("--stage", required=True, help="Stage name")
+    p_run.add_argument("cmd", nargs=argparse.REMAINDER, help="-- command and arguments")
+    p_sum = sub.add_parser("summary", help="Print the stage table of a trace file")
+    p_sum.add_argument("trace")
+    args = parser.parse_args()
+
+    if args.command == "run":
+        cmd = args.cmd[1:] if args.cmd[:1] == ["--"] else args.cmd
+        if not cmd:
+            parser.error("missing command")
+        return run_command(args.stage, cmd)
+
+    events = load_trace(args.trace)
+    stages = [dict(e["args"], name=e["name"], seconds=e["dur"] / 1e6)
+              for e in events if e.get("ph") == "X" and e.get("cat") == "stage"]
+    tensors = [e for e in events if e.get("ph") == "X" and e.get("cat") == "tensor"]
+    print_summary(stages)
+    if tensors:
+        slowest = sorted(tensors, key=lambda e: -e["dur"])[:5]
+        print(f"[trace] {len(tensors)} tensor events; slowest:")
+        for e in slowest:
+            mb = e["args"].get("bytes", 0) / (1024**2)
+            print(f"  {e['name']:<40} {e['dur'] / 1e6:7.2f}s {mb:9.1f} MB")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
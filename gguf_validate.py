@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+"""
+Fail-fast GGUF shape/contract validator.
+
+Reads only the header and tensor-info table (no tensor data) and checks every
+layer against the Mibera phi2 contract derived from the header's own
+hyperparameters:
+
+  attn_qkv   [n_embd, n_embd + 2 * head_dim * n_head_kv]   (7680 for GQA)
+  ffn_gate   [n_embd, n_ff] and ffn_up [n_embd, n_ff]      (split, 17920)
+             or ffn_up [n_embd, 2 * n_ff] with no ffn_gate   (fused gate_up)
+  ffn_down   [n_ff, n_embd]
+  biases     width of the tensor they belong to; output_norm.bias required
+  token_embd / output rows = tokenizer vocabulary size
+
+Shapes of one kind are compared for all layers at once with numpy and every
+violation is reported together, so a bad file is rejected in milliseconds
+instead of after minutes in a loader.
+
+  python gguf_validate.py mibera-Q3_K_M.gguf
+  python gguf_validate.py output/*.gguf --quiet
+"""
+import argparse
+import re
+import sys
+import time
+
+import numpy as np
+
+from gguf_io import GGML_TYPES, embedding_length, read_header
+
+_LAYER_RE = re.compile(r"^blk\.(\d+)\.(.+)$")
+
+
+def contract(header):
+    """Expected hyperparameters and {suffix: (shape, required)} for per-layer and global tensors"""
+    arch = header.architecture or "phi2"
+    n_embd = embedding_length(header)
+    n_head = header.get(f"{arch}.attention.head_count", 32)
+    n_head_kv = header.get(f"{arch}.attention.head_count_kv", n_head)
+    head_dim = n_embd // n_head
+    n_kv = head_dim * n_head_kv
+    n_qkv = n_embd + 2 * n_kv
+    n_ff = header.get(f"{arch}.feed_forward_length", 17920)
+    n_layer = header.get(f"{arch}.block_count", 40)
+    tokens = header.get("tokenizer.ggml.tokens")
+    embd = header.tensor("token_embd.weight")
+    n_vocab = len(tokens) if tokens is not None else (embd.shape[1] if embd is not None else 100352)
+
+    separate_qkv = any(t.name.endswith(".attn_q.weight") for t in header.tensors)
+    # The fused pipeline output keeps gate and up in one ffn_up of twice the width
+    fused_ffn = (not any(t.name.endswith(".ffn_gate.weight") for t in header.tensors)
+                 and any(t.name.endswith(".ffn_up.weight") and len(t.shape) == 2 and t.shape[1] == 2 * n_ff
+                         for t in header.tensors))
+    n_up = 2 * n_ff if fused_ffn else n_ff
+    layer = {
+        "attn_norm.weight": ((n_embd,), True),
+        "attn_norm.bias": ((n_embd,), False),
+        "attn_output.weight": ((n_embd, n_embd), True),
+        "attn_output.bias": ((n_embd,), False),
+        "ffn_norm.weight": ((n_embd,), False),
+        "ffn_up.weight": ((n_embd, n_up), True),
+        "ffn_up.bias": ((n_up,), False),
+        "ffn_down.weight": ((n_ff, n_embd), True),
+        "ffn_down.bias": ((n_embd,), False),
+    }
+    if not fused_ffn:
+        layer["ffn_gate.weight"] = ((n_embd, n_ff), True)
+        layer["ffn_gate.bias"] = ((n_ff,), False)
+    if separate_qkv:
+        layer.update({
+            "attn_q.weight": ((n_embd, n_embd), True),
+            "attn_k.weight": ((n_embd, n_kv), True),
+            "attn_v.weight": ((n_embd, n_kv), True),
+        })
+    else:
+        layer.update({
+            "attn_qkv.weight": ((n_embd, n_qkv), True),
+            "attn_qkv.bias": ((n_qkv,), False),
+        })
+    glob = {
+        "token_embd.weight": ((n_embd, n_vocab), True),
+        "output_norm.weight": ((n_embd,), True),
+        "output_norm.bias": ((n_embd,), True),
+        "output.weight": ((n_embd, n_vocab), False),
+    }
+    params = {"n_embd": n_embd, "n_head": n_head, "n_head_kv": n_head_kv, "head_dim": head_dim,
+              "n_qkv": n_qkv, "n_ff": n_ff, "n_layer": n_layer, "n_vocab": n_vocab, "fused_ffn": fused_ffn}
+    return params, layer, glob
+
+
+def _shape_array(shapes):
+    """Pad shapes to 2 dims (trailing 1s) as an int64 matrix"""
+    out = np.ones((len(shapes), 2), dtype=np.int64)
+    for i, s in enumerate(shapes):
+        out[i, :len(s)] = s[:2]
+    return out
+
+
+def validate(header):
+    """List of human-readable violations (empty when the file matches the contract)"""
+    params, layer, glob = contract(header)
+    n_layer = params["n_layer"]
+    problems = []
+
+    if params["n_embd"] % params["n_head"]:
+        problems.append(f"n_embd {params['n_embd']} not divisible by head_count {params['n_head']}")
+    if params["n_head"] % params["n_head_kv"]:
+        problems.append(f"head_count {params['n_head']} not a multiple of head_count_kv {params['n_head_kv']}")
+
+    # Group per-layer tensors by suffix: layer indices + shapes
+    by_kind = {}
+    for t in header.tensors:
+        m = _LAYER_RE.match(t.name)
+        if m:
+            by_kind.setdefault(m.group(2), []).append((int(m.group(1)), t.shape))
+        elif t.name not in glob:
+            problems.append(f"{t.name}: unexpected tensor")
+
+    all_layers = np.arange(n_layer)
+    for suffix, (shape, required) in layer.items():
+        entries = by_kind.pop(suffix, [])
+        layers = np.array([e[0] for e in entries], dtype=np.int64)
+        if required:
+            missing = np.setdiff1d(all_layers, layers)
+            if missing.size:
+                problems.append(f"blk.*.{suffix}: missing in {missing.size} layers ({_ranges(missing)})")
+        if not entries:
+            continue
+        extra = layers[layers >= n_layer]
+        if extra.size:
+            problems.append(f"blk.*.{suffix}: layers {_ranges(extra)} beyond block_count {n_layer}")
+        expected = np.array(shape + (1,) * (2 - len(shape)), dtype=np.int64)
+        bad = np.nonzero(np.any(_shape_array([e[1] for e in entries]) != expected, axis=1))[0]
+        for i in bad[:3]:
+            problems.append(f"blk.{layers[i]}.{suffix}: shape {list(entries[i][1])}, expected {list(shape)}"
+                            + _hint(suffix, entries[i][1], params))
+        if bad.size > 3:
+            problems.append(f"blk.*.{suffix}: {bad.size - 3} more layers with the wrong shape")
+    for suffix, entries in by_kind.items():
+        problems.append(f"blk.*.{suffix}: unexpected tensor in {len(entries)} layers")
+
+    for name, (shape, required) in glob.items():
+        info = header.tensor(name)
+        if info is None:
+            if required:
+                problems.append(f"{name}: missing" + (" (run surgery_add_bias.py)" if name.endswith(".bias") else ""))
+            continue
+        if tuple(info.shape) != shape:
+            problems.append(f"{name}: shape {info.shape}, expected {list(shape)}")
+
+    # Quantized rows must be a whole number of blocks
+    types = np.array([t.tensor_type for t in header.tensors], dtype=np.int64)
+    ne0 = np.array([t.shape[0] if t.shape else 1 for t in header.tensors], dtype=np.int64)
+    known = np.isin(types, list(GGML_TYPES))
+    blocks = np.array([GGML_TYPES.get(int(t), ("", 1, 0))[1] for t in types], dtype=np.int64)
+    for i in np.nonzero(known & (ne0 % blocks != 0))[0]:
+        t = header.tensors[i]
+        problems.append(f"{t.name}: row length {ne0[i]} not a multiple of {t.type_name} block size {blocks[i]}")
+    return problems
+
+
+def _hint(suffix, shape, params):
+    if suffix == "attn_qkv.weight" and len(shape) == 2 and shape[1] == 3 * params["n_embd"]:
+        return " (MHA-sized QKV; this model uses GQA)"
+    if suffix == "ffn_up.weight" and len(shape) == 2 and shape[1] == 2 * params["n_ff"]:
+        return " (fused gate_up; run split_ffn_tensors.py)"
+    return ""
+
+
+def _ranges(values):
+    """[0, 1, 2, 5] -> '0-2, 5'"""
+    values = sorted(int(v) for v in values)
+    parts = []
+    start = prev = values[0]
+    for v in values[1:] + [None]:
+        if v is not None and v == prev + 1:
+            prev = v
+            continue
+        parts.append(f"{start}-{prev}" if prev != start else str(start))
+        if v is not None:
+            start = prev = v
+    return ", ".join(parts)
+
+
+def preflight(path, quiet=False):
+    """Validate a model before loading it; prints violations and returns True when it is loadable"""
+    start = time.time()
+    try:
+        header = read_header(path)
+    except (OSError, ValueError) as e:
+        print(f"[validate] {path}: unreadable GGUF header: {e}")
+        return False
+    problems = validate(header)
+    elapsed = (time.time() - start) * 1000
+    if problems:
+        print(f"[validate] {path}: {len(problems)} contract violations ({elapsed:.0f} ms)")
+        for p in problems:
+            print(f"  - {p}")
+    elif not quiet:
+        print(f"[validate] {path}: OK, {len(header.tensors)} tensors match the contract ({elapsed:.0f} ms)")
+        if contract(header)[0]["fused_ffn"]:
+            print("[validate]   fused gate_up FFN; split_ffn_tensors.py splits it if a loader needs ffn_gate")
+    return not problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check GGUF tensor shapes against the Mibera architecture contract")
+    parser.add_argument("models", nargs="+", help="GGUF files")
+    parser.add_argument("--quiet", action="store_true", help="Only print files with violations")
+    args = parser.parse_args()
+
+    ok = [preflight(path, args.quiet) for path in args.models]
+    return 0 if all(ok) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -2,55 +2,75 @@
 """
 Automated Architecture Inspection for Mibera Model
 Verifies config.json matches actual tensor dimensions
+
+Only the JSON headers of the shards are parsed (all shards, in parallel),
+so no tensor is ever loaded and a 13-shard checkpoint checks in well under
+a second.
 """
 import json
-import glob
-import safetensors
 import sys
 import re
+import time
+
+from safetensors_header import scan_shards, find_shards
+
+LAYER_PATTERN = re.compile(r"model\.layers\.(\d+)\.(.+)$")
+
+
+def infer_architecture(tensors, cfg):
+    """Infer layer count, fused QKV/FFN layout and GQA heads from tensor shapes"""
+    arch = {}
+    if "model.embed_tokens.weight" not in tensors:
+        print("ERROR: Could not find embedding tensor")
+        sys.exit(1)
+    vocab, hidden = tensors["model.embed_tokens.weight"].shape
+    arch["vocab_size"] = vocab
+    arch["hidden_size"] = hidden
+
+    layers = {}
+    for name in tensors:
+        m = LAYER_PATTERN.match(name)
+        if m:
+            layers.setdefault(int(m.group(1)), set()).add(m.group(2))
+    arch["num_hidden_layers"] = max(layers) + 1 if layers else 0
+    arch["layer_tensors"] = layers
+
+    n_head = cfg.get("num_attention_heads")
+    head_dim = cfg.get("head_dim") or (hidden // n_head if n_head else None)
+
+    qkv = tensors.get("model.layers.0.self_attn.qkv_proj.weight")
+    k_proj = tensors.get("model.layers.0.self_attn.k_proj.weight")
+    arch["fused_qkv"] = qkv is not None
+    if qkv is not None and head_dim:
+        arch["qkv_width"] = qkv.shape[0]
+        arch["num_key_value_heads"] = (qkv.shape[0] - (n_head or 0) * head_dim) // (2 * head_dim)
+    elif k_proj is not None and head_dim:
+        arch["num_key_value_heads"] = k_proj.shape[0] // head_dim
+
+    gate_up = tensors.get("model.layers.0.mlp.gate_up_proj.weight")
+    up = tensors.get("model.layers.0.mlp.up_proj.weight")
+    arch["fused_ffn"] = gate_up is not None
+    if gate_up is not None:
+        arch["intermediate_size"] = gate_up.shape[0] // 2
+    elif up is not None:
+        arch["intermediate_size"] = up.shape[0]
+    return arch
+
 
-def inspect_model(model_dir="."):
+def inspect_model(model_dir=".", workers=8):
     """Inspect model architecture and verify config consistency"""
-    
-    # Find first safetensor file
-    pattern = f"{model_dir}/model-*.safetensors"
-    safetensor_files = sorted(glob.glob(pattern))
-    
-    if not safetensor_files:
-        print(f"ERROR: No safetensor files found matching {pattern}")
+
+    shards = find_shards(model_dir)
+    if not shards:
+        print(f"ERROR: No safetensor files found in {model_dir}")
         sys.exit(1)
-    
-    ckpt = safetensor_files[0]
-    print(f"Inspecting: {ckpt}")
-    
-    # Open and analyze tensors
-    with safetensors.safe_open(ckpt, framework="pt") as f:
-        # Get embedding dimensions
-        if "model.embed_tokens.weight" in f.keys():
-            emb_shape = f.get_tensor("model.embed_tokens.weight").shape
-            vocab, hidden = emb_shape
-        else:
-            print("ERROR: Could not find embedding tensor")
-            sys.exit(1)
-        
-        # Find max layer number
-        layer_pattern = re.compile(r"model\.layers\.(\d+)\.")
-        max_layer = -1
-        for name in f.keys():
-            m = layer_pattern.match(name)
-            if m:
-                max_layer = max(max_layer, int(m.group(1)))
-        
-        # Check for fused QKV projection
-        fused = any("qkv_proj" in k for k in f.keys())
-    
-    print(f"\nDetected architecture:")
-    print(f"  hidden_size={hidden}")
-    print(f"  vocab_size={vocab}")
-    print(f"  num_hidden_layers={max_layer+1}")
-    print(f"  fused_qkv={fused}")
-    
-    # Load and verify config
+
+    start = time.perf_counter()
+    tensors = scan_shards(model_dir, workers=workers)
+    elapsed = (time.perf_counter() - start) * 1000
+    print(f"Inspected {len(shards)} shards, {len(tensors)} tensors in {elapsed:.0f} ms (headers only)")
+
+    # Load config
     config_path = f"{model_dir}/config.json"
     try:
         with open(config_path, 'r') as f:
@@ -58,13 +78,32 @@ def inspect_model(model_dir="."):
     except FileNotFoundError:
         print(f"ERROR: {config_path} not found")
         sys.exit(1)
-    
+
+    arch = infer_architecture(tensors, cfg)
+
+    print(f"\nDetected architecture:")
+    for key in ("hidden_size", "vocab_size", "num_hidden_layers", "num_key_value_heads",
+                "intermediate_size", "fused_qkv", "fused_ffn"):
+        if key in arch:
+            print(f"  {key}={arch[key]}")
+    if "qkv_width" in arch:
+        print(f"  qkv_width={arch['qkv_width']}")
+
     # Check for mismatches
     problems = []
-    for k, v in [("hidden_size", hidden), ("vocab_size", vocab), ("num_hidden_layers", max_layer+1)]:
-        if cfg.get(k) != v:
-            problems.append(f"{k}: config {cfg.get(k)} != actual {v}")
-    
+    for k in ("hidden_size", "vocab_size", "num_hidden_layers", "num_key_value_heads", "intermediate_size"):
+        if k in arch and k in cfg and cfg.get(k) != arch[k]:
+            problems.append(f"{k}: config {cfg.get(k)} != actual {arch[k]}")
+
+    # Every layer should carry the same set of tensors
+    layer_tensors = arch["layer_tensors"]
+    if layer_tensors:
+        expected = set.union(*layer_tensors.values())
+        for layer in range(arch["num_hidden_layers"]):
+            missing = expected - layer_tensors.get(layer, set())
+            if missing:
+                problems.append(f"layer {layer} missing: {', '.join(sorted(missing))}")
+
     print("\nConfig verification:")
     if problems:
         print("MISMATCHES FOUND:")
@@ -77,6 +116,8 @@ def inspect_model(model_dir="."):
         print(f"  hidden_size: {cfg.get('hidden_size')}")
         print(f"  vocab_size: {cfg.get('vocab_size')}")
         print(f"  num_hidden_layers: {cfg.get('num_hidden_layers')}")
+        print(f"  num_key_value_heads: {cfg.get('num_key_value_heads')}")
+        print(f"  intermediate_size: {cfg.get('intermediate_size')}")
         print(f"  architectures: {cfg.get('architectures')}")
         print(f"  model_type: {cfg.get('model_type')}")
         return 0
@@ -85,6 +126,7 @@ if __name__ == "__main__":
     import argparse
     parser = argparse.ArgumentParser(description="Inspect Mibera model architecture")
     parser.add_argument("model_dir", nargs="?", default=".", help="Model directory path")
+    parser.add_argument("--workers", type=int, default=8, help="Shards whose headers are read concurrently")
     args = parser.parse_args()
-    
-    sys.exit(inspect_model(args.model_dir))
\ No newline at end of file
+
+    sys.exit(inspect_model(args.model_dir, workers=args.workers))
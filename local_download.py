@@ -2,9 +2,10 @@
 # Run this on your LOCAL machine after cloud conversion
 
 import os
-import subprocess
 import sys
 
+from mibera_fetch import open_source, fetch_checksums, download, Stats
+
 def download_from_cloud():
     """Download converted GGUF files from cloud instance"""
     
@@ -34,40 +35,34 @@ def download_from_cloud():
     print(f"Downloading to: {local_dir}")
     print()
     
-    for filename in files_to_download:
-        print(f"Downloading {filename}...")
-        
-        # SCP command
-        remote_path = f"root@{cloud_ip}:/workspace/mibera/output/{filename}"
-        local_path = os.path.join(local_dir, filename)
-        
-        scp_cmd = [
-            "scp", 
-            "-P", cloud_port,
-            "-o", "StrictHostKeyChecking=no",
-            remote_path, 
-            local_path
-        ]
-        
-        print(f"Command: {' '.join(scp_cmd)}")
-        
-        try:
-            result = subprocess.run(scp_cmd, check=True, capture_output=True, text=True)
-            if os.path.exists(local_path):
-                size_mb = os.path.getsize(local_path) / (1024*1024)
-                print(f"✓ Downloaded {filename} ({size_mb:.1f} MB)")
-            else:
-                print(f"⚠ Download may have failed for {filename}")
-        except subprocess.CalledProcessError as e:
-            print(f"✗ Failed to download {filename}: {e}")
-        except FileNotFoundError:
-            print("ERROR: SCP not found. You may need to:")
-            print("1. Install Git for Windows (includes SCP)")
-            print("2. Use WinSCP or another SCP client")
-            print("3. Or download files manually via the vast.ai web interface")
-            return False
-        
-        print()
+    # Parallel byte ranges; an interrupted download resumes from its .part journal
+    source = open_source(f"ssh://root@{cloud_ip}:{cloud_port}/workspace/mibera")
+    stats = Stats()
+    try:
+        sums = fetch_checksums(source)
+        for filename in files_to_download:
+            print(f"Downloading {filename}...")
+            local_path = os.path.join(local_dir, filename)
+            try:
+                download(source, f"output/{filename}", local_path, sums.get(filename), stats=stats)
+            except FileNotFoundError:
+                raise
+            except Exception as e:
+                print(f"✗ Failed to download {filename}: {e} (run again to resume)")
+            
+            print()
+    except FileNotFoundError:
+        print("ERROR: SSH not found. You may need to:")
+        print("1. Install Git for Windows (includes SSH)")
+        print("2. Or run `python mibera_fetch.py serve /workspace/mibera --host 0.0.0.0` on the instance")
+        print("   (unauthenticated; only on a trusted network) and")
+        print("   `python mibera_fetch.py get http://<ip>:8000/ ...` locally")
+        return False
+    except Exception as e:
+        print(f"✗ Failed to fetch the checksum manifest: {e}")
+        return False
+    print(f"{stats.bytes / (1024**2):.1f} MB transferred ({stats.rate():.1f} MB/s aggregate)")
+    print()
     
     # Verify downloads
     print("=== DOWNLOAD SUMMARY ===")
@@ -61,7 +61,11 @@ if python3 convert_hf_to_gguf.py models/mibera --outfile output/mibera-Q3_K_M.gg
     echo "✓ Direct Q3_K_M conversion successful"
 else
     echo "Direct conversion failed, using 2-step process..."
-    python3 convert_hf_to_gguf.py models/mibera --outfile output/mibera-f16.gguf --outtype f16
+    if [ -f convert_mibera_parallel.py ]; then
+        python3 convert_mibera_parallel.py models/mibera --outfile output/mibera-f16.gguf
+    else
+        python3 convert_hf_to_gguf.py models/mibera --outfile output/mibera-f16.gguf --outtype f16
+    fi
     ./llama-quantize output/mibera-f16.gguf output/mibera-Q3_K_M.gguf Q3_K_M
     rm output/mibera-f16.gguf
     echo "✓ 2-step Q3_K_M conversion successful"
@@ -109,11 +113,17 @@ timeout 60s ./llama-cli -m output/mibera-Q3_K_M.gguf -n 100 -p "Performance test
 
 # Quality samples
 echo "Generating quality samples..."
-for prompt_file in eval/*_prompt.txt; do
-    name=$(basename "$prompt_file" .txt)
-    echo "Testing: $name"
-    timeout 45s ./llama-cli -m output/mibera-Q3_K_M.gguf -f "$prompt_file" -n 150 --temp 0.7 --top-p 0.9 > "eval/${name}_output.txt" 2>&1 || echo "Timeout on $name"
-done
+if [ -f mibera_eval.py ] && [ -x ./llama-server ]; then
+    # One model load, prompts decoded as parallel sequences; results in eval/mibera-Q3_K_M-eval.jsonl
+    python3 mibera_eval.py output/mibera-Q3_K_M.gguf eval/*_prompt.txt mibera_lore_prompts.txt \
+        --llama-server ./llama-server --parallel 4 -n 150 --temperature 0.7 --top-p 0.9 || echo "Some prompts failed"
+else
+    for prompt_file in eval/*_prompt.txt; do
+        name=$(basename "$prompt_file" .txt)
+        echo "Testing: $name"
+        timeout 45s ./llama-cli -m output/mibera-Q3_K_M.gguf -f "$prompt_file" -n 150 --temp 0.7 --top-p 0.9 > "eval/${name}_output.txt" 2>&1 || echo "Timeout on $name"
+    done
+fi
 
 # Memory analysis
 echo "Memory footprint analysis..."
@@ -131,7 +141,12 @@ echo "=== PHASE 5: PACKAGING ==="
 # Generate checksums
 echo "Generating checksums..."
 cd output
-sha256sum mibera-Q3_K_M.gguf > mibera-checksums.txt
+if [ -f ../gguf_checksum.py ]; then
+    # Reuses the digest recorded while the file was written when it is still valid
+    python3 ../gguf_checksum.py manifest mibera-Q3_K_M.gguf > mibera-checksums.txt
+else
+    sha256sum mibera-Q3_K_M.gguf > mibera-checksums.txt
+fi
 cd ..
 
 # Create summary report
@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+"""
+Memory-budget autotuner: pick the quant file, n_ctx, n_batch and mmap/mlock
+that fit this machine.
+
+Memory is estimated from the GGUF header instead of a hand-kept table:
+
+  weights   sum of tensor bytes
+  KV cache  2 (K and V) x n_layer x n_head_kv x head_dim x n_ctx x 2 bytes (F16)
+            = 200 KB per token for Mibera (40 layers, 8 KV heads, head_dim 160)
+  compute   logits + activations for one n_batch chunk + KQ scores over n_ctx
+
+The largest quant that fits (with at least MIN_CTX / MIN_BATCH) wins, then the
+largest context, then the largest prompt batch, all under available RAM minus
+the configured headroom.
+
+  python mibera_autotune.py C:\\mibera\\models\\*.gguf
+  python mibera_autotune.py models/*.gguf --headroom-gb 1.5 --json tune.json
+"""
+import argparse
+import glob
+import json
+import os
+import sys
+
+from gguf_io import embedding_length, read_header
+
+CTX_CHOICES = [8192, 4096, 3072, 2048, 1024, 512, 256]
+BATCH_CHOICES = [512, 256, 128, 64, 32]
+MIN_CTX = 512
+MIN_BATCH = 32
+DEFAULT_HEADROOM = 1.5 * 1024**3
+RUNTIME_OVERHEAD = 256 * 1024**2   # llama.cpp + Python + tokenizer tables
+KV_BYTES_PER_ELEM = 2              # F16 cache
+
+
+def available_memory():
+    """Bytes of RAM available to a new process"""
+    try:
+        import psutil
+        return psutil.virtual_memory().available
+    except ImportError:
+        pass
+    if os.path.exists("/proc/meminfo"):
+        with open("/proc/meminfo") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) * 1024
+    if sys.platform == "win32":
+        import ctypes
+
+        class MEMORYSTATUSEX(ctypes.Structure):
+            _fields_ = [("dwLength", ctypes.c_ulong), ("dwMemoryLoad", ctypes.c_ulong),
+                        ("ullTotalPhys", ctypes.c_ulonglong), ("ullAvailPhys", ctypes.c_ulonglong),
+                        ("ullTotalPageFile", ctypes.c_ulonglong), ("ullAvailPageFile", ctypes.c_ulonglong),
+                        ("ullTotalVirtual", ctypes.c_ulonglong), ("ullAvailVirtual", ctypes.c_ulonglong),
+                        ("ullAvailExtendedVirtual", ctypes.c_ulonglong)]
+        stat = MEMORYSTATUSEX()
+        stat.dwLength = ctypes.sizeof(MEMORYSTATUSEX)
+        ctypes.windll.kernel32.GlobalMemoryStatusEx(ctypes.byref(stat))
+        return stat.ullAvailPhys
+    raise RuntimeError("Cannot determine available memory (install psutil)")
+
+
+def _max_count(value):
+    """Head counts may be per-layer arrays in GGUF; size for the largest layer"""
+    if isinstance(value, (int, float)):
+        return int(value)
+    values = list(value)
+    if not values:
+        raise ValueError("empty per-layer head count array")
+    return int(max(values))
+
+
+class ModelShape:
+    """What the memory estimate needs from a GGUF header"""
+
+    def __init__(self, path):
+        header = read_header(path)
+        arch = header.architecture or "phi2"
+        self.path = path
+        self.weight_bytes = sum(t.n_bytes for t in header.tensors)
+        self.n_layer = header.get(f"{arch}.block_count", 40)
+        self.n_embd = embedding_length(header)
+        self.n_head = _max_count(header.get(f"{arch}.attention.head_count", 32))
+        self.n_head_kv = _max_count(header.get(f"{arch}.attention.head_count_kv", self.n_head))
+        self.head_dim = header.get(f"{arch}.attention.key_length", self.n_embd // self.n_head)
+        self.n_ff = header.get(f"{arch}.feed_forward_length", 4 * self.n_embd)
+        self.n_ctx_train = header.get(f"{arch}.context_length", 16384)
+        embd = header.tensor("token_embd.weight")
+        self.n_vocab = embd.shape[1] if embd is not None else 100352
+
+    def kv_bytes(self, n_ctx):
+        return 2 * self.n_layer * self.n_head_kv * self.head_dim * n_ctx * KV_BYTES_PER_ELEM
+
+    def compute_bytes(self, n_ctx, n_batch):
+        # F32 activations for one batch, the logits row block and the KQ score matrix
+        activations = n_batch * (4 * self.n_embd + 2 * self.n_ff) * 4
+        logits = n_batch * self.n_vocab * 4
+        scores = n_batch * n_ctx * self.n_head * 4
+        return activations + logits + scores
+
+    def total_bytes(self, n_ctx, n_batch):
+        return self.weight_bytes + self.kv_bytes(n_ctx) + self.compute_bytes(n_ctx, n_batch) + RUNTIME_OVERHEAD
+
+
+def tune(models, available=None, headroom=DEFAULT_HEADROOM, threads=None):
+    """Return the chosen config dict (plus a per-model breakdown under 'candidates')"""
+    available = available_memory() if available is None else available
+    budget = available - headroom
+    shapes = sorted((ModelShape(p) for p in models), key=lambda s: -s.weight_bytes)
+
+    candidates = []
+    chosen = None
+    for shape in shapes:
+        fit = None
+        for n_ctx in [c for c in CTX_CHOICES if c <= shape.n_ctx_train]:
+            for n_batch in [b for b in BATCH_CHOICES if b <= n_ctx]:
+                if shape.total_bytes(n_ctx, n_batch) <= budget:
+                    fit = (n_ctx, n_batch)
+                    break
+            if fit:
+                break
+        candidates.append({"model": shape.path, "weights_gb": shape.weight_bytes / 1024**3,
+                           "fit": fit is not None and fit[0] >= MIN_CTX and fit[1] >= MIN_BATCH})
+        if chosen is None and candidates[-1]["fit"]:
+            chosen = (shape, fit)
+
+    paging = chosen is None
+    if paging:
+        # Nothing fits: smallest model, minimum settings, let mmap page weights in
+        shape = shapes[-1]
+        chosen = (shape, (MIN_CTX, MIN_BATCH))
+
+    shape, (n_ctx, n_batch) = chosen
+    total = shape.total_bytes(n_ctx, n_batch)
+    return {
+        "model_path": shape.path,
+        "n_ctx": n_ctx,
+        "n_batch": n_batch,
+        "n_threads": threads or max(1, (os.cpu_count() or 2) - 1),
+        "use_mmap": True,
+        # Locking only pays off when everything fits with room to spare
+        "use_mlock": not paging and total <= 0.8 * budget,
+        "estimate": {
+            "available_gb": available / 1024**3,
+            "budget_gb": budget / 1024**3,
+            "weights_gb": shape.weight_bytes / 1024**3,
+            "kv_gb": shape.kv_bytes(n_ctx) / 1024**3,
+            "compute_gb": shape.compute_bytes(n_ctx, n_batch) / 1024**3,
+            "total_gb": total / 1024**3,
+            "kv_kb_per_token": shape.kv_bytes(1) / 1024,
+            "fits": not paging,
+        },
+        "candidates": candidates,
+    }
+
+
+def llama_kwargs(config):
+    """Keyword arguments for llama_cpp.Llama from a tune() result"""
+    return {k: config[k] for k in ("model_path", "n_ctx", "n_batch", "n_threads", "use_mmap", "use_mlock")}
+
+
+def report(config):
+    est = config["estimate"]
+    print(f"[autotune] Available {est['available_gb']:.1f} GB, budget {est['budget_gb']:.1f} GB after headroom")
+    for c in config["candidates"]:
+        mark = "fits" if c["fit"] else "too big"
+        print(f"  {os.path.basename(c['model']):<32} {c['weights_gb']:6.2f} GB weights  {mark}")
+    print(f"[autotune] Chosen: {os.path.basename(config['model_path'])} n_ctx={config['n_ctx']} "
+          f"n_batch={config['n_batch']} threads={config['n_threads']} "
+          f"mmap={config['use_mmap']} mlock={config['use_mlock']}")
+    print(f"[autotune] Estimate: weights {est['weights_gb']:.2f} + KV {est['kv_gb']:.2f} "
+          f"({est['kv_kb_per_token']:.0f} KB/token) + compute {est['compute_gb']:.2f} "
+          f"= {est['total_gb']:.2f} GB")
+    if not est["fits"]:
+        print("[autotune] WARNING: no model fits in RAM; weights will be paged from disk (slow)")
+
+
+def expand(patterns):
+    files = []
+    for pattern in patterns:
+        files.extend(glob.glob(pattern) or ([pattern] if os.path.exists(pattern) else []))
+    return sorted({f for f in files if f.endswith(".gguf")})
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pick quant, n_ctx, n_batch and mmap/mlock for this machine")
+    parser.add_argument("models", nargs="+", help="Candidate GGUF files or globs")
+    parser.add_argument("--headroom-gb", type=float, default=DEFAULT_HEADROOM / 1024**3,
+                        help="RAM to leave for the OS and other programs")
+    parser.add_argument("--available-gb", type=float, help="Override detected available RAM")
+    parser.add_argument("--threads", type=int, help="Threads to pass through (default: cores - 1)")
+    parser.add_argument("--json", help="Write the chosen config to this file")
+    args = parser.parse_args()
+
+    models = expand(args.models)
+    if not models:
+        print("No GGUF files found")
+        return 1
+    available = int(args.available_gb * 1024**3) if args.available_gb else None
+    config = tune(models, available, int(args.headroom_gb * 1024**3), args.threads)
+    report(config)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(config, f, indent=2)
+        print(f"[autotune] Wrote {args.json}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,329 @@
+#!/usr/bin/env python3
+"""
+Cross-platform Mibera benchmark suite (replaces benchmark_local.ps1).
+
+Sweeps models x threads x batch size x context through llama-cli and records,
+per run: load time, prompt-eval tok/s, generation tok/s, time to first token
+and the peak RSS of the llama-cli process itself (not of this script). Results
+go to a local SQLite history; a stored baseline per configuration turns the
+tool into a regression check (exit code 1 when something got slower or bigger).
+
+  python mibera_bench.py run models/*.gguf --threads 2 4 --batch 32 512 --ctx 512 2048
+  python mibera_bench.py run tiny.gguf --set-baseline
+  python mibera_bench.py history --limit 20
+"""
+import argparse
+import glob
+import itertools
+import os
+import platform
+import re
+import shutil
+import sqlite3
+import subprocess
+import sys
+import threading
+import time
+
+DEFAULT_DB = "benchmark_history.sqlite"
+DEFAULT_PROMPT = ("You are Mibera from the High Council of 101 Bears. "
+                  "Explain the Fat Bera Thesis in three short paragraphs.")
+LLAMA_CLI_CANDIDATES = [
+    "./llama-cli",
+    "llama.cpp/build/bin/llama-cli",
+    "llama.cpp/llama-cli",
+]
+DEFAULT_TOLERANCE = 0.10
+
+# llama_perf_context_print (new) / llama_print_timings (old) lines
+_LOAD_RE = re.compile(r"load time\s*=\s*([\d.]+)\s*ms")
+_PROMPT_RE = re.compile(r"prompt eval time\s*=\s*([\d.]+)\s*ms\s*/\s*(\d+)\s*tokens")
+_EVAL_RE = re.compile(r"(?<!prompt )eval time\s*=\s*([\d.]+)\s*ms\s*/\s*(\d+)\s*(?:runs|tokens)")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    ts REAL, host TEXT, model TEXT, model_size INTEGER,
+    threads INTEGER, batch INTEGER, ctx INTEGER, n_predict INTEGER,
+    load_ms REAL, prompt_tokens INTEGER, prompt_tps REAL,
+    gen_tokens INTEGER, gen_tps REAL, ttft_ms REAL,
+    peak_rss_mb REAL, wall_s REAL, ok INTEGER, error TEXT
+);
+CREATE TABLE IF NOT EXISTS baselines (
+    host TEXT, model TEXT, threads INTEGER, batch INTEGER, ctx INTEGER, run_id INTEGER,
+    PRIMARY KEY (host, model, threads, batch, ctx)
+);
+"""
+
+# metric -> True when higher is better
+METRICS = {"prompt_tps": True, "gen_tps": True, "ttft_ms": False, "peak_rss_mb": False}
+
+
+def find_llama_tool(name, explicit=None):
+    """Path of a llama.cpp binary (llama-cli, llama-server, ...) in the usual build locations"""
+    if explicit:
+        return explicit
+    for candidate in LLAMA_CLI_CANDIDATES:
+        candidate = os.path.join(os.path.dirname(candidate), name)
+        for path in (candidate, candidate + ".exe"):
+            if os.path.isfile(path):
+                return path
+    # Unpacked Windows release zip, as used on the laptops
+    found = glob.glob(os.path.join("llama-cpp-windows", "**", name + ".exe"), recursive=True)
+    return found[0] if found else shutil.which(name)
+
+
+def find_llama_cli(explicit=None):
+    return find_llama_tool("llama-cli", explicit)
+
+
+def parse_timings(text):
+    """Timing fields from llama.cpp's perf printout"""
+    result = {}
+    m = _LOAD_RE.search(text)
+    if m:
+        result["load_ms"] = float(m.group(1))
+    m = _PROMPT_RE.search(text)
+    if m:
+        ms, n = float(m.group(1)), int(m.group(2))
+        result["prompt_tokens"] = n
+        result["prompt_tps"] = n / (ms / 1000) if ms > 0 else 0.0
+        result["_prompt_ms"] = ms
+    m = _EVAL_RE.search(text)
+    if m:
+        ms, n = float(m.group(1)), int(m.group(2))
+        result["gen_tokens"] = n
+        result["gen_tps"] = n / (ms / 1000) if ms > 0 else 0.0
+        # First token = whole prompt eval plus one decode step
+        if "_prompt_ms" in result:
+            result["ttft_ms"] = result["_prompt_ms"] + (ms / n if n else 0.0)
+    result.pop("_prompt_ms", None)
+    return result
+
+
+class RSSWatcher(threading.Thread):
+    """Peak RSS of a child: exact from wait4 on POSIX, polled via psutil elsewhere"""
+
+    def __init__(self, pid, interval=0.05):
+        super().__init__(daemon=True)
+        self.pid = pid
+        self.interval = interval
+        self.peak = 0
+        self.stop = threading.Event()
+
+    def run(self):
+        try:
+            import psutil
+            proc = psutil.Process(self.pid)
+        except Exception:
+            return
+        while not self.stop.is_set():
+            try:
+                self.peak = max(self.peak, proc.memory_info().rss)
+            except Exception:
+                return
+            time.sleep(self.interval)
+
+
+def _supports(llama_cli, flag, _cache={}):
+    if (llama_cli, flag) not in _cache:
+        try:
+            out = subprocess.run([llama_cli, "--help"], capture_output=True, text=True, timeout=30)
+            _cache[(llama_cli, flag)] = flag in (out.stdout + out.stderr)
+        except (OSError, subprocess.TimeoutExpired):
+            _cache[(llama_cli, flag)] = False
+    return _cache[(llama_cli, flag)]
+
+
+def run_one(llama_cli, model, threads, batch, ctx, n_predict, prompt, timeout=600):
+    """One llama-cli run; returns a result dict"""
+    cmd = [llama_cli, "-m", model, "-p", prompt, "-n", str(n_predict), "-t", str(threads),
+           "-b", str(batch), "-c", str(ctx), "--temp", "0", "--seed", "42"]
+    if _supports(llama_cli, "-no-cnv"):
+        cmd.append("-no-cnv")
+
+    result = {"model": model, "model_size": os.path.getsize(model), "threads": threads, "batch": batch,
+              "ctx": ctx, "n_predict": n_predict, "ok": 0, "error": None}
+    start = time.time()
+    proc = subprocess.Popen(cmd, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+    watcher = RSSWatcher(proc.pid)
+    watcher.start()
+    timer = threading.Timer(timeout, proc.kill)
+    timer.start()
+    output = proc.stdout.read().decode("utf-8", "replace")
+    peak = 0
+    if hasattr(os, "wait4"):
+        _, status, usage = os.wait4(proc.pid, 0)
+        proc.returncode = os.waitstatus_to_exitcode(status)
+        # ru_maxrss is KB on Linux, bytes on macOS
+        peak = usage.ru_maxrss * (1 if sys.platform == "darwin" else 1024)
+    else:
+        proc.wait()
+    timer.cancel()
+    watcher.stop.set()
+    watcher.join()
+
+    result["wall_s"] = time.time() - start
+    result["peak_rss_mb"] = max(peak, watcher.peak) / (1024**2)
+    result.update(parse_timings(output))
+    if proc.returncode != 0:
+        result["error"] = f"exit code {proc.returncode}: " + " | ".join(output.strip().splitlines()[-3:])
+    elif "gen_tps" not in result:
+        result["error"] = "no timing lines in llama-cli output"
+    else:
+        result["ok"] = 1
+    return result
+
+
+def open_db(path):
+    db = sqlite3.connect(path)
+    db.row_factory = sqlite3.Row
+    db.executescript(SCHEMA)
+    return db
+
+
+def record(db, result, host):
+    cols = ["ts", "host", "model", "model_size", "threads", "batch", "ctx", "n_predict", "load_ms",
+            "prompt_tokens", "prompt_tps", "gen_tokens", "gen_tps", "ttft_ms", "peak_rss_mb", "wall_s", "ok", "error"]
+    row = dict(result, ts=time.time(), host=host, model=os.path.basename(result["model"]))
+    cur = db.execute(f"INSERT INTO runs ({', '.join(cols)}) VALUES ({', '.join('?' * len(cols))})",
+                     [row.get(c) for c in cols])
+    db.commit()
+    return cur.lastrowid
+
+
+def _config(host, result):
+    return (host, os.path.basename(result["model"]), result["threads"], result["batch"], result["ctx"])
+
+
+def set_baseline(db, host, result, run_id):
+    db.execute("INSERT OR REPLACE INTO baselines VALUES (?, ?, ?, ?, ?, ?)", _config(host, result) + (run_id,))
+    db.commit()
+
+
+def compare(db, host, result, tolerance=DEFAULT_TOLERANCE):
+    """Regression messages against the stored baseline for this configuration"""
+    row = db.execute("SELECT r.* FROM baselines b JOIN runs r ON r.id = b.run_id WHERE b.host = ? AND b.model = ? "
+                     "AND b.threads = ? AND b.batch = ? AND b.ctx = ?", _config(host, result)).fetchone()
+    if row is None:
+        return None
+    problems = []
+    for metric, higher_better in METRICS.items():
+        base, now = row[metric], result.get(metric)
+        if not base or now is None:
+            continue
+        change = (now - base) / base
+        if (higher_better and change < -tolerance) or (not higher_better and change > tolerance):
+            problems.append(f"{metric} {base:.1f} -> {now:.1f} ({change:+.0%})")
+    return problems
+
+
+def format_result(r):
+    if not r["ok"]:
+        return f"FAILED: {r['error']}"
+    return (f"load {r.get('load_ms', 0):.0f} ms | prompt {r.get('prompt_tps', 0):.1f} tok/s | "
+            f"gen {r['gen_tps']:.1f} tok/s | ttft {r.get('ttft_ms', 0):.0f} ms | peak RSS {r['peak_rss_mb']:.0f} MB")
+
+
+def expand_models(patterns):
+    models = []
+    for pattern in patterns:
+        models.extend(sorted(glob.glob(pattern)) or ([pattern] if os.path.exists(pattern) else []))
+    return models
+
+
+def run_grid(args):
+    llama_cli = find_llama_cli(args.llama_cli)
+    if not llama_cli:
+        print("ERROR: llama-cli not found (use --llama-cli)")
+        return 1
+    models = expand_models(args.models)
+    if not models:
+        print("ERROR: no models found")
+        return 1
+    prompt = open(args.prompt_file, encoding="utf-8").read() if args.prompt_file else args.prompt
+
+    host = platform.node()
+    db = open_db(args.db)
+    grid = list(itertools.product(models, args.threads, args.batch, args.ctx))
+    print(f"=== MIBERA BENCHMARK: {len(grid)} configurations x {args.repeat} ===")
+
+    regressions = 0
+    for i, (model, threads, batch, ctx) in enumerate(grid, 1):
+        label = f"{os.path.basename(model)} t={threads} b={batch} c={ctx}"
+        runs = [run_one(llama_cli, model, threads, batch, ctx, args.n_predict, prompt, args.timeout)
+                for _ in range(args.repeat)]
+        good = [r for r in runs if r["ok"]]
+        # Keep the best run of the repeats: least disturbed by background noise
+        result = max(good, key=lambda r: r["gen_tps"]) if good else runs[-1]
+        run_id = record(db, result, host)
+        print(f"[{i}/{len(grid)}] {label}: {format_result(result)}")
+        if not result["ok"]:
+            continue
+        if args.set_baseline:
+            set_baseline(db, host, result, run_id)
+            continue
+        problems = compare(db, host, result, args.tolerance)
+        if problems is None:
+            print("  (no baseline - use --set-baseline)")
+        elif problems:
+            regressions += 1
+            for p in problems:
+                print(f"  REGRESSION: {p}")
+    if regressions:
+        print(f"\n{regressions} configuration(s) regressed beyond {args.tolerance:.0%}")
+        return 1
+    return 0
+
+
+def show_history(args):
+    db = open_db(args.db)
+    query = "SELECT * FROM runs"
+    params = []
+    if args.model:
+        query += " WHERE model LIKE ?"
+        params.append(f"%{args.model}%")
+    rows = db.execute(query + " ORDER BY id DESC LIMIT ?", params + [args.limit]).fetchall()
+    print(f"{'id':>4} {'when':<16} {'model':<28} {'t':>2} {'b':>4} {'ctx':>5} "
+          f"{'pp tok/s':>9} {'tg tok/s':>9} {'ttft ms':>8} {'rss MB':>7}")
+    for r in rows:
+        when = time.strftime("%Y-%m-%d %H:%M", time.localtime(r["ts"]))
+        if not r["ok"]:
+            print(f"{r['id']:>4} {when:<16} {r['model'][:28]:<28} FAILED {r['error'] or ''}")
+            continue
+        print(f"{r['id']:>4} {when:<16} {r['model'][:28]:<28} {r['threads']:>2} {r['batch']:>4} {r['ctx']:>5} "
+              f"{r['prompt_tps'] or 0:>9.1f} {r['gen_tps'] or 0:>9.1f} {r['ttft_ms'] or 0:>8.0f} {r['peak_rss_mb'] or 0:>7.0f}")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mibera llama.cpp benchmark grid with regression history")
+    parser.add_argument("--db", default=DEFAULT_DB, help="SQLite history file")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    run = sub.add_parser("run", help="Run the parameter grid")
+    run.add_argument("models", nargs="+", help="GGUF files or globs")
+    run.add_argument("--threads", type=int, nargs="+", default=[4])
+    run.add_argument("--batch", type=int, nargs="+", default=[512])
+    run.add_argument("--ctx", type=int, nargs="+", default=[2048])
+    run.add_argument("--n-predict", type=int, default=128, help="Tokens to generate")
+    run.add_argument("--prompt", default=DEFAULT_PROMPT)
+    run.add_argument("--prompt-file", help="Read the prompt from a file")
+    run.add_argument("--repeat", type=int, default=1, help="Runs per configuration (best is kept)")
+    run.add_argument("--timeout", type=int, default=600, help="Seconds per run")
+    run.add_argument("--llama-cli", help="Path to llama-cli")
+    run.add_argument("--set-baseline", action="store_true", help="Store these results as the baseline")
+    run.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE, help="Allowed relative regression")
+
+    hist = sub.add_parser("history", help="Show recorded runs")
+    hist.add_argument("--model", help="Filter by model name substring")
+    hist.add_argument("--limit", type=int, default=30)
+    args = parser.parse_args()
+
+    if args.command == "run":
+        return run_grid(args)
+    return show_history(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
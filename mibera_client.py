@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Thin client for mibera_server.py: one-shot prompts or an interactive loop,
+printing tokens as they stream in.
+
+  python mibera_client.py "Tell me about the High Council of 101 Bears"
+  python mibera_client.py            # interactive, 'quit' to exit
+"""
+import argparse
+import json
+import sys
+import time
+import urllib.error
+import urllib.request
+
+DEFAULT_URL = "http://127.0.0.1:8765"
+
+
+def server_available(url=DEFAULT_URL, timeout=1.0):
+    """Health info dict when a server is listening at url, else None"""
+    try:
+        with urllib.request.urlopen(url.rstrip("/") + "/health", timeout=timeout) as resp:
+            return json.loads(resp.read())
+    except (urllib.error.URLError, OSError, ValueError):
+        return None
+
+
+def server_stream(url=DEFAULT_URL):
+    """Return stream(prompt, **params) -> iterator of text pieces backed by the server
+
+    The last generation's stats are left on stream.stats.
+    """
+    def stream(prompt, **params):
+        body = json.dumps(dict(params, prompt=prompt)).encode()
+        req = urllib.request.Request(url.rstrip("/") + "/generate", data=body,
+                                     headers={"Content-Type": "application/json"})
+        stream.stats = None
+        with urllib.request.urlopen(req) as resp:
+            for line in resp:
+                msg = json.loads(line)
+                if "token" in msg:
+                    yield msg["token"]
+                elif "error" in msg:
+                    raise RuntimeError(msg["error"])
+                else:
+                    stream.stats = msg["stats"]
+    stream.stats = None
+    return stream
+
+
+def ask(stream, prompt, prefix="Mibera: ", **params):
+    """Print a streamed response; returns the full text"""
+    start = time.time()
+    first = None
+    pieces = []
+    sys.stdout.write(prefix)
+    for text in stream(prompt, **params):
+        if first is None:
+            first = time.time() - start
+        pieces.append(text)
+        sys.stdout.write(text)
+        sys.stdout.flush()
+    sys.stdout.write("\n")
+    stats = getattr(stream, "stats", None)
+    if stats:
+        cached = stats.get("prefix")
+        cached = f", prefix {cached['source']} {cached['seconds']:.2f}s" if cached else ""
+        print(f"[{stats['tokens']} tokens, first token {stats['ttft']:.2f}s, "
+              f"{stats['tokens_per_second']:.1f} tok/s, queued {stats['queue_wait']:.2f}s{cached}]")
+    elif first is not None:
+        print(f"[first token {first:.2f}s, total {time.time() - start:.1f}s]")
+    return "".join(pieces)
+
+
+def chat_prompt(system, user):
+    """(system prefix, prompt) in the System/User/Assistant layout of the eval prompts"""
+    prefix = f"System: {system}\n\n" if system else None
+    return prefix, f"User: {user}\nAssistant:"
+
+
+def interactive(stream, system=None, **params):
+    """Prompt loop shared by the runners (type 'quit' to exit)
+
+    With a system prompt every turn shares the same cached prefix.
+    """
+    print("\nInteractive mode (type 'quit' to exit):")
+    while True:
+        try:
+            user_input = input("\n> ")
+        except (EOFError, KeyboardInterrupt):
+            print()
+            break
+        if user_input.strip().lower() == 'quit':
+            break
+        if not user_input.strip():
+            continue
+        try:
+            if system:
+                prefix, prompt = chat_prompt(system, user_input)
+                ask(stream, prompt, system=prefix, **params)
+            else:
+                ask(stream, user_input, **params)
+        except KeyboardInterrupt:
+            print("\n[interrupted]")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Talk to a running mibera_server.py")
+    parser.add_argument("prompt", nargs="?", help="One-shot prompt (omit for interactive mode)")
+    parser.add_argument("--url", default=DEFAULT_URL, help="Server URL")
+    parser.add_argument("--max-tokens", type=int, default=128)
+    parser.add_argument("--temperature", type=float, default=0.7)
+    parser.add_argument("--top-p", type=float, default=0.9)
+    parser.add_argument("--system", help="System prompt text (its KV state is cached by the server)")
+    parser.add_argument("--system-file", help="Modelfile or text file holding the system prompt")
+    args = parser.parse_args()
+
+    system = args.system
+    if args.system_file:
+        from mibera_kv_cache import load_system_prompt
+        system = load_system_prompt(args.system_file)
+
+    health = server_available(args.url)
+    if health is None:
+        print(f"No server at {args.url}. Start one with:")
+        print("  python mibera_server.py <model.gguf>")
+        return 1
+    print(f"[client] {health['model']} (warm, loaded in {health['load_seconds']:.1f}s)")
+
+    params = {"max_tokens": args.max_tokens, "temperature": args.temperature, "top_p": args.top_p}
+    stream = server_stream(args.url)
+    if args.prompt and system:
+        prefix, prompt = chat_prompt(system, args.prompt)
+        ask(stream, prompt, system=prefix, **params)
+    elif args.prompt:
+        ask(stream, args.prompt, **params)
+    else:
+        interactive(stream, system=system, **params)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
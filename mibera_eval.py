@@ -0,0 +1,268 @@
+#!/usr/bin/env python3
+"""
+Single-load batched evaluation of the Mibera prompt corpus.
+
+Starts llama-server once with N parallel slots and continuous batching, then
+sends every prompt concurrently: llama.cpp decodes the active sequences
+together in one batch instead of reloading the model per prompt. All lore
+prompts share the same system prefix and are sent with cache_prompt, so
+each slot evaluates that prefix once and only the user part afterwards.
+Outputs and per-prompt timings go to JSONL. With a fixed seed (the default)
+results are also kept in the generation cache, keyed with the slot, batch
+and context settings, so re-running an unchanged corpus on an unchanged model
+and server configuration skips the model load entirely.
+
+  python mibera_eval.py output/mibera-Q3_K_M.gguf eval/*_prompt.txt mibera_lore_prompts.txt
+  python mibera_eval.py model.gguf mibera_lore_prompts.txt --parallel 8 --out eval/q3.jsonl
+  python mibera_eval.py --url http://127.0.0.1:8080 mibera_lore_prompts.txt   # already running
+"""
+import argparse
+import itertools
+import json
+import os
+import re
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from mibera_bench import find_llama_tool
+from mibera_client import chat_prompt
+from mibera_gen_cache import GenerationCache, cacheable
+
+DEFAULT_SYSTEM = ("You are Mibera from the High Council of 101 Bears, THJ House of 96. "
+                  "You emerged from the Rave Time Continuum. Henlo anon.")
+DEFAULT_PORT = 8089
+STOPS = ["\nUser:", "</s>", "<|endoftext|>", "<|end|>"]
+
+_LORE_RE = re.compile(r"^\[(.+?)\]\s*\nUser:\s*(.+?)\s*$", re.MULTILINE)
+
+
+def slug(text):
+    return re.sub(r"[^a-z0-9]+", "_", text.lower()).strip("_")
+
+
+def load_prompts(paths, system):
+    """[(id, source, prompt)] from eval/*_prompt.txt files (used verbatim) and lore corpora ([Title] / User: blocks)"""
+    prompts = []
+    for path in paths:
+        with open(path, 'r', encoding='utf-8') as f:
+            text = f.read()
+        blocks = _LORE_RE.findall(text)
+        if blocks:
+            for title, user in blocks:
+                prefix, prompt = chat_prompt(system, user)
+                prompts.append((slug(title), path, (prefix or "") + prompt))
+        else:
+            name = os.path.splitext(os.path.basename(path))[0]
+            prompts.append((name, path, text.rstrip() + ("" if text.rstrip().endswith(":") else "\n")))
+    return prompts
+
+
+def default_system():
+    """SYSTEM prompt of Modelfile-q2k next to this script, else the built-in persona line"""
+    from mibera_kv_cache import load_system_prompt
+    modelfile = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Modelfile-q2k")
+    return load_system_prompt(modelfile) if os.path.exists(modelfile) else DEFAULT_SYSTEM
+
+
+def wait_healthy(url, proc=None, timeout=600):
+    """Block until llama-server reports the model loaded"""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if proc is not None and proc.poll() is not None:
+            raise RuntimeError(f"llama-server exited with code {proc.returncode}")
+        try:
+            with urllib.request.urlopen(url + "/health", timeout=2) as resp:
+                if resp.status == 200:
+                    return
+        except (urllib.error.URLError, OSError):
+            pass
+        time.sleep(0.5)
+    raise RuntimeError(f"llama-server not ready after {timeout}s")
+
+
+def start_server(model, parallel, ctx, threads, batch, port, log_path, binary=None):
+    server = find_llama_tool("llama-server", binary)
+    if not server:
+        raise RuntimeError("llama-server not found (build llama.cpp or pass --llama-server)")
+    # -c is shared by all slots: each sequence gets ctx tokens
+    cmd = [server, "-m", model, "-c", str(ctx * parallel), "--parallel", str(parallel), "-cb",
+           "-b", str(batch), "--host", "127.0.0.1", "--port", str(port)]
+    if threads:
+        cmd += ["-t", str(threads)]
+    log = open(log_path, 'w')
+    print(f"[eval] {' '.join(cmd)}")
+    return subprocess.Popen(cmd, stdout=log, stderr=subprocess.STDOUT), log
+
+
+def complete(url, prompt, params):
+    body = json.dumps(dict(params, prompt=prompt, cache_prompt=True)).encode()
+    req = urllib.request.Request(url + "/completion", data=body, headers={"Content-Type": "application/json"})
+    with urllib.request.urlopen(req, timeout=params.get("timeout", 600)) as resp:
+        return json.loads(resp.read())
+
+
+def run_prompt(url, item, params):
+    pid, source, prompt = item
+    start = time.time()
+    try:
+        result = complete(url, prompt, params)
+    except (urllib.error.URLError, OSError, ValueError) as e:
+        return {"id": pid, "source": source, "error": str(e), "seconds": time.time() - start}
+    t = result.get("timings", {})
+    return {
+        "id": pid,
+        "source": source,
+        "prompt": prompt,
+        "output": result.get("content", ""),
+        "seconds": time.time() - start,
+        "prompt_tokens": t.get("prompt_n"),
+        "cached_tokens": result.get("tokens_cached"),
+        "prompt_ms": t.get("prompt_ms"),
+        "generated_tokens": t.get("predicted_n"),
+        "generation_tps": t.get("predicted_per_second"),
+        "stopped": result.get("stop_type") or ("eos" if result.get("stopped_eos") else None),
+    }
+
+
+def prompt_key(cache, params, prompt):
+    # Tokenization is a pure function of the text for a given model file (which is in the key),
+    # so the UTF-8 bytes stand in for the tokens without a tokenizer round trip. params also
+    # carries the server settings (slots, batch, context): they change llama-server's batching
+    # and so its floating-point results even with a fixed seed
+    return cache.key(params, prompt.encode("utf-8"))
+
+
+def split_cached(prompts, params, cache):
+    """(records answered by the generation cache, prompts that still need the model)"""
+    if cache is None or not cacheable(params):
+        return [], list(prompts)
+    hits, misses = [], []
+    for pid, source, prompt in prompts:
+        record = cache.get(prompt_key(cache, params, prompt))
+        if record is None:
+            misses.append((pid, source, prompt))
+        else:
+            hits.append(dict(record, id=pid, source=source, seconds=0.0, cached=True))
+    return hits, misses
+
+
+def evaluate(url, prompts, params, out_path, parallel, outputs_dir=None, model=None, cache=None, cached=(),
+             key_params=None):
+    """Send all prompts concurrently; returns the records (cached ones first) in completion order
+
+    Results are cached under key_params (params plus server settings; default params).
+    """
+    key_params = key_params or params
+    records = []
+    lock = threading.Lock()
+    start = time.time()
+    total = len(prompts) + len(cached)
+    with open(out_path, 'w', encoding='utf-8') as out, ThreadPoolExecutor(max_workers=parallel) as pool:
+        futures = [pool.submit(run_prompt, url, item, params) for item in prompts]
+        for fut in itertools.chain(cached, as_completed(futures)):
+            rec = fut if isinstance(fut, dict) else fut.result()
+            rec["model"] = model
+            if cache is not None and "error" not in rec and not rec.get("cached") and cacheable(params):
+                cache.put(prompt_key(cache, key_params, rec["prompt"]), rec)
+            with lock:
+                out.write(json.dumps(rec, ensure_ascii=False) + "\n")
+                out.flush()
+                records.append(rec)
+            if outputs_dir and "output" in rec and rec["source"].endswith("_prompt.txt"):
+                # Keep the eval/<name>_output.txt files the build report counts
+                with open(os.path.join(outputs_dir, rec["id"] + "_output.txt"), 'w', encoding='utf-8') as f:
+                    f.write(rec["prompt"] + rec["output"] + "\n")
+            status = rec.get("error") or f"{rec['generated_tokens']} tokens, {rec['seconds']:.1f}s"
+            status += " (cached)" if rec.get("cached") else ""
+            print(f"[eval] {len(records)}/{total} {rec['id']}: {status}")
+    elapsed = time.time() - start
+    generated = sum(r.get("generated_tokens") or 0 for r in records if not r.get("cached"))
+    failed = sum(1 for r in records if "error" in r)
+    print(f"[eval] {len(records)} prompts in {elapsed:.1f}s ({generated / elapsed if elapsed else 0:.1f} tok/s "
+          f"aggregate, {len(cached)} cached, {failed} failed) -> {out_path}")
+    return records
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Evaluate a prompt corpus with one model load and parallel sequences")
+    parser.add_argument("model", nargs="?", help="GGUF model (omit with --url)")
+    parser.add_argument("prompts", nargs="+", help="eval/*_prompt.txt files and/or lore corpora")
+    parser.add_argument("--url", help="Use an already running llama-server instead of starting one")
+    parser.add_argument("--parallel", type=int, default=4, help="Concurrent sequences (server slots)")
+    parser.add_argument("--ctx", type=int, default=1024, help="Context per sequence")
+    parser.add_argument("--batch", type=int, default=512, help="Batch size shared by all sequences")
+    parser.add_argument("--threads", type=int, help="CPU threads for llama-server")
+    parser.add_argument("-n", "--max-tokens", type=int, default=150)
+    parser.add_argument("--temperature", type=float, default=0.7)
+    parser.add_argument("--top-p", type=float, default=0.9)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--system", help="System prompt for lore prompts (default: Modelfile-q2k SYSTEM)")
+    parser.add_argument("--out", help="JSONL output (default: eval/<model>-eval.jsonl)")
+    parser.add_argument("--outputs-dir", default="eval", help="Also write <name>_output.txt here for *_prompt.txt")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--llama-server", help="Path to llama-server")
+    parser.add_argument("--no-cache", action="store_true", help="Don't read or write the generation cache")
+    args = parser.parse_args()
+
+    if args.url is None and (args.model is None or not args.model.endswith(".gguf")):
+        parser.error("pass a GGUF model or --url")
+    if args.url and args.model and not args.model.endswith(".gguf"):
+        args.prompts.insert(0, args.model)
+        args.model = None
+
+    system = args.system if args.system is not None else default_system()
+    prompts = load_prompts(args.prompts, system)
+    if not prompts:
+        print("No prompts found")
+        return 1
+    name = os.path.splitext(os.path.basename(args.model))[0] if args.model else "server"
+    os.makedirs(args.outputs_dir, exist_ok=True)
+    out_path = args.out or os.path.join(args.outputs_dir, f"{name}-eval.jsonl")
+    params = {"n_predict": args.max_tokens, "temperature": args.temperature, "top_p": args.top_p,
+              "seed": args.seed, "stop": STOPS}
+
+    # The cache is keyed by the model file, so it needs the GGUF path (also with --url)
+    cache = GenerationCache(args.model) if args.model and not args.no_cache else None
+    # An external server's settings aren't known here, so its URL stands in for them
+    server = {"url": args.url} if args.url else {"parallel": args.parallel, "batch": args.batch, "ctx": args.ctx}
+    key_params = dict(params, server=server)
+    cached, todo = split_cached(prompts, key_params, cache)
+    if cached:
+        print(f"[eval] {len(cached)}/{len(prompts)} prompts answered from the generation cache")
+
+    proc = log = None
+    url = args.url.rstrip("/") if args.url else f"http://127.0.0.1:{args.port}"
+    try:
+        if todo and not args.url:
+            from gguf_validate import preflight
+            if not preflight(args.model):
+                return 1
+            load_start = time.time()
+            proc, log = start_server(args.model, args.parallel, args.ctx, args.threads, args.batch, args.port,
+                                     os.path.join(args.outputs_dir, f"{name}-server.log"), args.llama_server)
+            wait_healthy(url, proc)
+            print(f"[eval] Model loaded once in {time.time() - load_start:.1f}s; "
+                  f"{len(todo)} prompts over {args.parallel} parallel sequences")
+        records = evaluate(url, todo, params, out_path, args.parallel, args.outputs_dir, args.model, cache, cached,
+                           key_params)
+    except RuntimeError as e:
+        print(f"[eval] {e}")
+        return 1
+    finally:
+        if proc is not None:
+            proc.terminate()
+            try:
+                proc.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+            log.close()
+    return 1 if any("error" in r for r in records) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,494 @@
+#!/usr/bin/env python3
+"""
+Resumable, parallel-range artifact downloader for the cloud conversion box.
+
+Large files are fetched as fixed-size byte ranges over several connections
+into a preallocated <file>.part, with a <file>.part.json journal of finished
+ranges so an interrupted download resumes where it stopped. A hasher follows
+the contiguous finished prefix, so the SHA-256 from mibera-checksums.txt is
+checked as the file is written, not in a second pass afterwards. eval/ is
+synced incrementally (only new or changed files).
+
+Sources:
+  http://host:port/          a `mibera_fetch.py serve /workspace/mibera` instance
+                             (or any server that honours Range requests)
+  ssh://user@host:port/path  plain ssh + dd on the remote side (key: -i, default
+                             ~/.ssh/vastai_ed25519 when present)
+
+serve has no authentication, so it listens on 127.0.0.1 unless --host says
+otherwise; reach it through an ssh tunnel:
+
+  python mibera_fetch.py serve /workspace/mibera --port 8000
+  ssh -i ~/.ssh/vastai_ed25519 -p 34574 -N -L 8000:127.0.0.1:8000 root@1.2.3.4
+  python mibera_fetch.py get http://127.0.0.1:8000/ output/mibera-Q3_K_M.gguf --dest C:/mibera/models
+"""
+import argparse
+import hashlib
+import json
+import os
+import shlex
+import subprocess
+import sys
+import threading
+import time
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_CONNECTIONS = 4
+DEFAULT_CHUNK_MB = 32
+DEFAULT_IDENTITY = os.path.join(os.path.expanduser("~"), ".ssh", "vastai_ed25519")
+BLOCK = 1024 * 1024
+CHECKSUM_FILE = "output/mibera-checksums.txt"
+
+
+# ---------------------------------------------------------------- sources
+
+class HTTPSource:
+    """Ranged GETs against an HTTP server"""
+
+    def __init__(self, url, timeout=60):
+        self.base = url if url.endswith("/") else url + "/"
+        self.timeout = timeout
+
+    def _url(self, rel):
+        return self.base + urllib.parse.quote(rel.lstrip("/"))
+
+    def size(self, rel):
+        req = urllib.request.Request(self._url(rel), method="HEAD")
+        with urllib.request.urlopen(req, timeout=self.timeout) as resp:
+            return int(resp.headers["Content-Length"])
+
+    def read_range(self, rel, start, length):
+        """Yield the bytes [start, start+length) in blocks"""
+        req = urllib.request.Request(self._url(rel), headers={"Range": f"bytes={start}-{start + length - 1}"})
+        with urllib.request.urlopen(req, timeout=self.timeout) as resp:
+            if resp.status != 206 and not (start == 0 and resp.status == 200):
+                raise IOError(f"{rel}: server ignored the Range request (HTTP {resp.status})")
+            remaining = length
+            while remaining > 0:
+                data = resp.read(min(BLOCK, remaining))
+                if not data:
+                    raise IOError(f"{rel}: connection closed {remaining} bytes early")
+                remaining -= len(data)
+                yield data
+
+    def read_all(self, rel):
+        with urllib.request.urlopen(self._url(rel), timeout=self.timeout) as resp:
+            return resp.read()
+
+    def list(self, rel_dir):
+        """[(relative path, size, mtime)] of every file under rel_dir"""
+        with urllib.request.urlopen(self._url(rel_dir.rstrip("/") + "/") + "?list", timeout=self.timeout) as resp:
+            return [tuple(e) for e in json.loads(resp.read())]
+
+
+class SSHSource:
+    """ssh + dd on the remote host (GNU dd for skip_bytes/count_bytes)"""
+
+    def __init__(self, url, identity=None, accept_new_host_key=False):
+        parsed = urllib.parse.urlparse(url)
+        self.host = f"{parsed.username}@{parsed.hostname}" if parsed.username else parsed.hostname
+        self.port = str(parsed.port or 22)
+        self.root = parsed.path or "/"
+        if identity is None and os.path.exists(DEFAULT_IDENTITY):
+            identity = DEFAULT_IDENTITY
+        self.identity = identity
+        self.accept_new_host_key = accept_new_host_key
+
+    def _path(self, rel):
+        return os.path.join(self.root, rel.lstrip("/")).replace("\\", "/")
+
+    def _ssh(self, command):
+        cmd = ["ssh", "-p", self.port, "-o", "BatchMode=yes"]
+        if self.identity:
+            cmd += ["-i", self.identity]
+        if self.accept_new_host_key:
+            # Trust an unknown host on first contact only; a changed key still fails
+            cmd += ["-o", "StrictHostKeyChecking=accept-new"]
+        return cmd + [self.host, command]
+
+    def size(self, rel):
+        out = subprocess.run(self._ssh(f"stat -c %s {shlex.quote(self._path(rel))}"),
+                             check=True, capture_output=True, text=True).stdout
+        return int(out.strip())
+
+    def read_range(self, rel, start, length):
+        cmd = (f"dd if={shlex.quote(self._path(rel))} bs=4M iflag=skip_bytes,count_bytes "
+               f"skip={start} count={length} status=none")
+        proc = subprocess.Popen(self._ssh(cmd), stdout=subprocess.PIPE)
+        remaining = length
+        try:
+            while remaining > 0:
+                data = proc.stdout.read(min(BLOCK, remaining))
+                if not data:
+                    raise IOError(f"{rel}: ssh stream ended {remaining} bytes early")
+                remaining -= len(data)
+                yield data
+        finally:
+            proc.stdout.close()
+            proc.wait()
+
+    def read_all(self, rel):
+        return subprocess.run(self._ssh(f"cat {shlex.quote(self._path(rel))}"),
+                              check=True, capture_output=True).stdout
+
+    def list(self, rel_dir):
+        cmd = f"cd {shlex.quote(self._path(rel_dir))} && find . -type f -printf '%P\\t%s\\t%T@\\n'"
+        out = subprocess.run(self._ssh(cmd), check=True, capture_output=True, text=True).stdout
+        entries = []
+        for line in out.splitlines():
+            path, size, mtime = line.split("\t")
+            entries.append((path, int(size), float(mtime)))
+        return entries
+
+
+def open_source(url, identity=None, accept_new_host_key=False):
+    if url.startswith(("http://", "https://")):
+        return HTTPSource(url)
+    if url.startswith("ssh://"):
+        return SSHSource(url, identity, accept_new_host_key)
+    raise ValueError(f"Unsupported source {url} (use http://... or ssh://user@host:port/path)")
+
+
+# ---------------------------------------------------------------- checksums
+
+def parse_checksums(text):
+    """sha256sum output -> {basename: hex digest}"""
+    sums = {}
+    for line in text.splitlines():
+        parts = line.strip().split(None, 1)
+        if len(parts) == 2 and len(parts[0]) == 64:
+            sums[os.path.basename(parts[1].lstrip("*"))] = parts[0].lower()
+    return sums
+
+
+def fetch_checksums(source, rel=CHECKSUM_FILE):
+    try:
+        return parse_checksums(source.read_all(rel).decode("utf-8", "replace"))
+    except Exception as e:
+        print(f"[fetch] No checksum manifest ({rel}): {e}")
+        return {}
+
+
+def sha256_file(path):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(16 * BLOCK), b''):
+            h.update(block)
+    return h.hexdigest()
+
+
+# ---------------------------------------------------------------- download
+
+class Journal:
+    """Finished-range bookkeeping for one .part file"""
+
+    def __init__(self, path, size, chunk):
+        self.path = path
+        self.size = size
+        self.chunk = chunk
+        self.done = set()
+        self.lock = threading.Lock()
+        try:
+            with open(path, 'r') as f:
+                data = json.load(f)
+            if data.get("size") == size and data.get("chunk") == chunk:
+                self.done = set(data["done"])
+        except (OSError, ValueError, KeyError):
+            pass
+
+    def mark(self, index):
+        with self.lock:
+            self.done.add(index)
+            tmp = self.path + ".tmp"
+            with open(tmp, 'w') as f:
+                json.dump({"size": self.size, "chunk": self.chunk, "done": sorted(self.done)}, f)
+            os.replace(tmp, self.path)
+
+
+class Stats:
+    def __init__(self):
+        self.bytes = 0
+        self.lock = threading.Lock()
+        self.start = time.time()
+
+    def add(self, n):
+        with self.lock:
+            self.bytes += n
+
+    def rate(self):
+        return self.bytes / (1024**2) / max(time.time() - self.start, 1e-9)
+
+
+def _fetch_range(source, rel, part_path, index, chunk, size, stats, retries=3):
+    start = index * chunk
+    length = min(chunk, size - start)
+    for attempt in range(1, retries + 1):
+        try:
+            with open(part_path, 'r+b') as f:
+                f.seek(start)
+                for data in source.read_range(rel, start, length):
+                    f.write(data)
+                    stats.add(len(data))
+            return index
+        except Exception as e:
+            if attempt == retries:
+                raise
+            print(f"[fetch] {rel} range {index}: {e} - retry {attempt}/{retries - 1}")
+            time.sleep(attempt)
+
+
+def download(source, rel, dest, expected_sha=None, connections=DEFAULT_CONNECTIONS,
+             chunk=DEFAULT_CHUNK_MB * 1024 * 1024, stats=None):
+    """Fetch one file with parallel ranges and resume; returns True when dest is complete and verified"""
+    stats = stats or Stats()
+    size = source.size(rel)
+    name = os.path.basename(rel)
+
+    if os.path.exists(dest) and os.path.getsize(dest) == size:
+        if not expected_sha or sha256_file(dest) == expected_sha:
+            print(f"[fetch] {name}: already complete")
+            return True
+        print(f"[fetch] {name}: checksum mismatch on existing file - downloading again")
+
+    os.makedirs(os.path.dirname(os.path.abspath(dest)), exist_ok=True)
+    part = dest + ".part"
+    journal = Journal(part + ".json", size, chunk)
+    if not os.path.exists(part) or os.path.getsize(part) != size:
+        journal.done.clear()
+        with open(part, 'wb') as f:
+            f.truncate(size)
+
+    n_ranges = max(1, (size + chunk - 1) // chunk)
+    todo = [i for i in range(n_ranges) if i not in journal.done]
+    if journal.done:
+        print(f"[fetch] {name}: resuming, {len(journal.done)}/{n_ranges} ranges already on disk")
+    print(f"[fetch] {name}: {size / (1024**2):.1f} MB in {n_ranges} ranges over {connections} connections")
+
+    # Hash the contiguous finished prefix as ranges land
+    hasher = hashlib.sha256()
+    hashed = 0
+    with open(part, 'rb') as reader:
+        def advance():
+            nonlocal hashed
+            while hashed < n_ranges and hashed in journal.done:
+                reader.seek(hashed * chunk)
+                hasher.update(reader.read(min(chunk, size - hashed * chunk)))
+                hashed += 1
+
+        advance()
+        last_report = time.time()
+        with ThreadPoolExecutor(max_workers=max(1, connections)) as pool:
+            futures = [pool.submit(_fetch_range, source, rel, part, i, chunk, size, stats) for i in todo]
+            for future in as_completed(futures):
+                journal.mark(future.result())
+                advance()
+                if time.time() - last_report >= 2 or len(journal.done) == n_ranges:
+                    pct = 100 * len(journal.done) / n_ranges
+                    print(f"[fetch] {name}: {pct:.0f}% ({stats.rate():.1f} MB/s aggregate)")
+                    last_report = time.time()
+        advance()
+
+    digest = hasher.hexdigest()
+    if expected_sha and digest != expected_sha:
+        os.replace(part, dest + ".bad")
+        os.remove(journal.path)
+        print(f"[fetch] {name}: SHA-256 MISMATCH (got {digest}, expected {expected_sha}) - kept as {dest}.bad")
+        return False
+
+    os.replace(part, dest)
+    os.remove(journal.path)
+    print(f"[fetch] {name}: done, sha256 {digest}" + (" (verified)" if expected_sha else " (no manifest entry)"))
+    return True
+
+
+def sync_dir(source, rel_dir, local_dir, stats=None, connections=DEFAULT_CONNECTIONS):
+    """Copy new or changed files of a remote directory; returns (copied, unchanged)"""
+    stats = stats or Stats()
+    copied = unchanged = 0
+    todo = []
+    for path, size, mtime in source.list(rel_dir):
+        local = os.path.join(local_dir, path)
+        if os.path.exists(local) and os.path.getsize(local) == size and os.path.getmtime(local) >= mtime:
+            unchanged += 1
+        else:
+            todo.append((path, local, mtime))
+
+    def fetch(item):
+        path, local, mtime = item
+        data = source.read_all(f"{rel_dir.rstrip('/')}/{path}")
+        os.makedirs(os.path.dirname(os.path.abspath(local)), exist_ok=True)
+        with open(local, 'wb') as f:
+            f.write(data)
+        os.utime(local, (mtime, mtime))
+        stats.add(len(data))
+        return path
+
+    with ThreadPoolExecutor(max_workers=max(1, connections)) as pool:
+        for path in pool.map(fetch, todo):
+            copied += 1
+    print(f"[sync] {rel_dir}: {copied} new/changed, {unchanged} unchanged")
+    return copied, unchanged
+
+
+def fetch_all(url, files, dest, eval_dir=None, eval_dest=None, connections=DEFAULT_CONNECTIONS,
+              chunk_mb=DEFAULT_CHUNK_MB, identity=None, accept_new_host_key=False):
+    """Download files (relative to the source root) into dest and sync eval_dir; returns True on success"""
+    source = open_source(url, identity, accept_new_host_key)
+    stats = Stats()
+    sums = fetch_checksums(source)
+    ok = True
+    for rel in files:
+        target = os.path.join(dest, os.path.basename(rel))
+        try:
+            ok &= download(source, rel, target, sums.get(os.path.basename(rel)), connections,
+                           chunk_mb * 1024 * 1024, stats)
+        except Exception as e:
+            print(f"[fetch] {rel}: FAILED - {e} (rerun to resume)")
+            ok = False
+    if eval_dir and eval_dest:
+        try:
+            sync_dir(source, eval_dir, eval_dest, stats, connections)
+        except Exception as e:
+            print(f"[sync] {eval_dir}: FAILED - {e}")
+            ok = False
+    elapsed = time.time() - stats.start
+    print(f"\n[fetch] {stats.bytes / (1024**2):.1f} MB transferred in {elapsed:.1f}s "
+          f"({stats.rate():.1f} MB/s aggregate)")
+    return ok
+
+
+# ---------------------------------------------------------------- server
+
+class RangeHandler(SimpleHTTPRequestHandler):
+    """Static files with Range support and a ?list JSON endpoint for directories"""
+
+    throttle = 0  # bytes/s per connection, 0 = unlimited
+
+    def log_message(self, fmt, *args):
+        pass
+
+    def send_head(self):
+        parsed = urllib.parse.urlparse(self.path)
+        path = self.translate_path(parsed.path)
+        if parsed.query == "list" and os.path.isdir(path):
+            entries = []
+            for root, _, names in os.walk(path):
+                for n in names:
+                    full = os.path.join(root, n)
+                    st = os.stat(full)
+                    entries.append([os.path.relpath(full, path).replace(os.sep, "/"), st.st_size, st.st_mtime])
+            body = json.dumps(entries).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self._body = body
+            return None
+        if not os.path.isfile(path):
+            self._remaining = None
+            return super().send_head()
+
+        size = os.path.getsize(path)
+        start, end = 0, size - 1
+        rng = self.headers.get("Range")
+        if rng and rng.startswith("bytes="):
+            first, _, last = rng[6:].partition("-")
+            start = int(first) if first else max(0, size - int(last))
+            end = min(int(last), size - 1) if first and last else end
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+        else:
+            self.send_response(200)
+        self.send_header("Accept-Ranges", "bytes")
+        self.send_header("Content-Length", str(end - start + 1))
+        self.end_headers()
+        f = open(path, 'rb')
+        f.seek(start)
+        self._remaining = end - start + 1
+        return f
+
+    def do_GET(self):
+        self._body = None
+        f = self.send_head()
+        if self._body is not None:
+            self.wfile.write(self._body)
+        if f is None:
+            return
+        if self._remaining is None:
+            try:
+                self.copyfile(f, self.wfile)
+            finally:
+                f.close()
+            return
+        try:
+            while self._remaining > 0:
+                data = f.read(min(BLOCK if not self.throttle else max(1, self.throttle // 10), self._remaining))
+                if not data:
+                    break
+                self.wfile.write(data)
+                self._remaining -= len(data)
+                if self.throttle:
+                    time.sleep(len(data) / self.throttle)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        finally:
+            f.close()
+
+    def do_HEAD(self):
+        self._body = None
+        f = self.send_head()
+        if f:
+            f.close()
+
+
+def serve(root, port=8000, throttle_mb=0.0, host="127.0.0.1"):
+    RangeHandler.throttle = int(throttle_mb * 1024 * 1024)
+    handler = lambda *a, **kw: RangeHandler(*a, directory=root, **kw)
+    server = ThreadingHTTPServer((host, port), handler)
+    print(f"[serve] {os.path.abspath(root)} on {host}:{port}" + (f", {throttle_mb} MB/s per connection" if throttle_mb else ""))
+    if host not in ("127.0.0.1", "localhost", "::1"):
+        print("[serve] WARNING: no authentication; anyone who can reach this address can list and download files")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Resumable parallel-range downloader for Mibera artifacts")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    get = sub.add_parser("get", help="Download files and sync eval/")
+    get.add_argument("source", help="http://host:port/ or ssh://user@host:port/workspace/mibera")
+    get.add_argument("files", nargs="*", default=["output/mibera-Q3_K_M.gguf", CHECKSUM_FILE],
+                     help="Paths relative to the source root")
+    get.add_argument("--dest", default=".", help="Local directory for files")
+    get.add_argument("--eval-dir", default="eval", help="Remote directory to sync ('' to skip)")
+    get.add_argument("--eval-dest", default="evaluation/samples", help="Local directory for eval/")
+    get.add_argument("--connections", type=int, default=DEFAULT_CONNECTIONS, help="Parallel ranges per file")
+    get.add_argument("--chunk-mb", type=int, default=DEFAULT_CHUNK_MB, help="Range size in MB")
+    get.add_argument("-i", "--identity", help=f"ssh private key (default: {DEFAULT_IDENTITY} if present)")
+    get.add_argument("--accept-new-host-key", action="store_true",
+                     help="Trust an unknown ssh host key on first contact (fresh instances)")
+
+    srv = sub.add_parser("serve", help="Serve a directory with Range support (remote side / test stand-in)")
+    srv.add_argument("root", nargs="?", default=".", help="Directory to serve")
+    srv.add_argument("--host", default="127.0.0.1",
+                     help="Address to bind (default loopback; 0.0.0.0 exposes the tree without authentication)")
+    srv.add_argument("--port", type=int, default=8000)
+    srv.add_argument("--throttle", type=float, default=0.0, help="MB/s per connection (testing)")
+    args = parser.parse_args()
+
+    if args.command == "serve":
+        return serve(args.root, args.port, args.throttle, args.host)
+    ok = fetch_all(args.source, args.files, args.dest, args.eval_dir or None, args.eval_dest,
+                   args.connections, args.chunk_mb, args.identity, args.accept_new_host_key)
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
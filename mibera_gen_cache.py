@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Content-addressed cache of deterministic generations.
+
+With temperature 0 or a fixed seed a generation is a pure function of the
+model file, the sampling parameters and the prompt tokens, so regression and
+eval re-runs on an unchanged model recompute identical text. GenerationCache
+stores each result under ~/.cache/mibera-gen keyed by a SHA-256 of
+(model fingerprint, sampling params, seed, prompt tokens) and evicts
+least-recently-used entries beyond its size budget. Random-seed sampling is
+never cached.
+
+  python mibera_gen_cache.py --list
+  python mibera_gen_cache.py --clear
+"""
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+
+from mibera_kv_cache import evict, model_fingerprint
+
+CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "mibera-gen")
+DEFAULT_MAX_BYTES = 256 * 1024**2
+ENTRY_SUFFIX = ".json"
+
+
+def cacheable(params):
+    """True when the sampling settings make the output deterministic"""
+    seed = params.get("seed")
+    return params.get("temperature", 1.0) == 0 or (seed is not None and seed >= 0 and seed != 0xFFFFFFFF)
+
+
+def generation_key(fingerprint, params, tokens):
+    """Hex digest over the model identity, sampling params (incl. seed, stops, max tokens) and prompt tokens"""
+    blob = json.dumps({"model": fingerprint, "params": params, "tokens": list(tokens)},
+                      sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(blob.encode()).hexdigest()
+
+
+class GenerationCache:
+    """On-disk {key: generation record} for one model file"""
+
+    def __init__(self, model_path, cache_dir=CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.fingerprint = model_fingerprint(model_path)
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, params, tokens):
+        return generation_key(self.fingerprint, params, tokens)
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key + ENTRY_SUFFIX)
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                record = json.load(f)
+        except (OSError, ValueError):
+            self.misses += 1
+            return None
+        os.utime(path)  # LRU: a hit makes it recent
+        self.hits += 1
+        return record
+
+    def put(self, key, record):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = self._path(key)
+        tmp = path + ".tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(record, f, ensure_ascii=False)
+        os.replace(tmp, path)
+        evict(self.cache_dir, self.max_bytes, keep=path, suffix=ENTRY_SUFFIX)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage the deterministic generation cache")
+    parser.add_argument("--list", action="store_true", help="List entries (most recent first)")
+    parser.add_argument("--clear", action="store_true", help="Delete every entry")
+    parser.add_argument("--max-mb", type=float, help="Evict down to this size")
+    parser.add_argument("--dir", default=CACHE_DIR, help="Cache directory")
+    args = parser.parse_args()
+
+    if args.clear:
+        removed = evict(args.dir, 0, suffix=ENTRY_SUFFIX)
+        print(f"[gen-cache] Removed {removed} entries")
+    elif args.max_mb is not None:
+        removed = evict(args.dir, int(args.max_mb * 1024**2), suffix=ENTRY_SUFFIX)
+        print(f"[gen-cache] Evicted {removed} entries")
+
+    if args.list or not (args.clear or args.max_mb is not None):
+        try:
+            names = [n for n in os.listdir(args.dir) if n.endswith(ENTRY_SUFFIX)]
+        except OSError:
+            names = []
+        entries = sorted(((n, os.stat(os.path.join(args.dir, n))) for n in names), key=lambda e: -e[1].st_mtime)
+        total = sum(st.st_size for _, st in entries)
+        if args.list:
+            for n, st in entries:
+                when = time.strftime('%Y-%m-%d %H:%M', time.localtime(st.st_mtime))
+                print(f"  {n[:16]}  {st.st_size / 1024:8.1f} KB  {when}")
+        print(f"[gen-cache] {len(entries)} entries, {total / (1024**2):.1f} MB in {args.dir}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
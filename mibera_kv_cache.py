@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+On-disk KV-state cache for the shared Mibera system-prompt prefix.
+
+Every Mibera prompt starts with the same persona preamble. PrefixCache
+evaluates that prefix once, snapshots the llama.cpp state and stores it under
+~/.cache/mibera-kv, keyed by the model file fingerprint, the context size and
+the exact prefix tokens. Later runs restore the snapshot and llama-cpp-python's
+prefix matching then evaluates only the user suffix. Old snapshots are evicted
+least-recently-used once the cache exceeds its size budget.
+
+  python mibera_kv_cache.py --list
+  python mibera_kv_cache.py --clear
+"""
+import argparse
+import hashlib
+import os
+import pickle
+import sys
+import time
+
+CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "mibera-kv")
+DEFAULT_MAX_BYTES = 2 * 1024**3
+STATE_SUFFIX = ".state"
+
+
+def model_fingerprint(model_path):
+    """Identity of a GGUF: its checksum sidecar root when valid, else size + mtime + header hash"""
+    from gguf_checksum import load_sidecar
+    from gguf_io import read_header
+
+    st = os.stat(model_path)
+    sums = load_sidecar(model_path)
+    if sums and sums["size"] == st.st_size and sums.get("mtime_ns") == st.st_mtime_ns:
+        return sums["root"]
+    header = read_header(model_path)
+    with open(model_path, 'rb') as f:
+        head = f.read(header.header_size)
+    return hashlib.sha256(head + f"{st.st_size}:{st.st_mtime_ns}".encode()).hexdigest()
+
+
+def load_system_prompt(path):
+    """System text from a Modelfile (SYSTEM \"\"\"...\"\"\") or a plain text file"""
+    with open(path, 'r', encoding='utf-8') as f:
+        text = f.read()
+    marker = 'SYSTEM """'
+    if marker in text:
+        return text.split(marker, 1)[1].split('"""', 1)[0].strip()
+    return text.strip()
+
+
+def evict(cache_dir=CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES, keep=None, suffix=STATE_SUFFIX):
+    """Delete least-recently-used entries (except keep) until the cache fits max_bytes"""
+    try:
+        names = [n for n in os.listdir(cache_dir) if n.endswith(suffix)]
+    except OSError:
+        return 0
+    entries = []
+    for n in names:
+        path = os.path.join(cache_dir, n)
+        st = os.stat(path)
+        entries.append((st.st_mtime, st.st_size, path))
+    entries.sort()
+    total = sum(size for _, size, _ in entries)
+    removed = 0
+    for _, size, path in entries:
+        if total <= max_bytes:
+            break
+        if path == keep:
+            continue
+        os.remove(path)
+        total -= size
+        removed += 1
+    return removed
+
+
+class PrefixCache:
+    """Restores or builds the KV state for a prompt prefix on a llama_cpp.Llama"""
+
+    def __init__(self, llm, model_path, cache_dir=CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        self.llm = llm
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.fingerprint = model_fingerprint(model_path)
+
+    def tokens(self, prefix):
+        # Same tokenization llama-cpp-python applies to a full prompt, so the prefix matches
+        return self.llm.tokenize(prefix.encode("utf-8"), special=True)
+
+    def _path(self, tokens):
+        key = hashlib.sha256(f"{self.fingerprint}:{self.llm.n_ctx()}:{','.join(map(str, tokens))}".encode())
+        return os.path.join(self.cache_dir, key.hexdigest() + STATE_SUFFIX)
+
+    def prime(self, prefix):
+        """Make the context hold exactly-evaluated prefix tokens; returns (source, seconds)
+
+        source is 'memory' (already loaded), 'disk' (snapshot restored) or
+        'eval' (evaluated now and snapshotted).
+        """
+        start = time.time()
+        tokens = self.tokens(prefix)
+        n = len(tokens)
+        if self.llm.n_tokens >= n and list(self.llm.input_ids[:n]) == tokens:
+            return "memory", time.time() - start
+
+        path = self._path(tokens)
+        if os.path.exists(path):
+            try:
+                with open(path, 'rb') as f:
+                    state = pickle.load(f)
+                self.llm.load_state(state)
+                os.utime(path)  # LRU: a hit makes it recent
+                return "disk", time.time() - start
+            except Exception as e:
+                print(f"[kv-cache] Discarding unreadable snapshot {os.path.basename(path)}: {e}")
+                os.remove(path)
+
+        self.llm.reset()
+        self.llm.eval(tokens)
+        state = self.llm.save_state()
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tmp = path + ".tmp"
+        with open(tmp, 'wb') as f:
+            pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
+        evict(self.cache_dir, self.max_bytes, keep=path)
+        return "eval", time.time() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage the Mibera prefix KV-state cache")
+    parser.add_argument("--list", action="store_true", help="List snapshots (most recent first)")
+    parser.add_argument("--clear", action="store_true", help="Delete every snapshot")
+    parser.add_argument("--max-gb", type=float, help="Evict down to this size")
+    parser.add_argument("--dir", default=CACHE_DIR, help="Cache directory")
+    args = parser.parse_args()
+
+    if args.clear:
+        removed = evict(args.dir, 0)
+        print(f"[kv-cache] Removed {removed} snapshots")
+    elif args.max_gb is not None:
+        removed = evict(args.dir, int(args.max_gb * 1024**3))
+        print(f"[kv-cache] Evicted {removed} snapshots")
+
+    if args.list or not (args.clear or args.max_gb is not None):
+        try:
+            names = [n for n in os.listdir(args.dir) if n.endswith(STATE_SUFFIX)]
+        except OSError:
+            names = []
+        entries = sorted(((n, os.stat(os.path.join(args.dir, n))) for n in names), key=lambda e: -e[1].st_mtime)
+        total = sum(st.st_size for _, st in entries)
+        for n, st in entries:
+            when = time.strftime('%Y-%m-%d %H:%M', time.localtime(st.st_mtime))
+            print(f"  {n[:16]}  {st.st_size / (1024**2):8.1f} MB  {when}")
+        print(f"[kv-cache] {len(entries)} snapshots, {total / (1024**2):.1f} MB in {args.dir}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,294 @@
+#!/usr/bin/env python3
+"""
+Quantization quality harness against cached reference logits.
+
+The reference step runs once, on the box that can hold the highest-precision
+model (F16): for every lore prompt it appends a greedy continuation, then
+stores the token ids, the reference NLL of each next token and the
+reference distribution at every position: the top-k log-probs (float16) plus
+their vocab ids, or with --store float16 the full log-prob rows, compressed
+with numpy. Each quant is then scored locally against those files without
+ever loading F16 again:
+
+  KL divergence  KL(reference || quant) per position (top-k form folds the
+                 remaining probability mass into one bucket)
+  top-1          share of positions where both models pick the same token
+  perplexity     of the quant on the reference token stream, next to the
+                 reference's own
+
+The model evaluates one prompt at a time while the scoring (vectorized numpy
+over [positions, vocab]) and reference loading of earlier prompts run on a
+thread pool.
+
+  python mibera_quant_quality.py reference mibera-f16.gguf --out eval/reference
+  python mibera_quant_quality.py score eval/reference output/mibera-Q2_K.gguf output/mibera-Q3_K_M.gguf
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import numpy as np
+
+from mibera_eval import default_system, load_prompts
+from mibera_kv_cache import model_fingerprint
+
+REFERENCE_VERSION = 1
+DEFAULT_CORPUS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "mibera_lore_prompts.txt")
+DEFAULT_TOP_K = 32
+DEFAULT_GEN_TOKENS = 64
+DEFAULT_CTX = 512
+
+
+def log_softmax(logits):
+    """Row-wise log-softmax of a [positions, vocab] float32 matrix"""
+    shifted = logits - logits.max(axis=-1, keepdims=True)
+    return shifted - np.log(np.exp(shifted).sum(axis=-1, keepdims=True))
+
+
+def compress(logp, ids, top_k, store):
+    """Arrays to keep for one prompt from its reference log-probs [n - 1, vocab]"""
+    positions = np.arange(len(ids) - 1)
+    record = {"ids": np.asarray(ids, dtype=np.int32), "ref_nll": -logp[positions, ids[1:]].astype(np.float32)}
+    if store == "float16":
+        record["logp"] = logp.astype(np.float16)
+        return record
+    idx = np.argpartition(-logp, top_k, axis=-1)[:, :top_k]
+    top = np.take_along_axis(logp, idx, axis=-1)
+    order = np.argsort(-top, axis=-1)
+    record["topk_idx"] = np.take_along_axis(idx, order, axis=-1).astype(np.int32)
+    record["topk_logp"] = np.take_along_axis(top, order, axis=-1).astype(np.float16)
+    return record
+
+
+def score(ref, logits):
+    """Per-position KL, quant NLL, reference NLL and top-1 agreement against one reference record"""
+    ids = ref["ids"]
+    lq = log_softmax(logits)
+    positions = np.arange(len(ids) - 1)
+    nll = -lq[positions, ids[1:]]
+    if "logp" in ref:
+        lp = ref["logp"].astype(np.float32)
+        kl = (np.exp(lp) * (lp - lq)).sum(axis=-1)
+        ref_top1 = lp.argmax(axis=-1)
+    else:
+        idx = ref["topk_idx"]
+        lp = ref["topk_logp"].astype(np.float32)
+        lq_k = np.take_along_axis(lq, idx, axis=-1)
+        p = np.exp(lp)
+        # Mass outside the reference top-k is compared as one bucket
+        p_rest = np.clip(1.0 - p.sum(axis=-1), 0.0, 1.0)
+        q_rest = np.clip(1.0 - np.exp(lq_k).sum(axis=-1), 1e-10, 1.0)
+        rest = np.where(p_rest > 0, p_rest * (np.log(np.maximum(p_rest, 1e-10)) - np.log(q_rest)), 0.0)
+        kl = (p * (lp - lq_k)).sum(axis=-1) + rest
+        ref_top1 = idx[:, 0]
+    return {"kl": np.maximum(kl, 0.0), "nll": nll, "ref_nll": ref["ref_nll"],
+            "top1": lq.argmax(axis=-1) == ref_top1}
+
+
+def summarize(parts):
+    kl = np.concatenate([p["kl"] for p in parts])
+    nll = np.concatenate([p["nll"] for p in parts])
+    ref_nll = np.concatenate([p["ref_nll"] for p in parts])
+    top1 = np.concatenate([p["top1"] for p in parts])
+    return {
+        "positions": int(kl.size),
+        "kl_mean": float(kl.mean()),
+        "kl_median": float(np.median(kl)),
+        "kl_p99": float(np.percentile(kl, 99)),
+        "kl_max": float(kl.max()),
+        "top1": float(top1.mean()),
+        "ppl": float(np.exp(nll.mean())),
+        "ref_ppl": float(np.exp(ref_nll.mean())),
+    }
+
+
+def load_model(path, ctx, threads):
+    from llama_cpp import Llama
+    from gguf_validate import preflight
+    if not preflight(path, quiet=True):
+        raise ValueError(f"{path} fails the GGUF contract")
+    start = time.time()
+    llm = Llama(model_path=path, n_ctx=ctx, n_batch=min(ctx, 512), logits_all=True, use_mmap=True,
+                n_threads=threads or max(1, (os.cpu_count() or 2) - 1), n_gpu_layers=0, verbose=False)
+    print(f"[quality] Loaded {os.path.basename(path)} in {time.time() - start:.1f}s")
+    return llm
+
+
+def logits_for(llm, ids):
+    """Copy of the [len(ids) - 1, vocab] logits predicting ids[1:]"""
+    llm.reset()
+    llm.eval(ids)
+    return np.array(llm.scores[:len(ids) - 1], dtype=np.float32)
+
+
+def _save(path, record):
+    np.savez_compressed(path, **record)
+    return os.path.getsize(path)
+
+
+def build_reference(model_path, prompts, out_dir, top_k=DEFAULT_TOP_K, store="topk", gen_tokens=DEFAULT_GEN_TOKENS,
+                    ctx=DEFAULT_CTX, threads=None, workers=None):
+    """Run the reference model once over the corpus and write out_dir/manifest.json + one .npz per prompt"""
+    llm = load_model(model_path, ctx, threads)
+    os.makedirs(out_dir, exist_ok=True)
+    entries, jobs = [], []
+    eos = llm.token_eos()
+    start = time.time()
+    with ThreadPoolExecutor(max_workers=workers or os.cpu_count() or 1) as pool:
+        for i, (pid, source, prompt) in enumerate(prompts, 1):
+            ids = llm.tokenize(prompt.encode("utf-8"), special=True)[:ctx - gen_tokens]
+            for n, token in enumerate(llm.generate(ids, temp=0.0)):
+                if token == eos or n >= gen_tokens:
+                    break
+                ids.append(token)
+            ids = ids[:ctx]
+            logits = logits_for(llm, ids)
+            name = f"{i:03d}_{pid}.npz"
+            entries.append({"id": pid, "source": source, "file": name, "tokens": list(map(int, ids))})
+            # Compression and the write overlap with the next prompt's forward pass
+            jobs.append(pool.submit(lambda l, t, n: _save(os.path.join(out_dir, n),
+                                                          compress(log_softmax(l), t, top_k, store)),
+                                    logits, np.asarray(ids), name))
+            print(f"[quality] {i}/{len(prompts)} {pid}: {len(ids)} tokens")
+        size = sum(j.result() for j in jobs)
+
+    manifest = {
+        "version": REFERENCE_VERSION,
+        "model": os.path.basename(model_path),
+        "fingerprint": model_fingerprint(model_path),
+        "n_vocab": llm.n_vocab(),
+        "store": store,
+        "top_k": top_k if store == "topk" else None,
+        "gen_tokens": gen_tokens,
+        "prompts": entries,
+    }
+    with open(os.path.join(out_dir, "manifest.json"), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False)
+    print(f"[quality] Reference for {len(entries)} prompts in {time.time() - start:.1f}s, "
+          f"{size / (1024**2):.1f} MB in {out_dir}")
+    return manifest
+
+
+def load_reference(ref_dir):
+    with open(os.path.join(ref_dir, "manifest.json"), 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+    if manifest.get("version") != REFERENCE_VERSION:
+        raise ValueError(f"{ref_dir}: unsupported reference version {manifest.get('version')}")
+    return manifest
+
+
+def _score_prompt(ref_dir, entry, logits):
+    with np.load(os.path.join(ref_dir, entry["file"])) as data:
+        ref = {k: data[k] for k in data.files}
+    return score(ref, logits)
+
+
+def score_model(model_path, ref_dir, manifest, ctx=DEFAULT_CTX, threads=None, workers=None):
+    """Aggregate and per-prompt quality of one model against the reference"""
+    llm = load_model(model_path, ctx, threads)
+    if llm.n_vocab() != manifest["n_vocab"]:
+        raise ValueError(f"vocab {llm.n_vocab()} != reference {manifest['n_vocab']}")
+    workers = workers or os.cpu_count() or 1
+    start = time.time()
+    futures, pending = [], set()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for entry in manifest["prompts"]:
+            # Bound the logits copies waiting for a scorer
+            while len(pending) >= workers:
+                _, pending = wait(pending, return_when=FIRST_COMPLETED)
+            fut = pool.submit(_score_prompt, ref_dir, entry, logits_for(llm, entry["tokens"]))
+            futures.append(fut)
+            pending.add(fut)
+        parts = [f.result() for f in futures]
+
+    result = summarize(parts)
+    result.update(model=os.path.basename(model_path), fingerprint=model_fingerprint(model_path),
+                  reference=manifest["fingerprint"], seconds=time.time() - start,
+                  prompts=[dict(summarize([p]), id=e["id"]) for p, e in zip(parts, manifest["prompts"])])
+    return result
+
+
+def cached_score(path, model_path, manifest):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            result = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if result.get("reference") == manifest["fingerprint"] and result.get("fingerprint") == model_fingerprint(model_path):
+        return result
+    return None
+
+
+def print_table(results):
+    print(f"[quality] {'model':<32} {'KL mean':>9} {'KL p99':>9} {'top-1':>7} {'PPL':>8} {'ref PPL':>8}")
+    for r in sorted(results, key=lambda r: r["kl_mean"]):
+        print(f"[quality] {r['model'][:32]:<32} {r['kl_mean']:9.4f} {r['kl_p99']:9.4f} {r['top1']:6.1%} "
+              f"{r['ppl']:8.3f} {r['ref_ppl']:8.3f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Score quants against cached reference logits")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p = sub.add_parser("reference", help="Compute reference logits once with the highest-precision model")
+    p.add_argument("model", help="Reference GGUF (F16)")
+    p.add_argument("--prompts", nargs="+", default=[DEFAULT_CORPUS], help="Lore corpora and/or *_prompt.txt")
+    p.add_argument("--out", default=os.path.join("eval", "reference"), help="Reference directory")
+    p.add_argument("--store", choices=["topk", "float16"], default="topk",
+                   help="Top-k log-probs (small) or full float16 rows (exact KL)")
+    p.add_argument("--top-k", type=int, default=DEFAULT_TOP_K)
+    p.add_argument("--gen-tokens", type=int, default=DEFAULT_GEN_TOKENS, help="Greedy continuation per prompt")
+    p.add_argument("--system", help="System prompt (default: Modelfile-q2k SYSTEM)")
+    p = sub.add_parser("score", help="Score quants against a reference directory")
+    p.add_argument("reference", help="Directory written by 'reference'")
+    p.add_argument("models", nargs="+", help="Quantized GGUFs")
+    p.add_argument("--force", action="store_true", help="Re-score even when a matching result is saved")
+    for p in sub.choices.values():
+        p.add_argument("--ctx", type=int, default=DEFAULT_CTX, help="Max tokens per prompt")
+        p.add_argument("--threads", type=int, help="llama.cpp threads")
+        p.add_argument("--workers", type=int, help="Scoring / compression threads")
+    args = parser.parse_args()
+
+    try:
+        if args.command == "reference":
+            system = args.system if args.system is not None else default_system()
+            prompts = load_prompts(args.prompts, system)
+            if not prompts:
+                print("[quality] No prompts found")
+                return 1
+            build_reference(args.model, prompts, args.out, args.top_k, args.store, args.gen_tokens,
+                            args.ctx, args.threads, args.workers)
+            return 0
+
+        manifest = load_reference(args.reference)
+        scores_dir = os.path.join(args.reference, "scores")
+        os.makedirs(scores_dir, exist_ok=True)
+        results = []
+        for model in args.models:
+            out = os.path.join(scores_dir, os.path.splitext(os.path.basename(model))[0] + ".json")
+            result = None if args.force else cached_score(out, model, manifest)
+            if result is None:
+                result = score_model(model, args.reference, manifest, args.ctx, args.threads, args.workers)
+                with open(out, 'w', encoding='utf-8') as f:
+                    json.dump(result, f, indent=1)
+                print(f"[quality] {result['model']}: scored {result['positions']} positions "
+                      f"in {result['seconds']:.1f}s -> {out}")
+            else:
+                print(f"[quality] {result['model']}: unchanged since last score ({out})")
+            results.append(result)
+        print(f"[quality] Reference: {manifest['model']} ({manifest['store']}"
+              f"{', top-%d' % manifest['top_k'] if manifest['top_k'] else ''})")
+        print_table(results)
+    except ImportError:
+        print("[quality] llama-cpp-python is required (pip install llama-cpp-python)")
+        return 1
+    except (OSError, ValueError) as e:
+        print(f"[quality] {e}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
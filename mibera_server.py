@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+"""
+Long-lived local Mibera inference server.
+
+Loads one GGUF once with llama-cpp-python and keeps it warm. Requests are
+accepted concurrently on localhost HTTP, queued, and served one at a time by
+a single generation thread (a llama.cpp context is not thread-safe); tokens
+are streamed back as newline-delimited JSON while they are generated. A
+request's "system" prefix goes through the KV-state cache (mibera_kv_cache).
+
+  python mibera_server.py C:\\mibera\\models\\mibera-Q3_K_M.gguf --port 8765
+  python mibera_client.py "Henlo anon"
+
+POST /generate  {"system": ..., "prompt": ..., "max_tokens": 128, "temperature": 0.7, "top_p": 0.9, "seed": 42,
+                 "stop": [...]}
+                -> {"token": "..."} lines, then {"done": true, "stats": {...}}
+GET  /health    -> {"model": ..., "model_path": ..., "load_seconds": ..., "queue": n, "served": n}
+"""
+import argparse
+import json
+import os
+import queue
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+DEFAULT_PARAMS = {"max_tokens": 128, "temperature": 0.7, "top_p": 0.9, "top_k": 40,
+                  "repeat_penalty": 1.1, "seed": None, "stop": ["</s>", "<|endoftext|>", "<|end|>"]}
+
+
+class LlamaBackend:
+    """llama-cpp-python model kept in memory for the life of the server"""
+
+    def __init__(self, model_path, n_ctx=2048, n_threads=None, n_batch=256, use_mmap=True, use_mlock=False,
+                 prefix_cache=True, prefault=True):
+        from llama_cpp import Llama
+        from mibera_kv_cache import PrefixCache
+        from mibera_prefault import Prefaulter
+
+        start = time.time()
+        self.model_path = model_path
+        # With mmap, read the file into the page cache in layer order while llama.cpp maps it
+        self.prefault = Prefaulter(model_path).start() if prefault and use_mmap else None
+        self.llm = Llama(model_path=model_path, n_ctx=n_ctx, n_threads=n_threads or max(1, (os.cpu_count() or 2) - 1),
+                         n_batch=n_batch, n_gpu_layers=0, use_mmap=use_mmap, use_mlock=use_mlock, verbose=False)
+        self.load_seconds = time.time() - start
+        if self.prefault:
+            self.prefault.wait()
+        self.prefix_cache = PrefixCache(self.llm, model_path) if prefix_cache else None
+        self.last_prefix = None
+
+    def stream(self, prompt, params, cancel, system=None):
+        """Yield text pieces until done, max_tokens, or cancel is set
+
+        A system prefix is restored from (or saved to) the KV-state cache, so
+        only the prompt after it is evaluated.
+        """
+        self.last_prefix = None
+        if system and self.prefix_cache:
+            source, seconds = self.prefix_cache.prime(system)
+            self.last_prefix = {"source": source, "seconds": seconds}
+        for chunk in self.llm((system or "") + prompt, stream=True, **params):
+            if cancel.is_set():
+                break
+            text = chunk["choices"][0]["text"]
+            if text:
+                yield text
+
+
+class Job:
+    def __init__(self, prompt, params, system=None):
+        self.prompt = prompt
+        self.params = params
+        self.system = system
+        self.out = queue.Queue()
+        self.cancel = threading.Event()
+        self.queued_at = time.time()
+
+
+class Generator(threading.Thread):
+    """Single consumer of the request queue; owns the model"""
+
+    def __init__(self, backend):
+        super().__init__(daemon=True)
+        self.backend = backend
+        self.jobs = queue.Queue()
+        self.served = 0
+
+    def run(self):
+        while True:
+            job = self.jobs.get()
+            if job.cancel.is_set():
+                continue
+            start = time.time()
+            first = None
+            n_tokens = 0
+            try:
+                for text in self.backend.stream(job.prompt, job.params, job.cancel, system=job.system):
+                    if first is None:
+                        first = time.time()
+                    n_tokens += 1
+                    job.out.put(("token", text))
+                end = time.time()
+                gen = end - (first or end)
+                job.out.put(("done", {
+                    "queue_wait": start - job.queued_at,
+                    "ttft": (first or end) - start,
+                    "tokens": n_tokens,
+                    "seconds": end - start,
+                    "tokens_per_second": (n_tokens - 1) / gen if n_tokens > 1 and gen > 0 else 0.0,
+                    "cancelled": job.cancel.is_set(),
+                    "prefix": getattr(self.backend, "last_prefix", None),
+                }))
+            except Exception as e:
+                job.out.put(("error", str(e)))
+            self.served += 1
+
+
+def make_handler(generator):
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, fmt, *args):
+            pass
+
+        def _json(self, code, obj):
+            body = json.dumps(obj).encode()
+            self.send_response(code)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path != "/health":
+                return self._json(404, {"error": "not found"})
+            backend = generator.backend
+            self._json(200, {"model": os.path.basename(backend.model_path),
+                             "model_path": os.path.abspath(backend.model_path), "load_seconds": backend.load_seconds,
+                             "queue": generator.jobs.qsize(), "served": generator.served})
+
+        def do_POST(self):
+            if self.path != "/generate":
+                return self._json(404, {"error": "not found"})
+            try:
+                request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                if not isinstance(request, dict):
+                    raise ValueError("not a JSON object")
+                prompt = request.pop("prompt")
+                system = request.pop("system", None)
+            except (ValueError, KeyError):
+                return self._json(400, {"error": "expected JSON with a 'prompt'"})
+            params = dict(DEFAULT_PARAMS)
+            params.update({k: v for k, v in request.items() if k in DEFAULT_PARAMS})
+
+            job = Job(prompt, params, system)
+            generator.jobs.put(job)
+            self.send_response(200)
+            self.send_header("Content-Type", "application/x-ndjson")
+            self.end_headers()
+            try:
+                while True:
+                    kind, value = job.out.get()
+                    if kind == "token":
+                        line = {"token": value}
+                    elif kind == "done":
+                        line = {"done": True, "stats": value}
+                    else:
+                        line = {"error": value}
+                    self.wfile.write(json.dumps(line).encode() + b"\n")
+                    self.wfile.flush()
+                    if kind != "token":
+                        break
+            except (BrokenPipeError, ConnectionResetError):
+                # Client went away: stop generating for it
+                job.cancel.set()
+
+    return Handler
+
+
+def serve(backend, host=DEFAULT_HOST, port=DEFAULT_PORT):
+    generator = Generator(backend)
+    generator.start()
+    server = ThreadingHTTPServer((host, port), make_handler(generator))
+    print(f"[server] {os.path.basename(backend.model_path)} loaded in {backend.load_seconds:.1f}s")
+    if getattr(backend, "prefault", None):
+        backend.prefault.report()
+    print(f"[server] Listening on http://{host}:{port} (Ctrl+C to stop)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n[server] Stopping")
+    finally:
+        server.server_close()
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Keep a Mibera GGUF loaded and serve streaming generations")
+    parser.add_argument("model", nargs="+", help="GGUF model path (several or a glob with --auto)")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--ctx", type=int, default=2048, help="Context size")
+    parser.add_argument("--threads", type=int, help="CPU threads (default: cores - 1)")
+    parser.add_argument("--batch", type=int, default=256, help="Prompt batch size")
+    parser.add_argument("--no-mmap", action="store_true", help="Read the model into RAM instead of mmap")
+    parser.add_argument("--no-prefault", action="store_true", help="Don't read the model into the page cache up front")
+    parser.add_argument("--no-prefix-cache", action="store_true", help="Don't persist system-prefix KV state")
+    parser.add_argument("--auto", action="store_true",
+                        help="Pick model, context, batch and mlock from free RAM (mibera_autotune)")
+    parser.add_argument("--headroom-gb", type=float, default=1.5, help="RAM to leave free with --auto")
+    args = parser.parse_args()
+
+    if args.auto:
+        from mibera_autotune import expand, report, tune
+        models = expand(args.model)
+        if not models:
+            print(f"No GGUF files match: {' '.join(args.model)}")
+            return 1
+        config = tune(models, headroom=int(args.headroom_gb * 1024**3), threads=args.threads)
+        report(config)
+        model, kwargs = config["model_path"], {k: config[k] for k in ("n_ctx", "n_batch", "n_threads", "use_mlock")}
+        if not config["estimate"]["fits"] and not args.no_prefault:
+            # Read-ahead of weights that don't fit would evict the pages llama.cpp maps
+            print("[prefault] Skipped: the weights don't fit in free RAM")
+            args.no_prefault = True
+    else:
+        model = args.model[0]
+        kwargs = {"n_ctx": args.ctx, "n_batch": args.batch, "n_threads": args.threads}
+        if not os.path.exists(model):
+            print(f"Model not found: {model}")
+            return 1
+    from gguf_validate import preflight
+    if not preflight(model):
+        return 1
+    print(f"[server] Loading {model}...")
+    backend = LlamaBackend(model, use_mmap=not args.no_mmap, prefix_cache=not args.no_prefix_cache,
+                           prefault=not args.no_prefault, **kwargs)
+    return serve(backend, args.host, args.port)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
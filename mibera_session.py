@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+"""
+Asyncio session layer for the interactive runners.
+
+The model runs token by token on a worker thread and hands raw token bytes to
+the event loop. There they are decoded incrementally, so a character split
+across tokens (CJK lore like 蜂蜜时间, emoji) is printed only once complete,
+and checked against stop sequences, which end decoding as soon as they
+appear instead of after max_tokens. Cancelling the turn (Ctrl+C) sets an
+event the worker checks between tokens, so an aborted generation stops using
+CPU right away.
+
+  session = Session(llama_source(llm, cache))
+  run_interactive(session, system=SYSTEM_PROMPT, max_tokens=128)
+
+server_session(health) does the same over a warm mibera_server.py.
+
+With a mibera_gen_cache.GenerationCache, deterministic turns (temperature 0
+or a fixed seed) are answered from disk when the same prompt was seen before.
+"""
+import asyncio
+import codecs
+import os
+import signal
+import threading
+import time
+
+from mibera_client import DEFAULT_URL, chat_prompt, server_stream
+from mibera_gen_cache import GenerationCache, cacheable
+
+DEFAULT_STOPS = ["</s>", "<|endoftext|>", "<|end|>", "\nUser:"]
+
+
+class StopMatcher:
+    """Streams text through, holding back only what could be the start of a stop sequence"""
+
+    def __init__(self, stops):
+        self.stops = [s for s in stops or () if s]
+        self.held = ""
+
+    def feed(self, text):
+        """Return (text safe to emit, stopped)"""
+        buf = self.held + text
+        hits = [i for i in (buf.find(s) for s in self.stops) if i >= 0]
+        if hits:
+            self.held = ""
+            return buf[:min(hits)], True
+        keep = 0
+        for s in self.stops:
+            for n in range(min(len(s) - 1, len(buf)), keep, -1):
+                if buf.endswith(s[:n]):
+                    keep = n
+                    break
+        self.held = buf[len(buf) - keep:] if keep else ""
+        return buf[:len(buf) - keep], False
+
+    def flush(self):
+        out, self.held = self.held, ""
+        return out
+
+
+def llama_source(llm, cache=None):
+    """Token-bytes producer over a llama_cpp.Llama (system prefix restored via PrefixCache)"""
+    def source(prompt, params, cancel, system=None):
+        if system and cache:
+            cache.prime(system)
+        tokens = llm.tokenize(((system or "") + prompt).encode("utf-8"), special=True)
+        eos = llm.token_eos()
+        if params.get("seed") is not None:
+            llm.set_seed(params["seed"])
+        for token in llm.generate(tokens, temp=params.get("temperature", 0.7), top_p=params.get("top_p", 0.9),
+                                  top_k=params.get("top_k", 40), repeat_penalty=params.get("repeat_penalty", 1.1)):
+            if cancel.is_set() or token == eos:
+                break
+            yield llm.detokenize([token])
+    return source
+
+
+def ctransformers_source(model):
+    """Token-bytes producer over a ctransformers model"""
+    def source(prompt, params, cancel, system=None):
+        tokens = model.tokenize((system or "") + prompt)
+        for token in model.generate(tokens, temperature=params.get("temperature", 0.7),
+                                    top_p=params.get("top_p", 0.9), top_k=params.get("top_k", 40),
+                                    repetition_penalty=params.get("repeat_penalty", 1.1),
+                                    seed=params.get("seed", -1)):
+            if cancel.is_set() or model.is_eos_token(token):
+                break
+            yield model.detokenize([token], decode=False)
+    return source
+
+
+def sampling_params(temperature=0.7, seed=None):
+    """Sampling keyword arguments for run_interactive (seed only when fixed)"""
+    return {"temperature": temperature} if seed is None else {"temperature": temperature, "seed": seed}
+
+
+def server_source(stream):
+    """Token-bytes producer over a mibera_client.server_stream(); closing it makes the server stop"""
+    def source(prompt, params, cancel, system=None):
+        for text in stream(prompt, system=system, **params):
+            if cancel.is_set():
+                break
+            yield text.encode("utf-8")
+    return source
+
+
+def server_session(health, url=DEFAULT_URL):
+    """Session over a warm mibera_server.py; replays from the generation cache when its model file is local"""
+    model_path = health.get("model_path")
+    cache = GenerationCache(model_path) if model_path and os.path.exists(model_path) else None
+    return Session(server_source(server_stream(url)), cache=cache)
+
+
+class Session:
+    """Async text streaming over a token-bytes source; one generation at a time"""
+
+    def __init__(self, source, cache=None, tokenize=None):
+        self.source = source
+        self.cache = cache
+        self.tokenize = tokenize
+        self.stats = None
+        self._worker = None
+
+    def _cache_key(self, text, params):
+        tokens = self.tokenize(text) if self.tokenize else list(text.encode("utf-8"))
+        return self.cache.key(params, tokens)
+
+    async def generate(self, prompt, system=None, max_tokens=128, stop=DEFAULT_STOPS, **params):
+        """Async iterator of decoded text; closing or cancelling it stops the model"""
+        if self._worker is not None:
+            await self._worker  # previous (cancelled) turn still finishing its last token
+        key = None
+        if self.cache is not None and cacheable(params):
+            key = self._cache_key((system or "") + prompt, dict(params, max_tokens=max_tokens, stop=list(stop or ())))
+            record = self.cache.get(key)
+            if record is not None:
+                self.stats = dict(record["stats"], cached=True)
+                if record["text"]:
+                    yield record["text"]
+                return
+        loop = asyncio.get_running_loop()
+        pieces = asyncio.Queue()
+        cancel = threading.Event()
+
+        def produce():
+            try:
+                # max_tokens goes along so a remote source can stop generating too
+                for n, data in enumerate(self.source(prompt, dict(params, max_tokens=max_tokens), cancel,
+                                                     system=system)):
+                    loop.call_soon_threadsafe(pieces.put_nowait, ("bytes", data))
+                    if n + 1 >= max_tokens or cancel.is_set():
+                        break
+            except Exception as e:
+                loop.call_soon_threadsafe(pieces.put_nowait, ("error", e))
+            finally:
+                loop.call_soon_threadsafe(pieces.put_nowait, ("end", None))
+
+        start = time.time()
+        first = None
+        n_tokens = 0
+        stopped = False
+        decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        matcher = StopMatcher(stop)
+        emitted = []
+        completed = False
+        self.stats = None
+        self._worker = loop.run_in_executor(None, produce)
+        try:
+            while True:
+                kind, value = await pieces.get()
+                if kind == "end":
+                    tail = decoder.decode(b"", final=True)
+                    text = matcher.feed(tail)[0] + matcher.flush()
+                    completed = True
+                    if text:
+                        emitted.append(text)
+                        yield text
+                    break
+                if kind == "error":
+                    raise value
+                n_tokens += 1
+                text, stopped = matcher.feed(decoder.decode(value))
+                if text:
+                    if first is None:
+                        first = time.time() - start
+                    emitted.append(text)
+                    yield text
+                if stopped:
+                    completed = True
+                    break
+        finally:
+            cancel.set()
+            elapsed = time.time() - start
+            self.stats = {"tokens": n_tokens, "ttft": first, "seconds": elapsed, "stopped": stopped,
+                          "tokens_per_second": n_tokens / elapsed if elapsed > 0 else 0.0}
+            if key is not None and completed:
+                self.cache.put(key, {"text": "".join(emitted), "stats": self.stats})
+
+
+async def _turn(session, prompt, system, label, params):
+    print(label, end="", flush=True)
+    async for text in session.generate(prompt, system=system, **params):
+        print(text, end="", flush=True)
+    print()
+
+
+def run_interactive(session, system=None, label="Mibera: ", **params):
+    """Prompt loop: tokens stream as generated, Ctrl+C cancels the current turn, 'quit' exits"""
+    loop = asyncio.new_event_loop()
+    print("\nInteractive mode (Ctrl+C stops a response, 'quit' to exit):")
+    try:
+        while True:
+            try:
+                user_input = input("\n> ")
+            except (EOFError, KeyboardInterrupt):
+                print()
+                break
+            if user_input.strip().lower() == 'quit':
+                break
+            if not user_input.strip():
+                continue
+            prefix, prompt = chat_prompt(system, user_input) if system else (None, user_input)
+            task = loop.create_task(_turn(session, prompt, prefix, label, params))
+            previous = signal.signal(signal.SIGINT, lambda *_: loop.call_soon_threadsafe(task.cancel))
+            try:
+                loop.run_until_complete(task)
+            except asyncio.CancelledError:
+                print("\n[interrupted]")
+            finally:
+                signal.signal(signal.SIGINT, previous)
+            stats = session.stats
+            if stats and stats["tokens"]:
+                reason = ", stop sequence" if stats["stopped"] else ""
+                reason += ", cached" if stats.get("cached") else ""
+                print(f"[{stats['tokens']} tokens, first token {stats['ttft'] or 0:.2f}s, "
+                      f"{stats['tokens_per_second']:.1f} tok/s{reason}]")
+    finally:
+        loop.run_until_complete(loop.shutdown_default_executor())
+        loop.close()
@@ -2,8 +2,16 @@
 # Final audited bias injection script with all improvements
 
 set -euo pipefail
+SCRIPT_DIR="$(cd "$(dirname "$0")" && pwd)"
 cd /workspace/mibera/output_fused
 
+# Per-stage wall/CPU/I-O/peak-RSS trace of the whole run (gguf_trace.py)
+export MIBERA_TRACE="${MIBERA_TRACE:-$PWD/bias-fix-$(date +%Y%m%d-%H%M%S).trace.json}"
+trace() {
+    local stage="$1"; shift
+    if [ -f "$SCRIPT_DIR/gguf_trace.py" ]; then python3 "$SCRIPT_DIR/gguf_trace.py" run --stage "$stage" -- "$@"; else "$@"; fi
+}
+
 echo "[1] Free space:"
 df -h .
 
@@ -11,7 +19,7 @@ echo "[2] Backup old conversion log if present"
 [ -f convert_bias.log ] && mv convert_bias.log convert_bias.log.$(date +%H%M%S) || true
 
 echo "[3] Run patched conversion to add synthetic bias"
-python3 - <<'PY' 2>&1 | tee convert_bias.log
+trace convert-f16-bias python3 - <<'PY' 2>&1 | tee convert_bias.log
 import numpy as np, sys, os
 import importlib.util, pathlib, time
 
@@ -186,13 +194,13 @@ if [ $? -ne 0 ]; then
 fi
 
 echo "[6] Quantize to Q2_K"
-/workspace/mibera_conversion/llama.cpp/build/bin/llama-quantize \
+trace quantize-Q2_K /workspace/mibera_conversion/llama.cpp/build/bin/llama-quantize \
     mibera-f16-fused-bias.gguf mibera-Q2_K-fused-bias.gguf Q2_K
 
 echo "[7] Quantize to IQ2_XXS (if supported)"
 if /workspace/mibera_conversion/llama.cpp/build/bin/llama-quantize --help 2>&1 | grep -q IQ2_XXS; then
     echo "[info] IQ2_XXS quantization supported - proceeding"
-    /workspace/mibera_conversion/llama.cpp/build/bin/llama-quantize \
+    trace quantize-IQ2_XXS /workspace/mibera_conversion/llama.cpp/build/bin/llama-quantize \
         mibera-f16-fused-bias.gguf mibera-IQ2_XXS-fused-bias.gguf IQ2_XXS
 else
     echo "[warn] IQ2_XXS not supported in this llama.cpp build - skipping ultra-low quantization"
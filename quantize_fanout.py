@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+"""
+Fan-out quantization: build the whole Mibera quant ladder (Q2_K, Q3_K_M,
+Q4_K_M by default) from a single read of the F16 source.
+
+All llama-quantize jobs run concurrently. A feeder thread reads the source
+once, a bounded window ahead of the slowest job, and every job is served
+from the page cache. llama-quantize walks tensors in its own order (by
+layer and name), not file order, so each job's progress is tracked by the
+tensor names on its "[ i/ N] name" lines: a job's frontier is the file
+offset of the first tensor it has not finished, reading stays within the
+window of the lowest frontier, and only regions below every frontier are
+dropped from the cache. A summary reports wall time and output size for
+each target.
+"""
+import argparse
+import os
+import re
+import shutil
+import subprocess
+import sys
+import threading
+import time
+
+from gguf_io import read_header
+from gguf_checksum import build_sidecar
+from gguf_trace import get_tracer, start_trace, wait_child
+
+DEFAULT_TARGETS = ["Q2_K", "Q3_K_M", "Q4_K_M"]
+QUANTIZE_CANDIDATES = [
+    "./llama-quantize",
+    "./quantize",
+    "llama.cpp/build/bin/llama-quantize",
+    "llama.cpp/llama-quantize",
+]
+READ_CHUNK = 16 * 1024 * 1024
+PROGRESS_RE = re.compile(r"^\[\s*(\d+)/\s*(\d+)\]\s+(\S+)")
+
+
+def find_quantize(explicit=None):
+    if explicit:
+        return explicit
+    for candidate in QUANTIZE_CANDIDATES:
+        if os.path.isfile(candidate) and os.access(candidate, os.X_OK):
+            return candidate
+    return shutil.which("llama-quantize") or shutil.which("quantize")
+
+
+def output_path(source, target, out_dir=None):
+    """output/mibera-f16.gguf + Q3_K_M -> output/mibera-Q3_K_M.gguf"""
+    base = os.path.basename(source)
+    name = re.sub(r"(?i)-f16", f"-{target}", base) if re.search(r"(?i)-f16", base) else base.replace(".gguf", f"-{target}.gguf")
+    return os.path.join(out_dir or os.path.dirname(source), name)
+
+
+class Job:
+    """One llama-quantize process and its progress"""
+
+    def __init__(self, target, output):
+        self.target = target
+        self.output = output
+        self.done = 0
+        self.total = 0
+        self.status = "pending"
+        self.seconds = 0.0
+        self.returncode = None
+        self.sha256 = None
+        self.log = []
+        self.finished = set()  # tensor names; a progress line is complete once the tensor is written
+
+
+class Feeder(threading.Thread):
+    """Reads the source once, staying at most `window` bytes ahead of the slowest job
+
+    tensors is [(name, start, end)] in file order.
+    """
+
+    def __init__(self, path, tensors, jobs, window):
+        super().__init__(daemon=True)
+        self.path = path
+        self.tensors = tensors
+        self.jobs = jobs
+        self.window = window
+        self.bytes_read = 0
+        self.stop = threading.Event()
+        self._frontier = {id(job): 0 for job in jobs}
+
+    def _job_frontier(self, job):
+        """File offset of the first tensor (in file order) job has not finished"""
+        i = self._frontier[id(job)]
+        while i < len(self.tensors) and self.tensors[i][0] in job.finished:
+            i += 1
+        self._frontier[id(job)] = i
+        return self.tensors[i][1] if i < len(self.tensors) else self.tensors[-1][2]
+
+    def slowest_offset(self):
+        # Jobs that haven't started yet still need the start of the file
+        active = [j for j in self.jobs if j.status in ("pending", "running")]
+        if not self.tensors:
+            return 0
+        if not active:
+            return self.tensors[-1][2]
+        if any(j.status == "pending" for j in active):
+            return 0
+        return min(self._job_frontier(j) for j in active)
+
+    def run(self):
+        size = os.path.getsize(self.path)
+        dropped = 0
+        fd = os.open(self.path, os.O_RDONLY)
+        try:
+            if hasattr(os, "posix_fadvise"):
+                os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_SEQUENTIAL)
+            pos = 0
+            while pos < size and not self.stop.is_set():
+                slowest = self.slowest_offset()
+                if pos >= slowest + self.window:
+                    time.sleep(0.05)
+                    continue
+                data = os.pread(fd, min(READ_CHUNK, size - pos), pos)
+                if not data:
+                    break
+                pos += len(data)
+                self.bytes_read += len(data)
+                # Everything all jobs have passed can leave the page cache
+                if hasattr(os, "posix_fadvise") and slowest - dropped >= READ_CHUNK:
+                    os.posix_fadvise(fd, dropped, slowest - dropped, os.POSIX_FADV_DONTNEED)
+                    dropped = slowest
+        finally:
+            os.close(fd)
+
+
+def _watch(job, proc, start, progress_step, checksums, lane=0):
+    """Parse llama-quantize output for one job"""
+    next_report = progress_step
+    for line in proc.stdout:
+        line = line.rstrip()
+        job.log.append(line)
+        if len(job.log) > 50:
+            del job.log[0]
+        m = PROGRESS_RE.match(line)
+        if m:
+            job.done, job.total = int(m.group(1)), int(m.group(2))
+            job.finished.add(m.group(3))
+            pct = 100 * job.done / job.total
+            if pct >= next_report or job.done == job.total:
+                print(f"[{job.target}] {job.done}/{job.total} tensors ({pct:.0f}%, {time.time() - start:.0f}s)")
+                while next_report <= pct:
+                    next_report += progress_step
+    usage = wait_child(proc)
+    job.returncode = usage["returncode"]
+    job.seconds = time.time() - start
+    get_tracer().event(f"quantize {job.target}", start, job.seconds, tid=lane, output=job.output, **usage)
+    job.status = "ok" if job.returncode == 0 and os.path.exists(job.output) else "failed"
+    if job.status == "ok" and checksums:
+        # The output is still in the page cache: hash tensors in parallel plus the flat digest
+        try:
+            job.sha256 = build_sidecar(job.output, whole_file=True)["sha256"]
+        except Exception as e:
+            print(f"[{job.target}] WARNING: checksum sidecar failed: {e}")
+
+
+def run_fanout(source, targets=None, quantize=None, jobs=None, threads=None, out_dir=None,
+               window_mb=2048, progress_step=10, checksums=True):
+    """Quantize source to every target concurrently; returns the list of Jobs"""
+    targets = targets or DEFAULT_TARGETS
+    quantize = find_quantize(quantize)
+    if not quantize:
+        raise FileNotFoundError("llama-quantize not found (use --quantize)")
+
+    header = read_header(source)
+    tensors = [(t.name, header.data_offset + t.offset, header.data_offset + t.offset + t.n_bytes)
+               for t in sorted(header.tensors, key=lambda t: t.offset)]
+    jobs = max(1, min(jobs or len(targets), len(targets)))
+    threads = threads or max(1, (os.cpu_count() or 1) // jobs)
+
+    all_jobs = [Job(t, output_path(source, t, out_dir)) for t in targets]
+    print(f"[fanout] {source}: {len(header.tensors)} tensors -> {', '.join(targets)}")
+    print(f"[fanout] {jobs} concurrent jobs x {threads} threads, read-ahead window {window_mb} MB")
+
+    feeder = Feeder(source, tensors, all_jobs, window_mb * 1024 * 1024)
+    start = time.time()
+    feeder.start()
+
+    pending = list(all_jobs)
+    running = []
+    while pending or running:
+        while pending and len(running) < jobs:
+            job = pending.pop(0)
+            cmd = [quantize, source, job.output, job.target, str(threads)]
+            proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                                    text=True, errors="replace")
+            job.status = "running"
+            watcher = threading.Thread(target=_watch, daemon=True,
+                                       args=(job, proc, time.time(), progress_step, checksums,
+                                             all_jobs.index(job) + 1))
+            watcher.start()
+            running.append((job, watcher))
+        time.sleep(0.1)
+        for job, watcher in list(running):
+            if not watcher.is_alive():
+                running.remove((job, watcher))
+
+    feeder.stop.set()
+    feeder.join()
+    elapsed = time.time() - start
+    report(all_jobs, source, feeder.bytes_read, elapsed)
+    return all_jobs
+
+
+def report(jobs, source, bytes_read, elapsed):
+    source_size = os.path.getsize(source)
+    print(f"\n{'target':<10} {'status':<8} {'time':>8} {'size':>10}")
+    for job in jobs:
+        size = os.path.getsize(job.output) / (1024**3) if os.path.exists(job.output) else 0.0
+        print(f"{job.target:<10} {job.status:<8} {job.seconds:>7.1f}s {size:>8.2f} GB")
+        if job.status == "failed":
+            print(f"  exit code {job.returncode}; last output:")
+            for line in job.log[-5:]:
+                print(f"    {line}")
+    print(f"\n[fanout] Total {elapsed:.1f}s; source read {bytes_read / max(source_size, 1):.2f}x "
+          f"({bytes_read / (1024**3):.2f} GB of {source_size / (1024**3):.2f} GB)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Quantize one F16 GGUF to several types from a single read")
+    parser.add_argument("source", nargs="?", default="output/mibera-f16.gguf", help="F16 GGUF")
+    parser.add_argument("targets", nargs="*", default=DEFAULT_TARGETS, help="Quant types (default: Q2_K Q3_K_M Q4_K_M)")
+    parser.add_argument("--quantize", help="Path to llama-quantize")
+    parser.add_argument("--jobs", type=int, help="Concurrent quantize processes (default: one per target)")
+    parser.add_argument("--threads", type=int, help="Threads per process (default: CPUs / jobs)")
+    parser.add_argument("--out-dir", help="Output directory (default: next to the source)")
+    parser.add_argument("--window", type=int, default=2048, help="Read-ahead window in MB")
+    parser.add_argument("--remove-source", action="store_true", help="Delete the source when every target succeeded")
+    parser.add_argument("--no-checksums", action="store_true", help="Skip the per-tensor .sums.json sidecars")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.source):
+        print(f"ERROR: {args.source} not found")
+        return 1
+    start_trace("quantize_fanout")
+
+    jobs = run_fanout(args.source, args.targets, quantize=args.quantize, jobs=args.jobs,
+                      threads=args.threads, out_dir=args.out_dir, window_mb=args.window,
+                      checksums=not args.no_checksums)
+    failed = [j for j in jobs if j.status != "ok"]
+    if args.remove_source and not failed:
+        os.remove(args.source)
+        print(f"[fanout] Removed {args.source}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -3,21 +3,30 @@
 Run Mibera using ctransformers - more forgiving with model formats
 """
 
+import argparse
 import sys
 import os
 
-# Install ctransformers if needed
-try:
-    from ctransformers import AutoModelForCausalLM
-except ImportError:
-    print("Installing ctransformers...")
-    import subprocess
-    subprocess.check_call([sys.executable, "-m", "pip", "install", "ctransformers"])
-    from ctransformers import AutoModelForCausalLM
+from mibera_client import server_available
+from mibera_session import run_interactive, sampling_params, server_session
 
-def run_mibera(model_path, prompt="Hello, I am", max_tokens=50):
+def run_mibera(model_path, prompt="Hello, I am", max_tokens=50, temperature=0.7, seed=None):
     """Run Mibera model using ctransformers"""
     
+    # Install ctransformers if needed
+    try:
+        from ctransformers import AutoModelForCausalLM
+    except ImportError:
+        print("Installing ctransformers...")
+        import subprocess
+        subprocess.check_call([sys.executable, "-m", "pip", "install", "ctransformers"])
+        from ctransformers import AutoModelForCausalLM
+    
+    # Reject files with missing or mis-shaped tensors before a slow load
+    from gguf_validate import preflight
+    if not preflight(model_path):
+        return
+    
     print(f"Loading model: {model_path}")
     print("This may take a moment...")
     
@@ -41,14 +50,12 @@ def run_mibera(model_path, prompt="Hello, I am", max_tokens=50):
         
         print(f"\nResponse: {response}")
         
-        # Interactive mode
-        while True:
-            user_input = input("\nEnter prompt (or 'quit' to exit): ")
-            if user_input.lower() == 'quit':
-                break
-            
-            response = model(user_input, max_new_tokens=max_tokens, temperature=0.7)
-            print(f"Response: {response}")
+        # Interactive mode (tokens stream as they are generated, Ctrl+C stops a response);
+        # deterministic turns (--temperature 0 or --seed) are replayed from the generation cache
+        from mibera_gen_cache import GenerationCache
+        from mibera_session import Session, ctransformers_source
+        session = Session(ctransformers_source(model), cache=GenerationCache(model_path), tokenize=model.tokenize)
+        run_interactive(session, max_tokens=max_tokens, **sampling_params(temperature, seed))
             
     except Exception as e:
         print(f"[ERROR] Error: {e}")
@@ -78,6 +85,11 @@ def run_mibera(model_path, prompt="Hello, I am", max_tokens=50):
             print("3. Use a different inference engine")
 
 def main():
+    parser = argparse.ArgumentParser(description="Run Mibera with ctransformers")
+    parser.add_argument("--temperature", type=float, default=0.7, help="0 makes turns deterministic and cacheable")
+    parser.add_argument("--seed", type=int, help="Fixed sampling seed (turns become cacheable)")
+    args = parser.parse_args()
+
     # Model paths
     models = {
         "Q2_K": r"C:\Users\natha\mibera_llm_final\mibera-Q2_K-final.gguf",
@@ -88,6 +100,13 @@ def main():
     print("Using ctransformers for more flexible model loading")
     print()
     
+    # A running mibera_server.py already has the model loaded
+    health = server_available()
+    if health:
+        print(f"[OK] Using warm server ({health['model']})")
+        run_interactive(server_session(health), max_tokens=50, **sampling_params(args.temperature, args.seed))
+        return
+    
     # Check which models exist
     available = []
     for name, path in models.items():
@@ -107,7 +126,7 @@ def main():
     print(f"\nUsing {model_name} model")
     
     # Run the model
-    run_mibera(model_path)
+    run_mibera(model_path, temperature=args.temperature, seed=args.seed)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
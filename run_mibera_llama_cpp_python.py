@@ -4,95 +4,128 @@ Run Mibera using llama-cpp-python
 This may be more forgiving with missing tensors
 """
 
+import argparse
 import sys
 import os
+import time
 
-print("=== MIBERA LLAMA-CPP-PYTHON RUNNER ===")
+from mibera_client import server_available
+from mibera_kv_cache import PrefixCache, load_system_prompt
+from mibera_autotune import MIN_CTX, expand, llama_kwargs, report, tune
+from mibera_prefault import Prefaulter
+from gguf_validate import preflight
+from mibera_session import Session, llama_source, run_interactive, sampling_params, server_session
+from mibera_gen_cache import GenerationCache
+
+# Persona preamble shared by every turn; its KV state is cached on disk
+MODELFILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Modelfile-q2k")
+SYSTEM_PROMPT = load_system_prompt(MODELFILE) if os.path.exists(MODELFILE) else None
 
-# Install llama-cpp-python if needed
-try:
-    from llama_cpp import Llama
-except ImportError:
-    print("Installing llama-cpp-python...")
-    import subprocess
-    # Install CPU-only version to avoid CUDA issues
-    subprocess.check_call([sys.executable, "-m", "pip", "install", "llama-cpp-python", "--no-cache-dir"])
-    from llama_cpp import Llama
+print("=== MIBERA LLAMA-CPP-PYTHON RUNNER ===")
 
-def run_mibera_minimal():
-    """Try to run Mibera with minimal settings"""
+def run_mibera_minimal(temperature=0.7, seed=None):
+    """Run Mibera with settings sized to the free RAM (mibera_autotune)"""
+    
+    # Install llama-cpp-python if needed
+    try:
+        from llama_cpp import Llama
+    except ImportError:
+        print("Installing llama-cpp-python...")
+        import subprocess
+        # Install CPU-only version to avoid CUDA issues
+        subprocess.check_call([sys.executable, "-m", "pip", "install", "llama-cpp-python", "--no-cache-dir"])
+        from llama_cpp import Llama
     
-    model_path = r"C:\Users\natha\mibera_llm_final\mibera-Q2_K-final.gguf"
+    model_dir = r"C:\Users\natha\mibera_llm_final"
+    models = expand([os.path.join(model_dir, "mibera-*.gguf")])
     
-    if not os.path.exists(model_path):
-        print(f"Model not found: {model_path}")
+    if not models:
+        print(f"No Mibera GGUF files in {model_dir}")
         return
     
+    # Pick the largest quant, context and batch that fit the free RAM
+    config = tune(models)
+    report(config)
+    model_path = config["model_path"]
+    
+    # Reject files with missing or mis-shaped tensors before a slow load
+    if not preflight(model_path):
+        return
     print(f"Loading model: {model_path}")
-    print("Using ultra-conservative settings for 6.5GB RAM...")
     
+    # Pull the file into the page cache in layer order while llama.cpp maps it. When the
+    # weights don't fit, read-ahead would evict the pages llama.cpp is mapping, so it is
+    # skipped unless MIBERA_PREFAULT=1 asks for it anyway
+    load_start = time.time()
+    prefault = None
+    if config["estimate"]["fits"] or os.environ.get("MIBERA_PREFAULT") == "1":
+        prefault = Prefaulter(model_path).start()
+    else:
+        print("[prefault] Skipped: the weights don't fit in free RAM (MIBERA_PREFAULT=1 to force)")
     try:
-        # Try with minimal settings
-        llm = Llama(
-            model_path=model_path,
-            n_ctx=128,          # Ultra small context
-            n_batch=1,          # Minimal batch
-            n_threads=2,        # Limited threads
-            n_gpu_layers=0,     # CPU only
-            use_mmap=False,     # No memory mapping
-            use_mlock=True,     # Lock memory
-            verbose=False       # Less output
-        )
-        
-        print("[OK] Model loaded successfully!")
-        
-        # Test generation
-        prompt = "Hello, I am"
-        print(f"\nPrompt: {prompt}")
-        print("Generating...")
-        
-        output = llm(prompt, max_tokens=20, temperature=0.7, top_p=0.9)
-        print(f"Response: {output['choices'][0]['text']}")
-        
-        # Interactive mode
-        print("\nInteractive mode (type 'quit' to exit):")
-        while True:
-            user_input = input("\n> ")
-            if user_input.lower() == 'quit':
-                break
-            
-            output = llm(user_input, max_tokens=50, temperature=0.7)
-            print(f"Mibera: {output['choices'][0]['text']}")
-            
+        llm = Llama(n_gpu_layers=0, verbose=False, **llama_kwargs(config))
     except Exception as e:
         print(f"[ERROR] Failed to load model: {e}")
         
-        # Try alternative approach
-        print("\nTrying alternative settings...")
+        # The estimate can be off for an unusual build; retry without locking and with half the context
+        print("\nRetrying with mmap paging and a smaller context...")
+        config.update(n_ctx=max(MIN_CTX // 2, config["n_ctx"] // 2), use_mlock=False)
         try:
-            llm = Llama(
-                model_path=model_path,
-                n_ctx=64,           # Even smaller
-                n_batch=1,
-                n_threads=1,        # Single thread
-                n_gpu_layers=0,
-                use_mmap=True,      # Try with mmap
-                use_mlock=False,
-                verbose=True        # See what's happening
-            )
-            print("[OK] Loaded with alternative settings!")
-            
+            llm = Llama(n_gpu_layers=0, verbose=True, **llama_kwargs(config))
         except Exception as e2:
-            print(f"[ERROR] Alternative also failed: {e2}")
-            print("\nThe missing output_norm.bias tensor is blocking all loaders.")
-            print("We need to wait for the IQ quantizations or fix the tensor issue.")
+            print(f"[ERROR] Retry also failed: {e2}")
+            return
+    
+    load_seconds = time.time() - load_start
+    print(f"[OK] Model loaded in {load_seconds:.2f}s")
+    if prefault:
+        prefault.wait()
+        prefault.report()
+    
+    # Test generation
+    prompt = "Hello, I am"
+    print(f"\nPrompt: {prompt}")
+    print("Generating...")
+    
+    first = None
+    pieces = []
+    for chunk in llm(prompt, max_tokens=20, temperature=0.7, top_p=0.9, stream=True):
+        if first is None:
+            first = time.time() - load_start
+        pieces.append(chunk["choices"][0]["text"])
+    print(f"Response: {''.join(pieces)}")
+    if first is not None:
+        # mapped/resident are the prefaulter's own plan+hint and read-ahead times, not llama.cpp's
+        readahead = (f"prefault plan+hint {prefault.mapped or 0:.2f}s, prefault resident {prefault.resident or 0:.2f}s, "
+                     if prefault else "")
+        print(f"[cold start] {readahead}model loaded {load_seconds:.2f}s, first token {first:.2f}s")
+    
+    # Interactive mode (tokens stream as they are generated, Ctrl+C stops a response)
+    print("Tip: `python mibera_server.py <model>` keeps the model warm between runs")
+    cache = PrefixCache(llm, model_path)
+    # Deterministic turns (--temperature 0 or --seed) are replayed from the generation cache
+    session = Session(llama_source(llm, cache), cache=GenerationCache(model_path),
+                      tokenize=lambda text: llm.tokenize(text.encode("utf-8"), special=True))
+    run_interactive(session, system=SYSTEM_PROMPT, max_tokens=50, **sampling_params(temperature, seed))
 
 def main():
+    parser = argparse.ArgumentParser(description="Run Mibera with llama-cpp-python")
+    parser.add_argument("--temperature", type=float, default=0.7, help="0 makes turns deterministic and cacheable")
+    parser.add_argument("--seed", type=int, help="Fixed sampling seed (turns become cacheable)")
+    args = parser.parse_args()
+
     print("This uses llama-cpp-python which may handle missing tensors better")
-    print("RAM available: ~6.5GB")
     print()
     
-    run_mibera_minimal()
+    # A running mibera_server.py already has the model loaded
+    health = server_available()
+    if health:
+        print(f"[OK] Using warm server ({health['model']})")
+        run_interactive(server_session(health), system=SYSTEM_PROMPT, max_tokens=50,
+                        **sampling_params(args.temperature, args.seed))
+        return
+    
+    run_mibera_minimal(temperature=args.temperature, seed=args.seed)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Header-only safetensors access: read the JSON header of every shard in
+parallel and build a name -> shape/dtype/shard/offset map, without loading
+torch or any tensor data.
+"""
+import glob
+import json
+import os
+import struct
+from concurrent.futures import ThreadPoolExecutor
+
+# safetensors dtype -> bytes per element
+DTYPE_SIZES = {
+    "F64": 8, "F32": 4, "F16": 2, "BF16": 2,
+    "I64": 8, "I32": 4, "I16": 2, "I8": 1, "U8": 1, "BOOL": 1,
+}
+
+
+class TensorEntry:
+    """One tensor of a sharded checkpoint; data_start/data_end are absolute file offsets"""
+
+    def __init__(self, name, dtype, shape, shard, data_start, data_end):
+        self.name = name
+        self.dtype = dtype
+        self.shape = list(shape)
+        self.shard = shard
+        self.data_start = data_start
+        self.data_end = data_end
+
+    @property
+    def n_bytes(self):
+        return self.data_end - self.data_start
+
+    def __repr__(self):
+        return f"TensorEntry({self.name!r}, {self.dtype}, {self.shape}, {os.path.basename(self.shard)})"
+
+
+def read_safetensors_header(path):
+    """Return (header dict, data section offset) for one .safetensors file"""
+    with open(path, 'rb') as f:
+        prefix = f.read(8)
+        if len(prefix) != 8:
+            raise ValueError(f"{path}: too short for a safetensors file")
+        header_len = struct.unpack('<Q', prefix)[0]
+        header = json.loads(f.read(header_len))
+    return header, 8 + header_len
+
+
+def shard_entries(path):
+    """TensorEntry list for one shard"""
+    header, data_offset = read_safetensors_header(path)
+    entries = []
+    for name, meta in header.items():
+        if name == "__metadata__":
+            continue
+        start, end = meta["data_offsets"]
+        entries.append(TensorEntry(name, meta["dtype"], meta["shape"], path,
+                                   data_offset + start, data_offset + end))
+    return entries
+
+
+def find_shards(model_dir):
+    shards = sorted(glob.glob(os.path.join(model_dir, "model-*.safetensors")))
+    if not shards:
+        shards = sorted(glob.glob(os.path.join(model_dir, "*.safetensors")))
+    return shards
+
+
+def scan_shards(model_dir, workers=8):
+    """Parse all shard headers concurrently; returns {name: TensorEntry}"""
+    shards = find_shards(model_dir)
+    if not shards:
+        raise FileNotFoundError(f"No safetensors files found in {model_dir}")
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(shards)))) as pool:
+        per_shard = list(pool.map(shard_entries, shards))
+
+    tensors = {}
+    for entries in per_shard:
+        for entry in entries:
+            if entry.name in tensors:
+                raise ValueError(f"{entry.name} appears in both {tensors[entry.name].shard} and {entry.shard}")
+            tensors[entry.name] = entry
+    return tensors
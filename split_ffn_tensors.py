@@ -7,87 +7,24 @@ This directly modifies the GGUF without needing the original HF model.
 import sys
 import os
 from pathlib import Path
-sys.path.insert(1, str(Path(__file__).parent / 'llama.cpp-mibera' / 'gguf-py'))
 
-import gguf
-import numpy as np
+from gguf_io import read_header
+from gguf_stream import rewrite, SplitFusedFFN, DEFAULT_MAX_MEMORY
+from gguf_trace import get_tracer, start_trace
 
-def split_ffn_in_gguf(input_path, output_path):
+def split_ffn_in_gguf(input_path, output_path, axis=None, gate_first=True, max_memory=DEFAULT_MAX_MEMORY):
     """Split fused FFN tensors in GGUF file to fix tensor count (243->203)"""
     
     print(f"Reading GGUF: {input_path}")
-    reader = gguf.GGUFReader(input_path)
-    
-    # Get architecture from field data
-    arch = "phi2"  # Default for Mibera
-    for field in reader.fields:
-        if field.name == "general.architecture":
-            if hasattr(field.parts, '__iter__'):
-                arch = field.parts[0].decode() if field.parts else "phi2"
-            else:
-                arch = str(field.parts)
-            break
-    
-    # Create new writer
-    writer = gguf.GGUFWriter(output_path, arch)
-    
-    # Copy all metadata
-    print("Copying metadata...")
-    for field in reader.fields:
-        writer.add_string(field.name, str(field.parts[0]) if field.parts else "")
+    header = read_header(input_path)
+    print(f"Architecture: {header.architecture or 'phi2'}")
     
+    # Tensors are streamed one at a time; quant blocks are moved as raw bytes (no requantization)
     print("Processing tensors...")
-    tensors_processed = 0
-    tensors_split = 0
-    
-    for tensor in reader.tensors:
-        name = tensor.name
-        data = tensor.data
-        
-        # Check if this is a fused FFN up weight that needs splitting
-        if name.endswith("ffn_up.weight") and len(data.shape) == 2:
-            shape = data.shape
-            print(f"Found FFN tensor: {name} shape: {shape}")
-            
-            # Check if this looks like a fused tensor (second dim should be ~35840)
-            if shape[1] == 35840:  # 2 * 17920
-                print(f"Splitting fused FFN tensor: {name}")
-                
-                # Split into two halves
-                half_size = shape[1] // 2  # 17920
-                
-                # First half = gate, second half = up
-                gate_data = data[:, :half_size].copy()
-                up_data = data[:, half_size:].copy()
-                
-                # Create new tensor names
-                gate_name = name.replace("ffn_up.weight", "ffn_gate.weight")
-                up_name = name  # Keep original name for up
-                
-                print(f"  -> {gate_name}: {gate_data.shape}")
-                print(f"  -> {up_name}: {up_data.shape}")
-                
-                # Add both tensors
-                writer.add_tensor(gate_name, gate_data, raw_dtype=tensor.tensor_type)
-                writer.add_tensor(up_name, up_data, raw_dtype=tensor.tensor_type)
-                
-                tensors_split += 1
-            else:
-                # Regular FFN up tensor, copy as-is
-                writer.add_tensor(name, data, raw_dtype=tensor.tensor_type)
-        else:
-            # Copy all other tensors as-is
-            writer.add_tensor(name, data, raw_dtype=tensor.tensor_type)
-        
-        tensors_processed += 1
-        if tensors_processed % 50 == 0:
-            print(f"Processed {tensors_processed} tensors...")
-    
-    print(f"Writing to: {output_path}")
-    writer.write_header_to_file()
-    writer.write_kv_data_to_file()
-    writer.write_tensors_to_file()
-    writer.close()
+    splitter = SplitFusedFFN(axis=axis, gate_first=gate_first)
+    stats = rewrite(input_path, output_path, [splitter], max_memory=max_memory)
+    tensors_processed = stats["tensors_in"]
+    tensors_split = splitter.split
     
     print(f"\nSummary:")
     print(f"  Total tensors processed: {tensors_processed}")
@@ -96,19 +33,27 @@ def split_ffn_in_gguf(input_path, output_path):
     
     # Verify the new file
     print(f"\nVerifying new file...")
-    new_reader = gguf.GGUFReader(output_path)
-    new_tensor_count = len(new_reader.tensors)
+    with get_tracer().stage("verify"):
+        new_header = read_header(output_path)
+    new_tensor_count = len(new_header.tensors)
     print(f"New tensor count: {new_tensor_count}")
     
     # Check for gate tensors
-    gate_tensors = [t.name for t in new_reader.tensors if "ffn_gate.weight" in t.name]
+    gate_tensors = [t.name for t in new_header.tensors if "ffn_gate.weight" in t.name]
     print(f"FFN gate tensors found: {len(gate_tensors)}")
     
     return True
 
 def main():
-    input_file = Path("C:/Users/natha/mibera llm/fixed_models/mibera-Q3_K_M-fixed.gguf")
-    output_file = Path("C:/Users/natha/mibera llm/fixed_models/mibera-Q3_K_M-split.gguf")
+    import argparse
+    parser = argparse.ArgumentParser(description="Split fused FFN tensors in a GGUF file")
+    parser.add_argument("input", nargs="?", default="C:/Users/natha/mibera llm/fixed_models/mibera-Q3_K_M-fixed.gguf")
+    parser.add_argument("output", nargs="?", default="C:/Users/natha/mibera llm/fixed_models/mibera-Q3_K_M-split.gguf")
+    parser.add_argument("--axis", type=int, choices=[0, 1], help="Fused axis (0 = ne0/row, 1 = ne1); auto-detected by default")
+    parser.add_argument("--swap", action="store_true", help="Treat the second half as gate instead of the first")
+    args = parser.parse_args()
+    input_file = Path(args.input)
+    output_file = Path(args.output)
     
     if not input_file.exists():
         print(f"ERROR: Input file not found: {input_file}")
@@ -119,8 +64,9 @@ def main():
     print(f"Output: {output_file}")
     print()
     
+    start_trace("split_ffn_tensors")
     try:
-        success = split_ffn_in_gguf(str(input_file), str(output_file))
+        success = split_ffn_in_gguf(str(input_file), str(output_file), axis=args.axis, gate_first=not args.swap)
         if success:
             print(f"\nSuccessfully created: {output_file}")
             return True
@@ -2,112 +2,36 @@
 """
 GGUF Surgery: Add missing output_norm.bias to existing F16 GGUF
 """
-import numpy as np
-import struct
 import sys
-import os
-from pathlib import Path
 
-def add_bias_via_surgery(input_file, output_file):
+from gguf_io import read_header
+from gguf_index import load_index
+from gguf_stream import rewrite, AddOutputNormBias, DEFAULT_MAX_MEMORY
+from gguf_trace import get_tracer, start_trace
+
+def add_bias_via_surgery(input_file, output_file, max_memory=DEFAULT_MAX_MEMORY):
     """Surgically add output_norm.bias to existing GGUF"""
     print(f"[surgery] Reading {input_file}")
     
-    # Import gguf
-    try:
-        import gguf
-    except ImportError:
-        print("Installing gguf...")
-        import subprocess
-        subprocess.check_call([sys.executable, "-m", "pip", "install", "gguf"])
-        import gguf
-    
-    # Read source
-    reader = gguf.GGUFReader(input_file)
-    
-    # Get architecture to create writer
-    arch = None
-    for field in reader.fields.values():
-        if hasattr(field, 'name') and field.name == 'general.architecture':
-            arch = field.value
-            break
-    
-    if not arch:
-        arch = "phi2"  # Default for our model
-    
-    print(f"[surgery] Architecture: {arch}")
+    header = read_header(input_file)
+    print(f"[surgery] Architecture: {header.architecture or 'phi2'}")
     
-    # Create writer
-    writer = gguf.GGUFWriter(output_file, arch, use_temp_file=False)
-    
-    # Copy all metadata fields
-    print("[surgery] Copying metadata...")
-    for field in reader.fields.values():
-        if hasattr(field, 'name') and hasattr(field, 'value'):
-            try:
-                writer.add_field(field.name, field.value)
-            except AttributeError:
-                # Try alternative API
-                try:
-                    parts = field.name.split('.')
-                    if len(parts) == 2:
-                        writer.add_key_value(parts[0], parts[1], field.value)
-                    else:
-                        writer.add_key_value(field.name, "", field.value)
-                except:
-                    print(f"[warn] Skipping field: {field.name}")
-    
-    # Track tensors
-    tensor_count = 0
-    bias_added = False
-    
-    # Copy tensors and inject bias
+    # Stream tensors through the bias transform
     print("[surgery] Copying tensors and injecting bias...")
-    for tensor in reader.tensors:
-        # Get tensor name
-        name = tensor.name
-        if isinstance(name, bytes):
-            name = name.decode('utf-8')
-        
-        # Add tensor
-        writer.add_tensor(name, tensor.data)
-        tensor_count += 1
-        
-        # After output_norm.weight, inject bias
-        if name == "output_norm.weight" and not bias_added:
-            # Get embedding dimension from weight shape
-            embd_dim = tensor.data.shape[0]
-            
-            # Create zero bias with same dtype as weight
-            bias = np.zeros(embd_dim, dtype=tensor.data.dtype)
-            
-            print(f"[surgery] Injecting output_norm.bias shape={bias.shape} dtype={bias.dtype}")
-            writer.add_tensor("output_norm.bias", bias)
-            
-            bias_added = True
-            tensor_count += 1
+    bias = AddOutputNormBias()
+    stats = rewrite(input_file, output_file, [bias], max_memory=max_memory)
     
-    # Write file
-    print(f"[surgery] Writing {tensor_count} tensors...")
-    writer.write_header_to_file()
-    writer.write_kv_data_to_file()
-    writer.write_tensors_to_file()
-    writer.close()
-    
-    print(f"[surgery] Complete! Added bias: {bias_added}")
-    print(f"[surgery] Total tensors: {tensor_count} (expect 244 for fused+bias)")
+    print(f"[surgery] Complete! Added bias: {bias.added}")
+    print(f"[surgery] Total tensors: {stats['tensors_out']} (expect 244 for fused+bias)")
     
     # Verify
     print("[surgery] Verifying output...")
-    verifier = gguf.GGUFReader(output_file)
-    verify_names = []
-    for t in verifier.tensors:
-        name = t.name
-        if isinstance(name, bytes):
-            name = name.decode('utf-8')
-        verify_names.append(name)
+    with get_tracer().stage("verify"):
+        verifier = load_index(output_file)
+    verify_names = verifier.names()
     
-    has_bias = "output_norm.bias" in verify_names
-    token_count = len([k for k in verifier.fields.keys() if "token" in str(k).lower()])
+    has_bias = verifier.get("output_norm.bias") is not None
+    token_count = len([k for k in verifier.kv if "token" in k.lower()])
     
     print(f"[verify] Output tensors: {len(verify_names)}")
     print(f"[verify] Has output_norm.bias: {has_bias}")
@@ -120,8 +44,16 @@ def add_bias_via_surgery(input_file, output_file):
     print("[SUCCESS] Surgery complete!")
 
 if __name__ == "__main__":
+    if len(sys.argv) >= 3 and sys.argv[1] == "--in-place":
+        # In-place mode: only the header is rewritten and the bias appended
+        from gguf_inplace import add_output_norm_bias_in_place
+        add_output_norm_bias_in_place(sys.argv[2], dry_run="--dry-run" in sys.argv[3:])
+        sys.exit(0)
+    
     if len(sys.argv) != 3:
         print("Usage: python surgery_add_bias.py input.gguf output.gguf")
+        print("       python surgery_add_bias.py --in-place model.gguf [--dry-run]")
         sys.exit(1)
     
+    start_trace("surgery_add_bias")
     add_bias_via_surgery(sys.argv[1], sys.argv[2])
\ No newline at end of file
@@ -194,6 +194,15 @@ if __name__ == "__main__":
 
 def main():
     print("=== MIBERA ALTERNATIVE INFERENCE OPTIONS ===")
+    
+    # Find out what is actually wrong with the file before trying other loaders
+    model_path = "C:/Users/natha/mibera_llm_final/mibera-Q2_K-final.gguf"
+    if os.path.exists(model_path):
+        from gguf_validate import preflight
+        if preflight(model_path):
+            print("The file matches the architecture contract; llama.cpp should load it directly.")
+            return
+    
     print("Since the models have missing tensors, let's try alternatives:")
     
     check_ollama_alternative()
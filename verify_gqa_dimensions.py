@@ -1,11 +1,22 @@
 #!/usr/bin/env python3
-"""Verify GQA dimension calculations for Mibera model."""
+"""Verify GQA dimension calculations for Mibera model.
+
+    python verify_gqa_dimensions.py                 # Mibera defaults
+    python verify_gqa_dimensions.py model.gguf      # read from the header and validate every layer
+"""
+import sys
 
 # Mibera model parameters
 n_embd = 5120      # Hidden size
 n_head = 32        # Number of query heads
 n_head_kv = 8      # Number of KV heads (GQA)
 
+if len(sys.argv) > 1:
+    from gguf_io import read_header
+    from gguf_validate import contract, preflight
+    params, _, _ = contract(read_header(sys.argv[1]))
+    n_embd, n_head, n_head_kv = params["n_embd"], params["n_head"], params["n_head_kv"]
+
 # Calculate dimensions
 head_dim = n_embd // n_head  # 160
 n_embd_k_gqa = head_dim * n_head_kv  # 1280
@@ -29,4 +40,6 @@ print(f"\nQKV tensor shape: [{n_embd}, {n_embd_qkv}]")
 print(f"Expected by llama.cpp (MHA): [{n_embd}, {3*n_embd}]")
 print(f"Actual in Mibera (GQA): [{n_embd}, {n_embd_qkv}]")
 print(f"\nOur patch calculation: n_embd + n_embd_k_gqa + n_embd_v_gqa = {n_embd} + {n_embd_k_gqa} + {n_embd_v_gqa} = {n_embd_qkv}")
+if len(sys.argv) > 1:
+    sys.exit(0 if preflight(sys.argv[1]) else 1)
 print(f"This matches the actual tensor dimension: 7680 ✓")
\ No newline at end of file